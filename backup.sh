@@ -1,11 +1,12 @@
 #!/bin/bash
 
 # TrainMath Backup Script
+# Паралельний pg_dump (каталоговий формат) + інкрементальні добові вивантаження
+# спроб; див. core/backup.py. VERIFY=1 після копії перевіряє відновлення.
 set -e
 
 BACKUP_DIR="backups"
-DATE=$(date +%Y%m%d_%H%M%S)
-BACKUP_FILE="trainmath_backup_${DATE}.sql"
+JOBS="${BACKUP_JOBS:-4}"
 
 echo "Starting backup process..."
 
@@ -15,29 +16,30 @@ mkdir -p $BACKUP_DIR
 # Check if running in Docker
 if [ -f /.dockerenv ]; then
     echo "Running inside Docker container..."
-    # Backup database
-    pg_dump -h db -U trainmath -d trainmath > "/app/$BACKUP_DIR/$BACKUP_FILE"
+    RUN="python manage.py"
+    TARGET="/app/$BACKUP_DIR"
 else
     echo "Running on host system..."
     # Check if docker-compose is running
     if docker-compose ps | grep -q "Up"; then
         echo "Backing up database from Docker container..."
-        docker-compose exec -T db pg_dump -U trainmath -d trainmath > "$BACKUP_DIR/$BACKUP_FILE"
+        RUN="docker-compose exec -T web python manage.py"
+        TARGET="/app/$BACKUP_DIR"
     else
         echo "Docker containers are not running. Please start them first."
         exit 1
     fi
 fi
 
-# Compress backup
-echo "Compressing backup..."
-gzip "$BACKUP_DIR/$BACKUP_FILE"
+# Backup database (removes base backups older than 30 days)
+$RUN backup_db --output "$TARGET" --jobs "$JOBS" --keep-days 30
 
-# Remove backups older than 30 days
-echo "Cleaning up old backups..."
-find $BACKUP_DIR -name "trainmath_backup_*.sql.gz" -mtime +30 -delete
+if [ "${VERIFY:-0}" = "1" ]; then
+    echo "Verifying restore..."
+    $RUN backup_db --output "$TARGET" --jobs "$JOBS" --verify
+fi
 
-echo "Backup completed: $BACKUP_DIR/$BACKUP_FILE.gz"
+echo "Backup completed: $BACKUP_DIR"
 
 # Show backup size
-ls -lh "$BACKUP_DIR/$BACKUP_FILE.gz"
+du -sh "$BACKUP_DIR"/base_* "$BACKUP_DIR"/attempts 2>/dev/null | tail -n 5
@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.urls import path
 from django.shortcuts import render
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from . import exports
+from .db_router import replica_alias, replica_reads
 from django.db.models import Count, Avg, Q
 from .models import ProblemType, ProblemInstance, Attempt, ShareResult
 from django.contrib.auth import get_user_model
@@ -30,9 +33,10 @@ class AttemptAdmin(admin.ModelAdmin):
 class ShareResultAdmin(admin.ModelAdmin):
     list_display = ['uuid', 'attempt', 'public', 'created']
     list_filter = ['public', 'created']
-    readonly_fields = ['uuid', 'created']
+    readonly_fields = ['uuid', 'created', 'session_key']
 
 # Custom admin dashboard view
+@replica_reads
 def admin_dashboard_view(request):
     # Get statistics
     total_users = Attempt.objects.values('user').distinct().count()
@@ -93,3 +97,33 @@ def admin_dashboard_view(request):
     }
     
     return render(request, 'core/admin_dashboard.html', context)
+
+
+# Streaming export of attempts for analysts
+def export_attempts_view(request):
+    """
+    Потоковий експорт спроб: ``?format=csv|jsonl&gzip=1&from=YYYY-MM-DD
+    &to=YYYY-MM-DD&type=<slug>`` (``type`` можна повторювати).
+    """
+    if not request.user.has_perm('core.view_attempt'):
+        return HttpResponseForbidden()
+    fmt = request.GET.get('format', 'csv')
+    compress = request.GET.get('gzip') == '1'
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest('Unknown format')
+    try:
+        date_from = exports.parse_date(request.GET.get('from'))
+        date_to = exports.parse_date(request.GET.get('to'))
+    except ValueError:
+        return HttpResponseBadRequest('Dates must be YYYY-MM-DD')
+    slugs = [slug for slug in request.GET.getlist('type') if slug]
+
+    stream = exports.export_stream(fmt, compress, date_from, date_to, slugs,
+                                   using=replica_alias(request))
+    response = StreamingHttpResponse(
+        stream,
+        content_type='application/gzip' if compress else f'{exports.FORMATS[fmt]}; charset=utf-8',
+    )
+    filename = exports.export_filename(fmt, compress, date_from, date_to)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
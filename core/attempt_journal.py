@@ -0,0 +1,348 @@
+# core/attempt_journal.py
+"""
+Відкладений запис спроб (write-behind) для піків навантаження.
+
+З ``settings.ATTEMPT_WRITE_BEHIND`` ``submit_answer`` не вставляє Attempt
+одразу, а дописує рядок JSON у локальний журнал (сегмент процесу в
+``ATTEMPT_JOURNAL_DIR``) і після ``fsync`` відповідає користувачу. Фоновий
+потік процесу кожні ``ATTEMPT_FLUSH_INTERVAL_MS`` мс або після
+``ATTEMPT_FLUSH_MAX_ROWS`` рядків закриває сегмент (перейменовує в
+``.ready``) і вставляє його одним ``bulk_create``.
+
+Надійність:
+
+- спроба підтверджується лише після ``fsync`` її рядка, тож переживає
+  падіння процесу; недописаний останній рядок (падіння під час запису) ще
+  не був підтверджений і пропускається;
+- перейменування сегмента підтверджується ``fsync`` каталогу, тож після
+  падіння ОС сегмент лишається під ім'ям, яке знаходить ``recover``;
+- кожен рядок має ``journal_id`` (унікальне поле Attempt), а вставка йде з
+  ``ignore_conflicts`` — сегмент, вставлений, але не видалений до падіння,
+  можна безпечно вставити ще раз;
+- активний сегмент тримає ``flock``; сегменти без блокування лишились від
+  завершених процесів і вставляються будь-яким флашером або командою
+  ``manage.py flush_attempt_journal``;
+- флашер вставляє сегмент, лише захопивши його ``flock``: сегмент, який
+  зараз вставляє інший процес, пропускається, тож ``attempts_inserted``
+  (і очки дошок лідерів) не надсилається двічі за ті самі рядки.
+
+Ще не вставлені спроби видно через ``pending`` — сторінки результату
+додають їх до спроб з БД. Процес тримає індекс сегментів за
+(user_id, session_id) і дочитує лише нові рядки, тож сторінка не розбирає
+весь журнал щоразу.
+"""
+import atexit
+import datetime
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+# Надсилається після вставки сегмента: attempts — нові Attempt (без pk)
+attempts_inserted = Signal()
+
+ACTIVE_SUFFIX = '.jsonl'
+READY_SUFFIX = '.ready'
+
+# Поля Attempt, що записуються в журнал
+FIELDS = ('user_id', 'session_id', 'problem_id', 'user_answer', 'option_id',
+          'is_correct', 'time_taken_ms', 'timestamp')
+
+
+def _parse_entry(line):
+    """Рядок сегмента або None, якщо він недописаний чи пошкоджений."""
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    entry['timestamp'] = datetime.datetime.fromisoformat(entry['timestamp'])
+    return entry
+
+
+def _read_entries(path):
+    """Рядки сегмента; недописаний або пошкоджений рядок пропускається."""
+    entries = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                entry = _parse_entry(line)
+                if entry is not None:
+                    entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _index_segment(path, offset, sessions):
+    """
+    Дочитує сегмент з ``offset`` у ``sessions`` ({(user_id, session_id):
+    [рядки]}); повертає нове зміщення. Недописаний останній рядок
+    лишається на наступний раз.
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return offset
+    end = data.rfind(b'\n') + 1
+    for line in data[:end].splitlines():
+        entry = _parse_entry(line)
+        if entry is not None:
+            sessions.setdefault((entry['user_id'], entry['session_id']), []).append(entry)
+    return offset + end
+
+
+def _fsync_directory(directory):
+    """fsync каталогу: створення й перейменування файлів у ньому переживають падіння ОС."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def insert_entries(entries):
+    """Вставляє рядки журналу одним ``bulk_create``; повертає кількість рядків."""
+    from core.models import Attempt, ProblemInstance
+
+    if not entries:
+        return 0
+    # Задача могла бути видалена, поки спроба чекала в журналі
+    existing = set(ProblemInstance.objects.filter(
+        pk__in={entry['problem_id'] for entry in entries}
+    ).values_list('pk', flat=True))
+    # Рядки, вже вставлені до збою, пропускаються (ignore_conflicts лишається
+    # на випадок одночасної вставки того самого сегмента)
+    inserted = {journal_id.hex for journal_id in Attempt.objects.filter(
+        journal_id__in=[entry['journal_id'] for entry in entries]
+    ).values_list('journal_id', flat=True)}
+    attempts = Attempt.objects.bulk_create([
+        Attempt(journal_id=entry['journal_id'], **{field: entry[field] for field in FIELDS})
+        for entry in entries
+        if entry['problem_id'] in existing and entry['journal_id'] not in inserted
+    ], ignore_conflicts=True)
+    attempts_inserted.send(sender=Attempt, attempts=attempts)
+    _requeue_guest_merges({entry['session_id'] for entry in entries if entry['session_id']})
+    return len(entries)
+
+
+def _requeue_guest_merges(session_keys):
+    """Гість міг увійти, поки його спроби чекали в журналі: перенесення повторюється."""
+    from users.merge import enqueue
+    from users.models import GuestMerge
+
+    if not session_keys:
+        return
+    finished = GuestMerge.objects.filter(session_key__in=session_keys, finished_at__isnull=False)
+    for job in finished.select_related('user'):
+        enqueue(job.session_key, job.user)
+
+
+def flush_segment(path):
+    """
+    Вставляє сегмент, захопивши його блокування; повертає кількість рядків
+    або None, якщо сегмент тримає інший процес (активний сегмент живого
+    процесу або сегмент, який уже вставляє інший флашер).
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            # Між open і flock інший флашер міг вставити й видалити сегмент
+            if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                return None
+        except FileNotFoundError:
+            return None
+        count = insert_entries(_read_entries(path))
+        # Видалення до зняття блокування: ніхто не вставить сегмент повторно
+        os.remove(path)
+    return count
+
+
+def recover(directory):
+    """Вставляє закриті й покинуті сегменти каталогу; повертає (сегментів, рядків)."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return 0, 0
+    segments = rows = 0
+    for path in sorted(directory.iterdir()):
+        if path.suffix in (READY_SUFFIX, ACTIVE_SUFFIX):
+            count = flush_segment(path)
+            if count is not None:
+                rows += count
+                segments += 1
+    return segments, rows
+
+
+class AttemptJournal:
+    """Журнал спроб одного процесу з фоновим флашером."""
+
+    def __init__(self, directory, flush_interval_ms=200, max_rows=500, fsync=True, background=True):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.fsync = fsync
+        self.background = background
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._rows = 0
+        self._wake = threading.Event()
+        self._thread = None
+        # Індекс pending: ім'я сегмента без суфікса -> (зміщення, {(user_id, session_id): [рядки]})
+        self._index = {}
+        self._index_lock = threading.Lock()
+
+    def append(self, **fields):
+        """Дописує спробу в журнал; повертає її ``journal_id`` після fsync."""
+        entry = {field: fields[field] for field in FIELDS}
+        entry['timestamp'] = entry['timestamp'].isoformat()
+        entry['journal_id'] = uuid.uuid4().hex
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._rows += 1
+            full = self._rows >= self.max_rows
+        if self.background:
+            self._ensure_thread()
+            if full:
+                self._wake.set()
+        return entry['journal_id']
+
+    def _open_segment(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{os.getpid()}-{uuid.uuid4().hex}.new'
+        self._file = open(path, 'a', encoding='utf-8')
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Під ім'ям активного сегмента файл з'являється вже заблокованим,
+        # інакше recover міг би прийняти його за покинутий
+        os.rename(path, path.with_suffix(ACTIVE_SUFFIX))
+        if self.fsync:
+            # Інакше після падіння ОС підтверджені рядки лишились би в .new
+            _fsync_directory(self.directory)
+        self._path = path.with_suffix(ACTIVE_SUFFIX)
+        self._rows = 0
+
+    def _rotate(self):
+        """Закриває активний сегмент (перейменовує в ``.ready``)."""
+        with self._lock:
+            if self._file is None:
+                return
+            # Перейменування до закриття: блокування тримається до кінця
+            os.rename(self._path, self._path.with_suffix(READY_SUFFIX))
+            if self.fsync:
+                _fsync_directory(self.directory)
+            self._file.close()
+            self._file = None
+            self._rows = 0
+
+    def flush(self):
+        """Вставляє все записане цим процесом і покинуте іншими; повертає кількість рядків."""
+        self._rotate()
+        return recover(self.directory)[1]
+
+    def pending(self, user_id, session_id):
+        """
+        Ще не вставлені спроби користувача/гостьової сесії з усіх сегментів
+        каталогу. Сегменти лише дописуються (і зберігають ім'я при
+        перейменуванні в ``.ready``), тож з кожного дочитуються тільки нові
+        рядки; індекс вставлених і видалених сегментів відкидається.
+        """
+        if not self.directory.is_dir():
+            return []
+        entries = []
+        with self._index_lock:
+            index = {}
+            for path in sorted(self.directory.iterdir()):
+                if path.suffix not in (ACTIVE_SUFFIX, READY_SUFFIX):
+                    continue
+                offset, sessions = self._index.get(path.stem, (0, {}))
+                index[path.stem] = (_index_segment(path, offset, sessions), sessions)
+                entries.extend(sessions.get((user_id, session_id), ()))
+            self._index = index
+        return entries
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='attempt-journal')
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Сегменти лишаються на диску й будуть вставлені наступним проходом
+                logger.exception("Attempt journal flush failed")
+            finally:
+                connection.close()
+
+
+_journal = None
+_journal_pid = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Журнал поточного процесу (окремий після fork воркера)."""
+    global _journal, _journal_pid
+    if _journal is None or _journal_pid != os.getpid():
+        with _journal_lock:
+            if _journal is None or _journal_pid != os.getpid():
+                _journal = AttemptJournal(
+                    settings.ATTEMPT_JOURNAL_DIR,
+                    flush_interval_ms=settings.ATTEMPT_FLUSH_INTERVAL_MS,
+                    max_rows=settings.ATTEMPT_FLUSH_MAX_ROWS,
+                    fsync=settings.ATTEMPT_JOURNAL_FSYNC,
+                )
+                _journal_pid = os.getpid()
+    return _journal
+
+
+def record_attempt(durable=False, **fields):
+    """
+    Зберігає спробу: одразу в БД (повертає Attempt) або, у режимі
+    write-behind, у журнал (повертає None). ``durable`` — вставити одразу
+    навіть у режимі write-behind (потрібен id, напр. для сторінки результату).
+    """
+    from core.models import Attempt
+
+    if durable or not settings.ATTEMPT_WRITE_BEHIND:
+        return Attempt.objects.create(**fields)
+    if 'problem' in fields:
+        fields['problem_id'] = fields.pop('problem').pk
+    get_journal().append(**fields)
+    return None
+
+
+def pending_attempts(user_id, session_id):
+    if not settings.ATTEMPT_WRITE_BEHIND:
+        return []
+    return get_journal().pending(user_id, session_id)
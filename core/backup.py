@@ -0,0 +1,380 @@
+# core/backup.py
+"""
+Паралельне інкрементальне резервне копіювання PostgreSQL і перевірка
+відновлення (``manage.py backup_db``).
+
+Одна копія складається з двох частин, знятих з одного знімка даних:
+
+- ``base_<час>/`` — ``pg_dump -Fd -j N`` (каталог, таблиці пишуться
+  паралельно й стискаються на льоту) усієї бази без даних ``core_attempt``;
+- ``attempts/<YYYY-MM-DD>.copy.gz`` — спроби за добу (UTC), вивантажені
+  ``COPY ... TO STDOUT`` у gzip-потік. Попередні доби не перевивантажуються,
+  окрім останніх ``overlap_days`` (пізні записи й оновлення), діб, у яких
+  з попереднього запуску гостьові спроби перенесено на користувача
+  (users.merge), і діб, вивантажених з іншим набором колонок.
+
+Колонки спроб вивантажуються й завантажуються явним списком, що
+записується для кожної доби в ``index.json``: файл, знятий до міграції з
+новою колонкою, відновлюється у свої колонки, а нова отримує NULL/типове
+значення.
+
+Узгодженість: транзакція REPEATABLE READ експортує знімок
+(``pg_export_snapshot``), у ній же вивантажуються спроби, а ``pg_dump``
+отримує цей знімок через ``--snapshot``.
+
+Відновлення: pre-data і data з базової копії, потім спроби з усіх діб,
+потім post-data (індекси й зовнішні ключі). Перед post-data "осиротілі"
+рядки обробляються так само, як ``on_delete`` у моделях.
+"""
+import datetime
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+
+from core.models import Attempt, ProblemInstance, ShareResult
+from users.models import GuestMerge
+
+ATTEMPTS_DIR = 'attempts'
+ATTEMPTS_INDEX = 'index.json'
+BASE_PREFIX = 'base_'
+
+
+class BackupError(Exception):
+    pass
+
+
+def pg_connection_args(settings_dict, dbname=None):
+    """Аргументи й оточення для pg_dump/pg_restore/createdb з DATABASES[alias]."""
+    args = []
+    if settings_dict.get('HOST'):
+        args += ['-h', str(settings_dict['HOST'])]
+    if settings_dict.get('PORT'):
+        args += ['-p', str(settings_dict['PORT'])]
+    if settings_dict.get('USER'):
+        args += ['-U', str(settings_dict['USER'])]
+    env = dict(os.environ)
+    if settings_dict.get('PASSWORD'):
+        env['PGPASSWORD'] = str(settings_dict['PASSWORD'])
+    return args, env, dbname or settings_dict['NAME']
+
+
+def _run(cmd, env, log):
+    log('$ ' + ' '.join(cmd))
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise BackupError(f"{cmd[0]} failed ({result.returncode}): {result.stderr.strip()}")
+    return result
+
+
+def _day_bounds(day):
+    start = datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+    return start, start + datetime.timedelta(days=1)
+
+
+def load_attempts_index(output_dir):
+    path = os.path.join(output_dir, ATTEMPTS_DIR, ATTEMPTS_INDEX)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def attempt_columns():
+    """Колонки ``core_attempt`` у порядку моделі — явний список для COPY."""
+    return [field.column for field in Attempt._meta.concrete_fields]
+
+
+def _column_list(columns):
+    return ', '.join(f'"{column}"' for column in columns)
+
+
+def days_to_export(index, first_day, today, overlap_days=3, full=False, columns=None):
+    """
+    Доби для вивантаження: усі від ``first_day`` при першому запуску або з
+    ``full``, інакше — від останньої вивантаженої мінус ``overlap_days``,
+    а також вивантажені раніше з іншим набором колонок, ніж ``columns``.
+    """
+    if first_day is None:
+        return []
+    start = first_day
+    if index and not full:
+        last = max(datetime.date.fromisoformat(day) for day in index)
+        start = max(first_day, last - datetime.timedelta(days=overlap_days))
+    days = {start + datetime.timedelta(days=i) for i in range((today - start).days + 1)}
+    if columns is not None:
+        days.update(
+            datetime.date.fromisoformat(day) for day, entry in index.items()
+            if entry.get('columns') != list(columns)
+        )
+    return sorted(days)
+
+
+def _last_export(index):
+    """Час попереднього запуску (найпізніший ``exported_at`` в індексі) або None."""
+    if not index:
+        return None
+    stamp = max(entry['exported_at'] for entry in index.values())
+    # Штамп — локальний час процесу (time.strftime)
+    return datetime.datetime.strptime(stamp, '%Y%m%d_%H%M%S').astimezone()
+
+
+def _merged_days(cursor, since):
+    """
+    Доби (UTC) зі спробами користувачів, чиї гостьові спроби перенесено після
+    ``since``: перенесення змінює ``user_id`` уже вивантажених рядків.
+    """
+    if since is None:
+        return set()
+    attempts = Attempt._meta.db_table
+    merges = GuestMerge._meta.db_table
+    cursor.execute(
+        f"SELECT DISTINCT (a.timestamp AT TIME ZONE 'UTC')::date FROM {attempts} a "
+        f"JOIN {merges} g ON g.user_id = a.user_id "
+        f"WHERE g.finished_at >= %s AND a.timestamp < g.finished_at",
+        [since],
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def copy_in_sql(table, columns=None):
+    """COPY для відновлення доби; без ``columns`` — файли, зняті до явного списку колонок."""
+    if not columns:
+        return f'COPY {table} FROM STDIN'
+    return f'COPY {table} ({_column_list(columns)}) FROM STDIN'
+
+
+def copy_in(cursor, sql, fh):
+    """Завантажує gzip-файл доби через ``COPY ... FROM STDIN``."""
+    raw = cursor.cursor
+    if hasattr(raw, 'copy_expert'):  # psycopg2
+        raw.copy_expert(sql, fh)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            while data := fh.read(1 << 20):
+                copy.write(data)
+
+
+def _copy_out(cursor, sql, path):
+    """COPY ... TO STDOUT одразу в gzip-файл (без проміжного файлу)."""
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wb', compresslevel=6) as fh:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            raw.copy_expert(sql, fh)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                for data in copy:
+                    fh.write(data)
+    os.replace(tmp_path, path)
+
+
+def _table_counts(cursor, tables):
+    counts = {}
+    for table in tables:
+        cursor.execute(f'SELECT count(*) FROM {table}')
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def _tables():
+    return [
+        get_user_model()._meta.db_table,
+        ProblemInstance._meta.db_table,
+        Attempt._meta.db_table,
+        ShareResult._meta.db_table,
+    ]
+
+
+def run_backup(output_dir, using='default', jobs=4, compress=6, overlap_days=3,
+               full_attempts=False, keep_days=30, log=print):
+    """Знімає копію в ``output_dir``; повертає маніфест базової копії."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        raise BackupError('backup_db requires PostgreSQL')
+    args, env, dbname = pg_connection_args(connection.settings_dict)
+    attempt_table = Attempt._meta.db_table
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    base_dir = os.path.join(output_dir, f'{BASE_PREFIX}{stamp}')
+    attempts_dir = os.path.join(output_dir, ATTEMPTS_DIR)
+    os.makedirs(attempts_dir, exist_ok=True)
+    index = load_attempts_index(output_dir)
+    timings = {}
+
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            cursor.execute('SELECT pg_export_snapshot()')
+            snapshot = cursor.fetchone()[0]
+            counts = _table_counts(cursor, _tables())
+
+            started = time.perf_counter()
+            cursor.execute(f'SELECT min(timestamp) FROM {attempt_table}')
+            first = cursor.fetchone()[0]
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            first_day = first.astimezone(datetime.timezone.utc).date() if first else None
+            columns = attempt_columns()
+            days = set(days_to_export(index, first_day, today, overlap_days, full_attempts, columns))
+            days.update(_merged_days(cursor, _last_export(index)))
+            for day in sorted(days):
+                start, end = _day_bounds(day)
+                cursor.execute(
+                    f'SELECT count(*) FROM {attempt_table} WHERE timestamp >= %s AND timestamp < %s',
+                    [start, end],
+                )
+                rows = cursor.fetchone()[0]
+                path = os.path.join(attempts_dir, f'{day.isoformat()}.copy.gz')
+                # COPY не приймає параметрів; межі побудовані з date, тож літерали безпечні
+                _copy_out(cursor, (
+                    f"COPY (SELECT {_column_list(columns)} FROM {attempt_table} "
+                    f"WHERE timestamp >= '{start.isoformat()}' AND timestamp < '{end.isoformat()}' "
+                    f"ORDER BY id) TO STDOUT"
+                ), path)
+                index[day.isoformat()] = {'rows': rows, 'exported_at': stamp, 'columns': columns}
+                log(f'attempts {day.isoformat()}: {rows} rows')
+            timings['attempts_s'] = round(time.perf_counter() - started, 2)
+
+            # pg_dump бачить ті самі дані, поки транзакція зі знімком відкрита
+            started = time.perf_counter()
+            _run([
+                'pg_dump', *args, '-d', dbname, '-Fd', '-j', str(jobs), '-Z', str(compress),
+                f'--snapshot={snapshot}', f'--exclude-table-data={attempt_table}', '-f', base_dir,
+            ], env, log)
+            timings['base_s'] = round(time.perf_counter() - started, 2)
+
+    with open(os.path.join(attempts_dir, ATTEMPTS_INDEX), 'w', encoding='utf-8') as fh:
+        json.dump(index, fh, indent=1, sort_keys=True)
+    manifest = {
+        'created': stamp,
+        'database': dbname,
+        'base': os.path.basename(base_dir),
+        'counts': counts,
+        'attempt_rows_indexed': sum(day['rows'] for day in index.values()),
+        'timings': timings,
+    }
+    with open(f'{base_dir}.json', 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=1)
+    prune_bases(output_dir, keep_days, log)
+    return manifest
+
+
+def prune_bases(output_dir, keep_days, log=print):
+    """Видаляє базові копії, старші за ``keep_days`` (добові файли спроб лишаються)."""
+    cutoff = time.time() - keep_days * 86400
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name.startswith(BASE_PREFIX) and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path)
+            manifest = f'{path}.json'
+            if os.path.exists(manifest):
+                os.remove(manifest)
+            log(f'removed {name}')
+
+
+def latest_base(output_dir):
+    bases = sorted(
+        name for name in os.listdir(output_dir)
+        if name.startswith(BASE_PREFIX) and os.path.isdir(os.path.join(output_dir, name))
+    )
+    if not bases:
+        raise BackupError(f'No base backups in {output_dir}')
+    return bases[-1]
+
+
+def _orphan_cleanup_sql():
+    """Осиротілі спроби обробляються як ``on_delete`` у моделях."""
+    attempt = Attempt._meta.db_table
+    users = get_user_model()._meta.db_table
+    problems = ProblemInstance._meta.db_table
+    shares = ShareResult._meta.db_table
+    return [
+        # Attempt.problem: CASCADE
+        f'DELETE FROM {attempt} a WHERE NOT EXISTS (SELECT 1 FROM {problems} p WHERE p.id = a.problem_id)',
+        # Attempt.user: SET_NULL
+        f'UPDATE {attempt} a SET user_id = NULL WHERE user_id IS NOT NULL '
+        f'AND NOT EXISTS (SELECT 1 FROM {users} u WHERE u.id = a.user_id)',
+        # ShareResult.attempt: CASCADE
+        f'DELETE FROM {shares} s WHERE NOT EXISTS (SELECT 1 FROM {attempt} a WHERE a.id = s.attempt_id)',
+        f"SELECT setval(pg_get_serial_sequence('{attempt}', 'id'), coalesce(max(id), 1)) FROM {attempt}",
+    ]
+
+
+def verify_restore(output_dir, using='default', scratch_db=None, jobs=4, keep=False, log=print):
+    """
+    Відновлює останню копію у тимчасову базу, міряє кожен етап і звіряє
+    кількість рядків з маніфестом. Повертає звіт; ``ok`` — чи все збіглося.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        raise BackupError('backup_db requires PostgreSQL')
+    args, env, dbname = pg_connection_args(connection.settings_dict)
+    scratch_db = scratch_db or f'{dbname}_restore_check'
+    if scratch_db == dbname:
+        raise BackupError('Scratch database must differ from the source database')
+    base = latest_base(output_dir)
+    base_dir = os.path.join(output_dir, base)
+    with open(f'{base_dir}.json', encoding='utf-8') as fh:
+        manifest = json.load(fh)
+    attempts_dir = os.path.join(output_dir, ATTEMPTS_DIR)
+    index = load_attempts_index(output_dir)
+    attempt_table = Attempt._meta.db_table
+    timings = {}
+
+    _run(['dropdb', *args, '--if-exists', scratch_db], env, log)
+    _run(['createdb', *args, scratch_db], env, log)
+    restore = ['pg_restore', *args, '-d', scratch_db, '--no-owner']
+    try:
+        started = time.perf_counter()
+        _run(restore + ['--section=pre-data', base_dir], env, log)
+        _run(restore + ['--section=data', '-j', str(jobs), base_dir], env, log)
+        timings['base_data_s'] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        scratch_settings = dict(connection.settings_dict, NAME=scratch_db)
+        scratch = connection.__class__(scratch_settings, alias='backup_verify')
+        try:
+            with scratch.cursor() as cursor:
+                for name in sorted(os.listdir(attempts_dir)):
+                    if not name.endswith('.copy.gz'):
+                        continue
+                    columns = index.get(name[:-len('.copy.gz')], {}).get('columns')
+                    with gzip.open(os.path.join(attempts_dir, name), 'rb') as fh:
+                        copy_in(cursor, copy_in_sql(attempt_table, columns), fh)
+                timings['attempts_s'] = round(time.perf_counter() - started, 2)
+                for sql in _orphan_cleanup_sql():
+                    cursor.execute(sql)
+
+            started = time.perf_counter()
+            _run(restore + ['--section=post-data', '-j', str(jobs), base_dir], env, log)
+            timings['post_data_s'] = round(time.perf_counter() - started, 2)
+
+            with scratch.cursor() as cursor:
+                restored = _table_counts(cursor, _tables())
+        finally:
+            scratch.close()
+    finally:
+        if not keep:
+            _run(['dropdb', *args, '--if-exists', scratch_db], env, log)
+
+    expected = dict(manifest['counts'])
+    # Спроби порівнюються з усіма вивантаженими добами, а не зі знімком:
+    # рядки, старші за вікно перекриття, беруться з попередніх запусків
+    expected[attempt_table] = manifest.get('attempt_rows_indexed', expected[attempt_table])
+    mismatches = {
+        table: {'expected': expected[table], 'restored': restored.get(table)}
+        for table in expected if restored.get(table) != expected[table]
+    }
+    return {
+        'base': base,
+        'scratch_db': scratch_db,
+        'timings': timings,
+        'total_s': round(sum(timings.values()), 2),
+        'restored': restored,
+        'mismatches': mismatches,
+        'ok': not mismatches,
+    }
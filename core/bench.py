@@ -0,0 +1,287 @@
+# core/bench.py
+"""
+Мікробенчмарки генераторів і перевірок відповідей.
+
+Використовується management-командою ``bench``. Кожен набір (suite) —
+функція, що повертає dict ``ключ -> список латентностей у секундах``;
+``summarize`` перетворює їх у throughput та p50/p95/p99.
+"""
+import json
+import platform
+import random
+import re
+import time
+
+import sympy as sp
+
+# Некоректні відповіді, які однаково мають відхилятися всіма генераторами
+MALFORMED_ANSWERS = ['((', '2*/x', '']
+
+# Очікуваний вердикт для кожного виду відповідей у корпусі. Дистрактори
+# варіантів вибору тільки міряються: деякі з них (напр. F(x) + 1 для
+# інтегралів) насправді еквівалентні правильній відповіді.
+EXPECTED_VERDICTS = {'correct': True, 'wrong': False, 'malformed': False}
+
+
+def percentile(values, pct):
+    """Перцентиль з лінійною інтерполяцією (values не обов'язково відсортовані)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(latencies):
+    """Статистика для списку латентностей (секунди) — у мілісекундах."""
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'throughput_per_s': round(len(latencies) / total, 2) if total else 0.0,
+        'mean_ms': round(total / len(latencies) * 1000, 4) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+    }
+
+
+def build_corpus(registry, per_case=5, seed=0):
+    """
+    Будує корпус відповідей: для кожного slug і складності ``per_case`` задач,
+    кожна з правильними, неправильними та некоректними відповідями.
+    """
+    random.seed(seed)
+    corpus = []
+    for slug, gen in registry.items():
+        for difficulty in (1, 2, 3):
+            for _ in range(per_case):
+                data = gen.generate(difficulty)
+                canonical = data['canonical_answer']
+                options = data.get('multiple_choice') or []
+                correct = [canonical] + [o['value'] for o in options if o['is_correct']]
+                corpus.append({
+                    'slug': slug,
+                    'difficulty': difficulty,
+                    'canonical_answer': canonical,
+                    'params': data['params'],
+                    'answers': {
+                        'correct': correct,
+                        'wrong': [f"{canonical} + x"],
+                        'malformed': list(MALFORMED_ANSWERS),
+                        'distractor': [o['value'] for o in options if not o['is_correct']],
+                    },
+                })
+    random.seed()
+    return corpus
+
+
+def load_json(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def save_json(path, data):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=1)
+        fh.write('\n')
+
+
+def bench_generate(registry, corpus, iterations=20, **kwargs):
+    """Латентність ``generate(difficulty)`` для кожного slug і складності."""
+    results = {}
+    for slug, gen in registry.items():
+        for difficulty in (1, 2, 3):
+            latencies = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                gen.generate(difficulty)
+                latencies.append(time.perf_counter() - started)
+            results[f"generate:{slug}:d{difficulty}"] = latencies
+    return results
+
+
+def bench_batch(registry, corpus, iterations=20, batch_size=12, **kwargs):
+    """
+    Латентність ``generate_batch(difficulty, batch_size)`` у перерахунку на
+    одну задачу — напряму порівнюється з набором ``generate``.
+    """
+    results = {}
+    for slug, gen in registry.items():
+        for difficulty in (1, 2, 3):
+            latencies = []
+            for seed in range(iterations):
+                started = time.perf_counter()
+                gen.generate_batch(difficulty, batch_size, seed=seed)
+                latencies.append((time.perf_counter() - started) / batch_size)
+            results[f"batch:{slug}:d{difficulty}"] = latencies
+    return results
+
+
+def bench_catalog(registry, corpus, iterations=20, **kwargs):
+    """
+    Латентність вибору задачі з прекомпільованого каталогу
+    (``manage.py build_problem_catalog``); порожньо, якщо каталогу немає.
+    """
+    from exercises.catalog import default_catalog
+
+    catalog = default_catalog()
+    results = {}
+    if catalog is None:
+        return results
+    for slug in registry:
+        for difficulty in (1, 2, 3):
+            if not catalog.has(slug, difficulty):
+                continue
+            latencies = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                catalog.sample(slug, difficulty)
+                latencies.append(time.perf_counter() - started)
+            results[f"catalog:{slug}:d{difficulty}"] = latencies
+    return results
+
+
+def bench_check(registry, corpus, repeat=3, mismatches=None, **kwargs):
+    """
+    Латентність ``check()`` по корпусу, окремо для кожного виду відповідей.
+    Вердикти, що не збігаються з ``EXPECTED_VERDICTS``, додаються в
+    ``mismatches`` (список), якщо його передано.
+    """
+    results = {}
+    for case in corpus:
+        gen = registry.get(case['slug'])
+        if gen is None:
+            continue
+        for kind, answers in case['answers'].items():
+            expected = EXPECTED_VERDICTS.get(kind)
+            latencies = results.setdefault(f"check:{case['slug']}:{kind}", [])
+            for answer in answers:
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    is_correct, _feedback = gen.check(answer, case['canonical_answer'], case['params'])
+                    latencies.append(time.perf_counter() - started)
+                if mismatches is not None and expected is not None and is_correct != expected:
+                    mismatches.append({
+                        'slug': case['slug'],
+                        'kind': kind,
+                        'answer': answer,
+                        'canonical_answer': case['canonical_answer'],
+                    })
+    return results
+
+
+def legacy_prettify(text):
+    """
+    Попередня реалізація ``pretty_expr`` (п'ять regex і кілька replace на
+    кожен виклик) — базова лінія для набору ``pretty``.
+    """
+    if not text:
+        return ""
+    s = str(text)
+    s = s.replace("\\left", "").replace("\\right", "")
+    s = re.sub(r"\^\{([^}]+)\}", r"^\1", s)
+    s = re.sub(r"(\d)\s+([a-zA-Z])", r"\1\2", s)
+    s = re.sub(r"([a-zA-Z])\s+([a-zA-Z])", r"\1\2", s)
+    s = s.replace(" * ", "·")
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def result_page_expressions(registry, attempts=12, seed=0):
+    """
+    Вирази однієї сторінки результатів: для кожної з ``attempts`` задач —
+    питання, канонічна відповідь і тексти варіантів вибору.
+    """
+    rng = random.Random(seed)
+    slugs = sorted(registry)
+    expressions = []
+    for i in range(attempts):
+        gen = registry[slugs[i % len(slugs)]]
+        data = gen.generate_batch(rng.choice((1, 2, 3)), 1, seed=rng.randrange(1 << 30))[0]
+        expressions.append(data['question'])
+        expressions.append(data['canonical_answer'])
+        expressions.extend(o['value'] for o in data.get('multiple_choice') or [])
+    return expressions
+
+
+def bench_pretty(registry, corpus, iterations=20, **kwargs):
+    """
+    Час форматування ``pretty_expr`` усіх виразів сторінки результатів
+    (12 спроб з варіантами): стара regex-реалізація, однопрохідний
+    токенізатор з порожньою пам'яттю і з уже заповненою (повторний рендер).
+    """
+    from core.templatetags.math_format import _prettify_expression, pretty_expr
+
+    pages = [result_page_expressions(registry, seed=seed) for seed in range(iterations)]
+    results = {'pretty:page:regex': [], 'pretty:page:tokenizer_cold': [], 'pretty:page:tokenizer_warm': []}
+    for page in pages:
+        started = time.perf_counter()
+        for expr in page:
+            legacy_prettify(expr)
+        results['pretty:page:regex'].append(time.perf_counter() - started)
+
+        _prettify_expression.cache_clear()
+        started = time.perf_counter()
+        for expr in page:
+            pretty_expr(expr)
+        results['pretty:page:tokenizer_cold'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for expr in page:
+            pretty_expr(expr)
+        results['pretty:page:tokenizer_warm'].append(time.perf_counter() - started)
+    return results
+
+
+# Доступні набори; нові бенчмарки реєструються тут
+SUITES = {
+    'generate': bench_generate,
+    'check': bench_check,
+    'batch': bench_batch,
+    'catalog': bench_catalog,
+    'pretty': bench_pretty,
+}
+
+
+def run(registry, corpus, suites=None, **options):
+    """Запускає вибрані набори й повертає звіт, готовий до запису в JSON."""
+    mismatches = []
+    results = {}
+    for name in suites or SUITES:
+        raw = SUITES[name](registry, corpus, mismatches=mismatches, **options)
+        results.update({key: summarize(lat) for key, lat in raw.items() if lat})
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sympy': sp.__version__,
+            'options': options,
+        },
+        'results': results,
+        'mismatches': mismatches,
+    }
+
+
+def compare(current, baseline, threshold=0.25, metrics=('p50_ms', 'p95_ms')):
+    """
+    Порівнює звіт з baseline. Повертає список регресій: ключі, де будь-яка
+    з ``metrics`` гірша більш ніж на ``threshold`` (частка, 0.25 = +25%).
+    """
+    regressions = []
+    for key, stats in current['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if not base:
+            continue
+        for metric in metrics:
+            old, new = base.get(metric, 0), stats.get(metric, 0)
+            if old > 0 and new > old * (1 + threshold):
+                regressions.append({
+                    'key': key,
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'ratio': round(new / old, 2),
+                })
+    return regressions
@@ -0,0 +1,191 @@
+# core/db_router.py
+"""
+Читання з репліки для read-only view (статистика, адмін-дашборд, поширені
+результати).
+
+За замовчуванням усі запити йдуть у ``default``. View, обгорнуті
+``replica_reads`` (або код у ``with read_replica(request)``), читають із
+псевдоніма ``settings.REPLICA_DATABASE``, якщо:
+
+- такий псевдонім налаштований;
+- клієнт нещодавно нічого не записував — після запису
+  ``ReplicaStickinessMiddleware`` ставить cookie, і наступні
+  ``REPLICA_STICKY_SECONDS`` його читання йдуть у primary (read-your-writes,
+  напр. ``result_view`` одразу після ``submit_answer``);
+- відставання репліки не більше ``REPLICA_MAX_LAG_SECONDS`` (перевіряється
+  не частіше, ніж раз на ``REPLICA_LAG_CHECK_INTERVAL`` с на процес).
+
+Запис у межах такого view перемикає решту його читань на primary.
+Сесії завжди читаються з primary.
+"""
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Застосунки, які ніколи не читаються з репліки
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+class _Routing:
+    """Стан маршрутизації поточного запиту."""
+    __slots__ = ('read_alias', 'wrote')
+
+    def __init__(self):
+        self.read_alias = None
+        self.wrote = False
+
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class ReplicaRouter:
+    """DATABASE_ROUTERS: читання — з репліки лише в межах ``read_replica``."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.read_alias is None or state.wrote:
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Репліка містить ті самі рядки, що й primary
+        return True
+
+
+# Кеш перевірки відставання: alias -> (час перевірки, справна?)
+_health = {}
+_health_lock = threading.Lock()
+
+_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_lag(alias):
+    """
+    Відставання репліки в секундах. Якщо все отримане вже застосовано,
+    відставання 0, навіть коли primary давно нічого не писав. Для не-PostgreSQL
+    баз (локальна перевірка на SQLite) завжди 0.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(_LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def replica_healthy(alias):
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5.0)
+    now = time.monotonic()
+    with _health_lock:
+        checked = _health.get(alias)
+        if checked and now - checked[0] < interval:
+            return checked[1]
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 10.0)
+    try:
+        lag = replica_lag(alias)
+        healthy = lag <= max_lag
+        if not healthy:
+            logger.warning("Replica %r is %.1fs behind; reading from primary", alias, lag)
+    except DatabaseError as exc:
+        healthy = False
+        logger.warning("Replica %r is unavailable; reading from primary: %s", alias, exc)
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def is_sticky(request):
+    """Чи писав клієнт нещодавно (cookie від ReplicaStickinessMiddleware)."""
+    value = request.COOKIES.get(settings.REPLICA_STICKY_COOKIE)
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_alias(request=None):
+    """Псевдонім для читання: репліка, якщо її можна використати, інакше ``default``."""
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    if not alias or alias not in connections:
+        return 'default'
+    if request is not None and is_sticky(request):
+        return 'default'
+    if not replica_healthy(alias):
+        return 'default'
+    return alias
+
+
+@contextmanager
+def read_replica(request=None):
+    """Читання в блоці йдуть з репліки, якщо вона доступна; повертає обраний псевдонім."""
+    state = _routing.get()
+    token = None
+    if state is None:
+        state = _Routing()
+        token = _routing.set(state)
+    previous = state.read_alias
+    alias = replica_alias(request)
+    state.read_alias = None if alias == 'default' else alias
+    try:
+        yield alias
+    finally:
+        state.read_alias = previous
+        if token is not None:
+            _routing.reset(token)
+
+
+def replica_reads(view):
+    """Декоратор view, чиї читання можуть іти з репліки."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with read_replica(request):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Відстежує записи під час запиту й після запису ставить cookie, яка
+    на ``REPLICA_STICKY_SECONDS`` направляє читання клієнта в primary.
+    Має стояти до SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _Routing()
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if state.wrote:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, f'{time.time() + seconds:.0f}',
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,172 @@
+# core/exports.py
+"""
+Потоковий експорт спроб (Attempt) у CSV або JSONL для аналітиків.
+
+Рядки читаються ``values_list(...).iterator(chunk_size)`` — на PostgreSQL
+це серверний курсор, тож пам'ять не залежить від розміру вибірки. Текст
+формується порціями й за потреби стискається gzip на льоту. Використовується
+адмінським view (core.admin) і командою ``manage.py export_attempts``.
+Обидва читають з репліки, якщо вона справна (core.db_router).
+
+Для відповідей, обраних варіантом (``option_id``), ``user_answer`` у
+експорті — значення цього варіанта (як у профілі й результатах); варіанти
+задач дочитуються одним запитом на порцію рядків.
+"""
+import csv
+import datetime
+import itertools
+import json
+import zlib
+
+from django.utils import timezone
+
+from core.models import Attempt, ProblemInstance, answer_text
+
+# Колонки експорту: (назва, поле для values_list)
+COLUMNS = [
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('session_id', 'session_id'),
+    ('problem_id', 'problem_id'),
+    ('problem_type', 'problem__problem_type__slug'),
+    ('difficulty', 'problem__difficulty'),
+    ('is_correct', 'is_correct'),
+    ('time_taken_ms', 'time_taken_ms'),
+    # Для option_id — значення обраного варіанта (див. _resolve_answers)
+    ('user_answer', 'user_answer'),
+    ('option_id', 'option_id'),
+]
+_ANSWER = [name for name, _ in COLUMNS].index('user_answer')
+_OPTION = [name for name, _ in COLUMNS].index('option_id')
+_PROBLEM = [name for name, _ in COLUMNS].index('problem_id')
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# Рядків на одну вибірку з курсора
+CHUNK_SIZE = 2000
+# Розмір порції тексту, що віддається клієнту (і стискається) за раз
+BUFFER_SIZE = 64 * 1024
+
+
+def parse_date(value):
+    """``YYYY-MM-DD`` -> date; порожнє значення -> None. ValueError для інших."""
+    if not value:
+        return None
+    return datetime.date.fromisoformat(value)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def attempts_queryset(date_from=None, date_to=None, slugs=None, using='default'):
+    """
+    Спроби за діапазоном дат (обидві межі включно, у часовому поясі
+    проєкту) і типами задач. Фільтр по ``timestamp`` — діапазоном, а не
+    ``__date``, щоб працював індекс.
+    """
+    qs = Attempt.objects.using(using)
+    if date_from:
+        qs = qs.filter(timestamp__gte=_day_start(date_from))
+    if date_to:
+        qs = qs.filter(timestamp__lt=_day_start(date_to + datetime.timedelta(days=1)))
+    if slugs:
+        qs = qs.filter(problem__problem_type__slug__in=slugs)
+    return qs.order_by('id')
+
+
+def iter_rows(queryset, chunk_size=CHUNK_SIZE):
+    fields = [field for _, field in COLUMNS]
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    return _resolve_answers(rows, chunk_size, queryset.db)
+
+
+def _resolve_answers(rows, chunk_size, using):
+    """Підставляє значення обраних варіантів у ``user_answer``, порціями по ``chunk_size``."""
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        problem_ids = {row[_PROBLEM] for row in chunk if row[_OPTION] is not None}
+        options = dict(
+            ProblemInstance.objects.using(using).filter(pk__in=problem_ids)
+            .values_list('pk', 'multiple_choice_options')
+        ) if problem_ids else {}
+        for row in chunk:
+            if row[_OPTION] is not None:
+                row = list(row)
+                row[_ANSWER] = answer_text(row[_ANSWER], row[_OPTION], options.get(row[_PROBLEM]))
+                row = tuple(row)
+            yield row
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: повертає рядок замість запису."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in COLUMNS])
+    for row in rows:
+        values = list(row)
+        values[1] = values[1].isoformat()
+        yield writer.writerow(values)
+
+
+def jsonl_lines(rows):
+    names = [name for name, _ in COLUMNS]
+    for row in rows:
+        record = dict(zip(names, row))
+        record['timestamp'] = record['timestamp'].isoformat()
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def _buffered(lines, size=BUFFER_SIZE):
+    """Склеює дрібні рядки в порції байтів близько ``size``."""
+    parts = []
+    length = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield b''.join(parts)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: формат gzip
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(fmt='csv', compress=False, date_from=None, date_to=None, slugs=None,
+                  chunk_size=CHUNK_SIZE, using='default'):
+    """Ітератор байтів експорту; нічого не читає з БД до першої ітерації."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    rows = iter_rows(attempts_queryset(date_from, date_to, slugs, using), chunk_size=chunk_size)
+    lines = csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if compress else chunks
+
+
+def export_filename(fmt, compress=False, date_from=None, date_to=None):
+    parts = ['attempts']
+    if date_from:
+        parts.append(date_from.strftime('%Y%m%d'))
+    if date_to:
+        parts.append(date_to.strftime('%Y%m%d'))
+    name = '-'.join(parts) + f'.{fmt}'
+    return name + '.gz' if compress else name
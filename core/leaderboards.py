@@ -0,0 +1,316 @@
+# core/leaderboards.py
+"""
+Таблиці лідерів за типом задач і складністю — за весь час і за тиждень.
+
+Очки — кількість правильних відповідей; гості в таблицях не беруть участі,
+доки їхні спроби не перенесено на користувача (users.merge).
+
+Джерело правди — ``LeaderboardScore``: кожна вставлена спроба збільшує
+рядки своїх дошок одним UPDATE (``record``), без GROUP BY по Attempt.
+Спроби, збережені під час запиту, записуються в дошки після відповіді
+(``request_finished``): UPDATE/INSERT дошок не додаються до часу відповіді
+й до query_budget ``submit_answer``. Кожен процес тримає для переглянутих дошок відсортований індекс
+(``SortedList`` пар (-очки, user_id)), тож топ-N і місце користувача —
+O(log n). Індекс довантажує лише рядки, змінені з останньої синхронізації,
+не частіше, ніж раз на ``LEADERBOARD_SYNC_INTERVAL`` с.
+
+``manage.py rebuild_leaderboards`` перераховує таблицю з Attempt (після
+масового завантаження даних або для виправлення розбіжностей), видаляє
+старі тижневі дошки й через штамп версії в кеші скидає індекси всіх процесів.
+"""
+import datetime
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncWeek
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from sortedcontainers import SortedList
+
+from core.attempt_journal import attempts_inserted
+from core.models import Attempt, LeaderboardScore, ProblemInstance
+from core.problem_types import problem_types
+from users.merge import guest_attempts_merged
+
+logger = logging.getLogger(__name__)
+
+ALL_TIME = 'all'
+WINDOWS = ('week', ALL_TIME)
+VERSION_KEY = 'leaderboards:version'
+# Рядки, оновлені трохи раніше за попередню синхронізацію, читаються ще раз:
+# транзакція з давнішим ``updated`` могла закомітитись пізніше
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+
+def week_window(when):
+    """ISO-тиждень часової мітки в часовому поясі проєкту: ``2025-W41``."""
+    year, week, _ = timezone.localtime(when).isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def board_key(slug, difficulty, window=ALL_TIME):
+    """Ключ дошки; ``window`` — ``all``, ``week`` (поточний тиждень) або ``YYYY-Www``."""
+    if window == 'week':
+        window = week_window(timezone.now())
+    return f'{slug}:{difficulty}:{window}'
+
+
+def attempt_boards(slug, difficulty, when):
+    return [board_key(slug, difficulty), board_key(slug, difficulty, week_window(when))]
+
+
+class Board:
+    """Відсортований індекс однієї дошки в пам'яті процесу."""
+
+    def __init__(self, key):
+        self.key = key
+        self.scores = {}
+        self.ranking = SortedList()
+        self.synced_at = None
+        self.checked_at = 0.0
+
+    def __len__(self):
+        return len(self.scores)
+
+    def set(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self.ranking.remove((-old, user_id))
+        if score:
+            self.scores[user_id] = score
+            self.ranking.add((-score, user_id))
+        else:
+            self.scores.pop(user_id, None)
+
+    def rank_of_score(self, score):
+        """Місце з таким результатом: 1 + кількість користувачів з більшими очками."""
+        return self.ranking.bisect_left((-score, 0)) + 1
+
+    def rank(self, user_id):
+        """(місце, очки) користувача або None, якщо його немає на дошці."""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.rank_of_score(score), score
+
+    def top(self, n):
+        """Перші ``n`` рядків: [(місце, user_id, очки)]; рівні очки — рівне місце."""
+        return [(self.rank_of_score(-neg), user_id, -neg) for neg, user_id in self.ranking[:n]]
+
+    def sync(self):
+        """Довантажує рядки, змінені з попередньої синхронізації (вперше — усі)."""
+        rows = LeaderboardScore.objects.filter(board=self.key)
+        if self.synced_at is not None:
+            rows = rows.filter(updated__gte=self.synced_at - SYNC_OVERLAP)
+        started = timezone.now()
+        for user_id, score in rows.values_list('user_id', 'score'):
+            self.set(user_id, score)
+        self.synced_at = started
+
+
+_boards = {}
+_version = None
+_lock = threading.Lock()
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_board(key):
+    """Індекс дошки, синхронізований з БД не давніше ``LEADERBOARD_SYNC_INTERVAL`` с тому."""
+    global _version
+    board = _boards.get(key)
+    now = time.monotonic()
+    if board is not None and now - board.checked_at < settings.LEADERBOARD_SYNC_INTERVAL:
+        return board
+    with _lock:
+        version = current_version()
+        if version != _version:
+            _boards.clear()
+            _version = version
+        board = _boards.get(key)
+        if board is None:
+            board = _boards[key] = Board(key)
+        board.sync()
+        board.checked_at = now
+        return board
+
+
+def reset():
+    """Скидає індекси цього процесу; інші процеси — через штамп версії."""
+    global _version
+    with _lock:
+        _boards.clear()
+        _version = None
+
+
+def _problem_info(attempts):
+    """problem_id -> (slug, difficulty); задачі, вже завантажені разом зі спробою, без запиту."""
+    info, missing = {}, set()
+    for attempt in attempts:
+        if Attempt.problem.is_cached(attempt):
+            info[attempt.problem_id] = (attempt.problem.problem_type_id, attempt.problem.difficulty)
+        else:
+            missing.add(attempt.problem_id)
+    if missing:
+        info.update(
+            (pk, (type_id, difficulty)) for pk, type_id, difficulty in
+            ProblemInstance.objects.filter(pk__in=missing).values_list('pk', 'problem_type_id', 'difficulty')
+        )
+    types = problem_types()
+    return {
+        pk: (types.get_by_id(type_id).slug, difficulty)
+        for pk, (type_id, difficulty) in info.items() if types.get_by_id(type_id)
+    }
+
+
+def record(attempts):
+    """
+    Додає очки за вставлені спроби (Attempt або об'єкти з ``user_id``,
+    ``problem_id``, ``is_correct``, ``timestamp``).
+    """
+    attempts = [a for a in attempts if a.user_id and a.is_correct]
+    if not attempts:
+        return
+    problems = _problem_info(attempts)
+    increments = defaultdict(int)
+    for attempt in attempts:
+        if attempt.problem_id in problems:
+            for board in attempt_boards(*problems[attempt.problem_id], attempt.timestamp):
+                increments[board, attempt.user_id] += 1
+
+    # Один UPDATE на (користувач, приріст): зазвичай це обидві дошки спроби
+    groups = defaultdict(list)
+    for (board, user_id), amount in increments.items():
+        groups[user_id, amount].append(board)
+    now = timezone.now()
+    for (user_id, amount), boards in groups.items():
+        updated = LeaderboardScore.objects.filter(user_id=user_id, board__in=boards).update(
+            score=F('score') + amount, updated=now
+        )
+        if updated < len(boards):
+            # Перша правильна відповідь на дошці (напр. новий тиждень): бракуючі
+            # рядки створюються з приростом, наявні (вже оновлені) пропускаються.
+            # Якщо рядок одночасно створить інший процес, приріст загубиться —
+            # такі розбіжності виправляє rebuild_leaderboards
+            LeaderboardScore.objects.bulk_create([
+                LeaderboardScore(board=board, user_id=user_id, score=amount, updated=now)
+                for board in boards
+            ], ignore_conflicts=True)
+        for board in boards:
+            local = _boards.get(board)
+            if local is not None:
+                local.set(user_id, local.scores.get(user_id, 0) + amount)
+
+
+# Спроби, збережені в поточному запиті цього потоку (None — поза запитом)
+_request = threading.local()
+
+
+@receiver(request_started)
+def _request_started(sender, **kwargs):
+    _request.attempts = []
+
+
+@receiver(request_finished)
+def _request_finished(sender, **kwargs):
+    attempts, _request.attempts = getattr(_request, 'attempts', None), None
+    if attempts:
+        try:
+            record(attempts)
+        except Exception:
+            # Відповідь уже віддано; розбіжність виправить rebuild_leaderboards
+            logger.exception("Leaderboard update failed")
+
+
+@receiver(post_save, sender=Attempt)
+def attempt_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        pending = getattr(_request, 'attempts', None)
+        if pending is not None:
+            pending.append(instance)
+        else:
+            record([instance])
+
+
+@receiver(attempts_inserted)
+def journal_flushed(sender, attempts, **kwargs):
+    record(attempts)
+
+
+@receiver(guest_attempts_merged)
+def guest_attempts_moved(sender, user_id, attempt_ids, **kwargs):
+    record(Attempt.objects.filter(pk__in=attempt_ids, is_correct=True).only(
+        'user_id', 'problem_id', 'is_correct', 'timestamp'
+    ))
+
+
+def leaderboard(slug, difficulty, window=ALL_TIME, user_id=None, size=None):
+    """
+    Дошка для показу: ``top`` — [(місце, user_id, очки)], ``me`` — (місце,
+    очки) користувача ``user_id`` або None, ``total`` — учасників.
+    """
+    board = get_board(board_key(slug, difficulty, window))
+    return {
+        'top': board.top(size or settings.LEADERBOARD_SIZE),
+        'me': board.rank(user_id) if user_id else None,
+        'total': len(board),
+    }
+
+
+def rebuild(weeks=None):
+    """
+    Перераховує всі дошки з Attempt (за весь час і за останні ``weeks``
+    тижнів), видаляє давніші тижневі. Повертає кількість рядків.
+    """
+    weeks = weeks if weeks is not None else settings.LEADERBOARD_WEEKS_KEPT
+    types = problem_types()
+    correct = Attempt.objects.filter(user__isnull=False, is_correct=True)
+    scores = defaultdict(dict)
+
+    for user_id, type_id, difficulty, score in correct.values_list(
+        'user_id', 'problem__problem_type_id', 'problem__difficulty'
+    ).annotate(score=Count('id')).order_by():
+        pt = types.get_by_id(type_id)
+        if pt:
+            scores[board_key(pt.slug, difficulty)][user_id] = score
+
+    # Від початку (понеділка) найдавнішого з тижнів, що зберігаються
+    today = timezone.localdate()
+    first_monday = today - datetime.timedelta(days=today.weekday(), weeks=max(weeks - 1, 0))
+    since = timezone.make_aware(datetime.datetime.combine(first_monday, datetime.time.min))
+    weekly = correct.filter(timestamp__gte=since).annotate(week=TruncWeek('timestamp')).values_list(
+        'user_id', 'problem__problem_type_id', 'problem__difficulty', 'week'
+    ).annotate(score=Count('id')).order_by()
+    for user_id, type_id, difficulty, week, score in weekly:
+        pt = types.get_by_id(type_id)
+        if pt:
+            key = board_key(pt.slug, difficulty, week_window(week))
+            scores[key][user_id] = scores[key].get(user_id, 0) + score
+
+    now = timezone.now()
+    with transaction.atomic():
+        LeaderboardScore.objects.all().delete()
+        LeaderboardScore.objects.bulk_create([
+            LeaderboardScore(board=board, user_id=user_id, score=score, updated=now)
+            for board, users in scores.items() for user_id, score in users.items()
+        ], batch_size=1000)
+        transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+    reset()
+    return sum(len(users) for users in scores.values())
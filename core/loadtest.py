@@ -0,0 +1,237 @@
+# core/loadtest.py
+"""
+Навантажувальний тест повного сценарію сесії.
+
+Кожен віртуальний студент проходить ``start_session`` -> 12 x
+(``show_question`` + ``submit_answer``) -> ``result_view`` -> ``share_attempt``
+-> ``share_public`` проти запущеного сервера. Студенти виконуються у пулі
+потоків, кожен зі своїми cookies. Кількість SQL-запитів береться із
+заголовка ``X-DB-Query-Count`` (див. core.middleware.ProfilingMiddleware).
+
+Усі студенти приходять з однієї IP-адреси, тож ділять IP-відро
+core.ratelimit. На 429 студент чекає ``Retry-After`` і повторює
+``submit_answer``; такі відповіді рахуються окремо (``throttled``), а не як
+помилки. Щоб міряти сервер, а не обмежувач, запускайте його з
+``DJANGO_RATELIMIT_ENABLED=0``.
+"""
+import html
+import http.cookiejar
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from core.bench import summarize
+
+# Варіанти вибору постяться як ``option`` (id); ``answer`` — варіанти без id у старих задачах
+OPTION_ID_RE = re.compile(r'name="option"\s+value="(\d+)"')
+OPTION_RE = re.compile(r'name="answer"\s+value="([^"]*)"')
+QUERY_COUNT_HEADER = 'X-DB-Query-Count'
+# Повтори submit_answer після 429 і найдовша пауза між ними, секунд
+SUBMIT_RETRIES = 5
+MAX_RETRY_AFTER = 60
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Редиректи обробляємо самі, щоб міряти кожен endpoint окремо
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def parse_mix(spec):
+    """
+    Розбирає суміш сценаріїв ``"arithmetic:1=3,integrals:3=1"`` у список
+    ``[(slug, difficulty, weight), ...]``. Вага і складність необов'язкові.
+    """
+    mix = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        item, _, weight = item.partition('=')
+        slug, _, difficulty = item.partition(':')
+        mix.append((slug, int(difficulty or 1), float(weight or 1)))
+    if not mix:
+        raise ValueError('Empty scenario mix')
+    return mix
+
+
+class Stats:
+    """Потокобезпечний збирач латентностей, помилок, 429 і кількості запитів до БД."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.throttled = {}
+        self.queries = {}
+        self.sessions_completed = 0
+        self.sessions_failed = 0
+
+    def record(self, endpoint, latency, ok, queries=None, throttled=False):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(latency)
+            self.errors.setdefault(endpoint, 0)
+            self.throttled.setdefault(endpoint, 0)
+            if not ok:
+                self.errors[endpoint] += 1
+            if throttled:
+                self.throttled[endpoint] += 1
+            if queries is not None:
+                self.queries.setdefault(endpoint, []).append(queries)
+
+    def session_done(self, ok):
+        with self._lock:
+            if ok:
+                self.sessions_completed += 1
+            else:
+                self.sessions_failed += 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        total_requests = 0
+        for endpoint, latencies in self.latencies.items():
+            total_requests += len(latencies)
+            stats = summarize(latencies)
+            stats['errors'] = self.errors[endpoint]
+            stats['error_rate'] = round(self.errors[endpoint] / len(latencies), 4)
+            stats['throttled'] = self.throttled[endpoint]
+            queries = self.queries.get(endpoint)
+            if queries:
+                stats['db_queries_mean'] = round(sum(queries) / len(queries), 2)
+                stats['db_queries_max'] = max(queries)
+            endpoints[endpoint] = stats
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total_requests,
+            'requests_per_s': round(total_requests / elapsed, 2) if elapsed else 0.0,
+            'throttled': sum(self.throttled.values()),
+            'sessions_completed': self.sessions_completed,
+            'sessions_failed': self.sessions_failed,
+            'endpoints': endpoints,
+        }
+
+
+class Student:
+    """Один віртуальний студент: власні cookies і послідовний сценарій."""
+
+    def __init__(self, base_url, stats, think_time=0.0, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.think_time = think_time
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect,
+        )
+
+    def request(self, endpoint, path, data=None, retries=0):
+        """
+        Виконує запит і повертає (status, location, body). На 429 чекає
+        ``Retry-After`` і повторює до ``retries`` разів; помилкою вважається
+        лише 429, після якого повторів не лишилось.
+        """
+        url = urllib.parse.urljoin(self.base_url + '/', path.lstrip('/'))
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        for retry in range(retries + 1):
+            status, headers, content = self._open(endpoint, url, body, last=retry == retries)
+            if status != 429 or retry == retries:
+                break
+            try:
+                delay = float(headers.get('Retry-After') or 1)
+            except ValueError:
+                delay = 1
+            time.sleep(min(max(delay, 0), MAX_RETRY_AFTER))
+        return status, headers.get('Location') if headers else None, content
+
+    def _open(self, endpoint, url, body, last=True):
+        """Один запит: (status, headers, body); status 0 — мережева помилка."""
+        started = time.perf_counter()
+        try:
+            resp = self.opener.open(url, data=body, timeout=self.timeout)
+        except urllib.error.HTTPError as exc:
+            # 3xx без обробника редиректів теж приходять сюди
+            resp = exc
+        except (urllib.error.URLError, OSError):
+            self.stats.record(endpoint, time.perf_counter() - started, ok=False)
+            return 0, None, ''
+        with resp:
+            content = resp.read().decode('utf-8', errors='replace')
+            status = resp.getcode()
+            headers = resp.headers
+        queries = headers.get(QUERY_COUNT_HEADER)
+        self.stats.record(
+            endpoint,
+            time.perf_counter() - started,
+            ok=status < 400 or (status == 429 and not last),
+            queries=int(queries) if queries is not None else None,
+            throttled=status == 429,
+        )
+        return status, headers, content
+
+    def think(self):
+        if self.think_time > 0:
+            time.sleep(random.uniform(0, 2 * self.think_time))
+
+    @staticmethod
+    def answer(page):
+        """Дані форми відповіді: випадковий варіант або випадкове число."""
+        option_ids = OPTION_ID_RE.findall(page)
+        if option_ids:
+            return {'option': random.choice(option_ids)}
+        options = [html.unescape(v) for v in OPTION_RE.findall(page)]
+        return {'answer': random.choice(options) if options else str(random.randint(-20, 20))}
+
+    def run(self, slug, difficulty):
+        """Проходить одну сесію. Повертає True, якщо дійшли до share_public."""
+        status, location, _ = self.request('start_session', f'/start/{slug}/?difficulty={difficulty}')
+        if status != 302 or not location or '/question/' not in location:
+            return False
+
+        while location and '/question/' in location:
+            status, _, page = self.request('show_question', location)
+            if status != 200:
+                return False
+            pk = location.rstrip('/').rsplit('/', 1)[-1]
+            self.think()
+            status, location, _ = self.request('submit_answer', f'/submit/{pk}/', self.answer(page),
+                                               retries=SUBMIT_RETRIES)
+            if status != 302:
+                return False
+
+        if not location or '/result/' not in location:
+            return False
+        status, _, _ = self.request('result_view', location)
+        if status != 200:
+            return False
+
+        attempt_id = location.rstrip('/').rsplit('/', 1)[-1]
+        status, location, _ = self.request('share_attempt', f'/share/{attempt_id}/')
+        if status != 302 or not location:
+            return False
+        status, _, _ = self.request('share_public', location)
+        return status == 200
+
+
+def run_load(base_url, students, concurrency, mix, think_time=0.0, timeout=30, seed=None):
+    """
+    Запускає ``students`` сесій з не більш ніж ``concurrency`` одночасними.
+    Сценарій (slug, складність) для кожної сесії вибирається з ``mix`` за вагою.
+    """
+    rng = random.Random(seed)
+    scenarios = rng.choices(
+        [(slug, difficulty) for slug, difficulty, _ in mix],
+        weights=[weight for _, _, weight in mix],
+        k=students,
+    )
+    stats = Stats()
+
+    def one_session(scenario):
+        student = Student(base_url, stats, think_time=think_time, timeout=timeout)
+        stats.session_done(student.run(*scenario))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_session, scenarios))
+    return stats.report(time.perf_counter() - started)
@@ -0,0 +1,96 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import bench
+from core.views import PROBLEM_REGISTRY
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / 'bench_corpus.json'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark problem generators and answer checkers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=str(DEFAULT_CORPUS),
+                            help='Path to the answer corpus (JSON)')
+        parser.add_argument('--build-corpus', action='store_true',
+                            help='Regenerate the answer corpus and exit')
+        parser.add_argument('--per-case', type=int, default=5,
+                            help='Problems per slug and difficulty when building the corpus')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed for building the corpus')
+        parser.add_argument('--suite', action='append', choices=sorted(bench.SUITES),
+                            help='Suite to run (repeatable, default: all)')
+        parser.add_argument('--slugs', default='',
+                            help='Comma-separated slugs to benchmark (default: all)')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='generate() calls per slug and difficulty')
+        parser.add_argument('--batch-size', type=int, default=12,
+                            help='Problems per generate_batch() call in the batch suite')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='check() calls per corpus answer')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='Compare against a saved results file and flag regressions')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed slowdown before a regression is flagged (0.25 = +25%%)')
+
+    def handle(self, *args, **options):
+        registry = PROBLEM_REGISTRY
+        if options['slugs']:
+            wanted = [s.strip() for s in options['slugs'].split(',') if s.strip()]
+            unknown = set(wanted) - set(registry)
+            if unknown:
+                raise CommandError(f"Unknown slugs: {', '.join(sorted(unknown))}")
+            registry = {slug: registry[slug] for slug in wanted}
+
+        if options['build_corpus']:
+            corpus = bench.build_corpus(registry, per_case=options['per_case'], seed=options['seed'])
+            bench.save_json(options['corpus'], corpus)
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {len(corpus)} corpus cases to {options['corpus']}"
+            ))
+            return
+
+        try:
+            corpus = bench.load_json(options['corpus'])
+        except OSError as exc:
+            raise CommandError(f"Cannot read corpus: {exc}. Run with --build-corpus first.")
+
+        report = bench.run(
+            registry, corpus,
+            suites=options['suite'],
+            iterations=options['iterations'],
+            repeat=options['repeat'],
+            batch_size=options['batch_size'],
+        )
+
+        self.stdout.write(f"{'benchmark':<40} {'n':>6} {'ops/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+        for key, stats in sorted(report['results'].items()):
+            self.stdout.write(
+                f"{key:<40} {stats['count']:>6} {stats['throughput_per_s']:>10} "
+                f"{stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['p99_ms']:>10.3f}"
+            )
+        for m in report['mismatches']:
+            self.stdout.write(self.style.WARNING(
+                f"Unexpected verdict [{m['slug']}/{m['kind']}]: {m['answer']!r} vs {m['canonical_answer']!r}"
+            ))
+
+        if options['output']:
+            bench.save_json(options['output'], report)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['compare']:
+            try:
+                baseline = bench.load_json(options['compare'])
+            except OSError as exc:
+                raise CommandError(f"Cannot read baseline: {exc}")
+            regressions = bench.compare(report, baseline, threshold=options['threshold'])
+            for r in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"REGRESSION {r['key']} {r['metric']}: {r['baseline']} -> {r['current']} ms (x{r['ratio']})"
+                ))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.views import PROBLEM_REGISTRY
+from exercises.catalog import ProblemCatalog, build_catalog
+
+
+class Command(BaseCommand):
+    help = 'Enumerate finite problem spaces into a memory-mapped catalog file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.PROBLEM_CATALOG_PATH),
+                            help='Catalog path (default: PROBLEM_CATALOG_PATH)')
+        parser.add_argument('--slugs', default='',
+                            help='Comma-separated slugs to include (default: all enumerable)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed for multiple-choice distractors')
+
+    def handle(self, *args, **options):
+        registry = PROBLEM_REGISTRY
+        if options['slugs']:
+            wanted = [s.strip() for s in options['slugs'].split(',') if s.strip()]
+            unknown = set(wanted) - set(registry)
+            if unknown:
+                raise CommandError(f"Unknown slugs: {', '.join(sorted(unknown))}")
+            registry = {slug: registry[slug] for slug in wanted}
+
+        started = time.perf_counter()
+        counts = build_catalog(registry, options['output'], seed=options['seed'])
+        if not counts:
+            raise CommandError('None of the selected generators has an enumerable problem space')
+
+        catalog = ProblemCatalog(options['output'])
+        size_kb = len(catalog._mm) / 1024
+        catalog.close()
+        for slug, count in counts.items():
+            self.stdout.write(f"{slug:<15} {count:>6} problems")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {sum(counts.values())} problems ({size_kb:.0f} KiB) to {options['output']} "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exports
+from core.db_router import replica_alias
+
+
+class Command(BaseCommand):
+    help = 'Stream attempts (joined with problem type, difficulty and user) as CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv',
+                            help='Output format (default: csv)')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the output with gzip')
+        parser.add_argument('--from', dest='date_from',
+                            help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to',
+                            help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--type', dest='types', action='append', default=[],
+                            help='Problem type slug to include (repeatable, default: all)')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE,
+                            help='Rows fetched from the database cursor at a time')
+        parser.add_argument('--database', default=None,
+                            help='Database alias to read from (default: the replica if healthy)')
+        parser.add_argument('--output', '-o',
+                            help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = exports.parse_date(options['date_from'])
+            date_to = exports.parse_date(options['date_to'])
+        except ValueError:
+            raise CommandError('Dates must be YYYY-MM-DD')
+
+        stream = exports.export_stream(
+            options['format'], options['gzip'], date_from, date_to, options['types'],
+            chunk_size=options['chunk_size'], using=options['database'] or replica_alias(),
+        )
+        if options['output']:
+            with open(options['output'], 'wb') as fh:
+                written = sum(fh.write(chunk) for chunk in stream)
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}")
+        else:
+            out = sys.stdout.buffer
+            for chunk in stream:
+                out.write(chunk)
+            out.flush()
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import attempt_journal
+
+
+class Command(BaseCommand):
+    help = 'Insert closed and orphaned write-behind attempt journal segments into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=settings.ATTEMPT_JOURNAL_DIR,
+                            help='Journal directory (default: ATTEMPT_JOURNAL_DIR)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for segments')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            segments, rows = attempt_journal.recover(options['directory'])
+            if segments or not options['loop']:
+                self.stdout.write(f"Flushed {segments} segment(s), {rows} attempt(s)")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
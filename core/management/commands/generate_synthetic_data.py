@@ -0,0 +1,105 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import synthetic
+from core.models import Attempt, ProblemInstance, ShareResult
+from core.views import PROBLEM_REGISTRY
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic production-scale dataset (users, problems, attempts, shares)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Registered users to create')
+        parser.add_argument('--attempts', type=int, default=100000,
+                            help='Attempts to create (in sessions of 12)')
+        parser.add_argument('--days', type=int, default=180,
+                            help='Spread activity over this many past days')
+        parser.add_argument('--guest-ratio', type=float, default=0.3,
+                            help='Share of sessions played by guests')
+        parser.add_argument('--share-ratio', type=float, default=0.05,
+                            help='Share of sessions that create a ShareResult')
+        parser.add_argument('--pool-size', type=int, default=200,
+                            help='Distinct generated problems per type and difficulty')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per bulk_create/COPY batch')
+        parser.add_argument('--method', choices=['auto', 'bulk_create', 'copy'], default='auto',
+                            help='Loading method (auto: COPY on PostgreSQL, bulk_create otherwise)')
+        parser.add_argument('--password', default=None,
+                            help='Password for the synthetic users (default: unusable)')
+        parser.add_argument('--prefix', default='synth',
+                            help='Username prefix of the synthetic users')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed')
+        parser.add_argument('--database', default='default',
+                            help='Database alias to load into')
+        parser.add_argument('--force', action='store_true',
+                            help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to load synthetic data with DEBUG off; pass --force')
+
+        User = get_user_model()
+        self.expected = {
+            User: options['users'],
+            ProblemInstance: options['attempts'],
+            Attempt: options['attempts'],
+        }
+        self.started = time.perf_counter()
+        self.last_report = 0.0
+        loader = synthetic.Loader(
+            [User, ProblemInstance, Attempt, ShareResult],
+            batch_size=options['batch_size'],
+            using=options['database'],
+            method=None if options['method'] == 'auto' else options['method'],
+            progress=self.report_progress,
+        )
+        self.stdout.write(f"Loading with {loader.method} into '{options['database']}'")
+
+        try:
+            result = synthetic.generate_dataset(
+                loader, PROBLEM_REGISTRY,
+                users=options['users'],
+                attempts=options['attempts'],
+                days=options['days'],
+                guest_ratio=options['guest_ratio'],
+                share_ratio=options['share_ratio'],
+                pool_size=options['pool_size'],
+                password=options['password'],
+                prefix=options['prefix'],
+                seed=options['seed'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f"\n{'table':<25} {'rows':>12} {'load s':>10} {'rows/s':>12}")
+        for model, count in loader.counts.items():
+            seconds = loader.seconds[model]
+            rate = count / seconds if seconds else 0
+            self.stdout.write(f"{model._meta.db_table:<25} {count:>12,} {seconds:>10.1f} {rate:>12,.0f}")
+        total = sum(loader.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total:,} rows ({result['sessions']:,} sessions) in {elapsed:.1f}s, "
+            f"{total / elapsed:,.0f} rows/s overall"
+        ))
+
+    def report_progress(self, loader):
+        now = time.perf_counter()
+        if now - self.last_report < 2.0:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        done = loader.counts[Attempt]
+        target = self.expected[Attempt] or 1
+        rate = done / elapsed if elapsed else 0
+        eta = (target - done) / rate if rate else 0
+        self.stdout.write(
+            f"  attempts {done:,}/{target:,} ({done / target:.1%}) "
+            f"{rate:,.0f}/s, eta {eta:,.0f}s"
+        )
@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import parse_mix, run_load
+
+
+class Command(BaseCommand):
+    help = 'Simulate concurrent students going through the full session flow against a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help='Server to load (default: http://127.0.0.1:8000)')
+        parser.add_argument('--students', type=int, default=20,
+                            help='Total number of simulated sessions')
+        parser.add_argument('--concurrency', type=int, default=5,
+                            help='Sessions running at the same time')
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help='Mean pause before each answer, seconds')
+        parser.add_argument('--mix', default='arithmetic:1',
+                            help='Scenario mix "slug:difficulty=weight,...", '
+                                 'e.g. "arithmetic:1=3,integrals:3=1"')
+        parser.add_argument('--timeout', type=float, default=30,
+                            help='Per-request timeout, seconds')
+        parser.add_argument('--seed', type=int, help='Seed for the scenario mix')
+        parser.add_argument('--output', help='Write the report as JSON to this file')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(f"Invalid --mix: {exc}")
+        if options['students'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--students and --concurrency must be positive')
+
+        self.stdout.write(
+            f"Running {options['students']} sessions, concurrency {options['concurrency']} "
+            f"against {options['base_url']}..."
+        )
+        report = run_load(
+            options['base_url'],
+            students=options['students'],
+            concurrency=options['concurrency'],
+            mix=mix,
+            think_time=options['think_time'],
+            timeout=options['timeout'],
+            seed=options['seed'],
+        )
+
+        self.stdout.write(
+            f"{report['sessions_completed']} sessions completed, {report['sessions_failed']} failed, "
+            f"{report['requests']} requests in {report['elapsed_s']}s ({report['requests_per_s']} req/s)"
+        )
+        if report['throttled']:
+            self.stdout.write(self.style.WARNING(
+                f"{report['throttled']} responses were rate limited (429); "
+                f"run the server with DJANGO_RATELIMIT_ENABLED=0 to measure it without the limiter"
+            ))
+        self.stdout.write(
+            f"{'endpoint':<16} {'n':>6} {'err%':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}"
+        )
+        for endpoint, s in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<16} {s['count']:>6} {s['error_rate'] * 100:>6.1f}% "
+                f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} "
+                f"{s.get('db_queries_mean', '-'):>8}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=1)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
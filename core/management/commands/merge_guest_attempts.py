@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users import merge
+
+
+class Command(BaseCommand):
+    help = 'Move queued guest attempts to the users who logged in, in indexed batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.GUEST_MERGE_BATCH_SIZE,
+                            help='Attempts updated per transaction')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Process at most this many jobs per pass')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            jobs, merged = merge.process_pending(options['batch_size'], options['limit'])
+            if jobs or not options['loop']:
+                self.stdout.write(f"Processed {jobs} job(s), moved {merged} attempt(s)")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
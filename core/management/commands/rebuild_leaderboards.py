@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Recompute leaderboard scores from attempts and drop old weekly boards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=settings.LEADERBOARD_WEEKS_KEPT,
+                            help='Weekly boards to keep, including the current week')
+
+    def handle(self, *args, **options):
+        rows = leaderboards.rebuild(options['weeks'])
+        self.stdout.write(f"Rebuilt leaderboards: {rows} score row(s)")
@@ -0,0 +1,103 @@
+# core/metrics.py
+"""
+Метрики Prometheus для генераторів, перевірок і view.
+
+Під gunicorn метрики агрегуються між воркерами через multiprocess-режим
+prometheus_client: змінна ``PROMETHEUS_MULTIPROC_DIR`` задається в
+``gunicorn.conf.py`` до імпорту цього модуля. Без неї (runserver, тести)
+використовується звичайний реєстр процесу.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+# Межі гістограм, с: від швидкої арифметики до sympy.integrate
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROBLEM_CALLS = Counter(
+    'trainmath_problem_calls_total',
+    'Calls of BaseProblem.generate/check by slug, difficulty and verdict',
+    ['operation', 'slug', 'difficulty', 'verdict'],
+)
+PROBLEM_LATENCY = Histogram(
+    'trainmath_problem_duration_seconds',
+    'Latency of BaseProblem.generate/check',
+    ['operation', 'slug', 'difficulty'],
+    buckets=LATENCY_BUCKETS,
+)
+VIEW_REQUESTS = Counter(
+    'trainmath_view_requests_total',
+    'Requests by view, method and status code',
+    ['view', 'method', 'status'],
+)
+VIEW_LATENCY = Histogram(
+    'trainmath_view_duration_seconds',
+    'Request latency by view',
+    ['view'],
+    buckets=LATENCY_BUCKETS,
+)
+SESSIONS_STARTED = Counter(
+    'trainmath_sessions_started_total',
+    'Practice sessions started',
+    ['slug', 'difficulty'],
+)
+SESSIONS_COMPLETED = Counter(
+    'trainmath_sessions_completed_total',
+    'Practice sessions with the last question answered',
+    ['slug', 'difficulty'],
+)
+RATE_LIMITED = Counter(
+    'trainmath_rate_limited_total',
+    'Requests rejected with 429 by rule and the scope (user, session, ip) that ran out',
+    ['rule', 'scope'],
+)
+
+
+def check_verdict(is_correct, feedback):
+    """Вердикт для метрик: correct / incorrect / invalid (не розпізнано)."""
+    if is_correct:
+        return 'correct'
+    return 'invalid' if feedback else 'incorrect'
+
+
+@contextmanager
+def track_problem(operation, slug, difficulty):
+    """
+    Міряє виклик generate/check. Yield-ить dict, у який можна записати
+    ``verdict``; за замовчуванням ``ok``, при винятку — ``error``.
+    """
+    outcome = {'verdict': 'ok'}
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome['verdict'] = 'error'
+        raise
+    finally:
+        PROBLEM_LATENCY.labels(operation, slug, str(difficulty)).observe(time.perf_counter() - started)
+        PROBLEM_CALLS.labels(operation, slug, str(difficulty), outcome['verdict']).inc()
+
+
+def observe_view(view, method, status, seconds):
+    VIEW_REQUESTS.labels(view, method, str(status)).inc()
+    VIEW_LATENCY.labels(view).observe(seconds)
+
+
+def render_latest():
+    """Повертає (body, content_type) у текстовому форматі Prometheus."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
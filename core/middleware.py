@@ -0,0 +1,100 @@
+# core/middleware.py
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core import metrics, profiling
+
+perf_logger = logging.getLogger('trainmath.perf')
+
+
+class ProfilingMiddleware:
+    """
+    Міряє фази кожного запиту (SQL, сесія, генерація/перевірка задач,
+    шаблони; див. core.profiling) і віддає результат:
+
+    - заголовком ``Server-Timing`` (``PERF_SERVER_TIMING``);
+    - заголовком ``X-DB-Query-Count`` для ``manage.py loadtest``
+      (``QUERY_COUNT_HEADER``);
+    - вибірковим структурованим логом у ``trainmath.perf``
+      (``PERF_LOG_SAMPLE_RATE``) і попередженням з найдовшими SQL-запитами
+      для запитів, повільніших за ``PERF_SLOW_REQUEST_MS``.
+
+    Має стояти якомога вище (до SessionMiddleware), щоб враховувати
+    збереження сесії. Вимикається ``PERF_PROFILING = False``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_PROFILING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', False)
+        self.query_count_header = getattr(settings, 'QUERY_COUNT_HEADER', False)
+        self.sample_rate = getattr(settings, 'PERF_LOG_SAMPLE_RATE', 0.0)
+        self.slow_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', None)
+
+    def __call__(self, request):
+        profile, token = profiling.start_profile()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(profiling.query_timer))
+                response = self.get_response(request)
+        finally:
+            profiling.end_profile(token)
+
+        if self.server_timing:
+            response['Server-Timing'] = profile.server_timing()
+        if self.query_count_header:
+            response['X-DB-Query-Count'] = str(len(profile.queries))
+        self.log(request, response, profile)
+        return response
+
+    def log(self, request, response, profile):
+        total_ms = profile.elapsed * 1000
+        slow = self.slow_ms is not None and total_ms >= self.slow_ms
+        if not slow and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            **profile.as_dict(),
+        }
+        if slow:
+            record['top_queries'] = profile.top_queries()
+            perf_logger.warning('slow request %s', json.dumps(record, ensure_ascii=False))
+        else:
+            perf_logger.info('request %s', json.dumps(record, ensure_ascii=False))
+
+
+class MetricsMiddleware:
+    """
+    Рахує запити й латентність по view (ім'я URL) для /metrics.
+    Вимикається ``METRICS_ENABLED = False``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        metrics.observe_view(
+            match.view_name if match else 'unresolved',
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+        )
+        return response
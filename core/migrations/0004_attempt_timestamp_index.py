@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_probleminstance_multiple_choice_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attempt',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_attempt_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attempt',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='probleminstance',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='shareresult',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
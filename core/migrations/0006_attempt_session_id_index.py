@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_historical_timestamps'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attempt',
+            name='session_id',
+            field=models.CharField(blank=True, db_index=True, max_length=128, null=True),
+        ),
+    ]
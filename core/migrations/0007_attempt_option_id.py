@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_attempt_session_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='option_id',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
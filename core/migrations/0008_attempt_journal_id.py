@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_attempt_option_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='journal_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_attempt_journal_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shareresult',
+            name='session_key',
+            field=models.CharField(blank=True, editable=False, max_length=200, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='shareresult',
+            name='snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
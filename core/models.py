@@ -1,8 +1,11 @@
 # core/models.py
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
+from exercises.base import find_option
+
 class ProblemType(models.Model):
     slug = models.SlugField(unique=True)
     name = models.CharField(max_length=200)
@@ -20,20 +23,61 @@ class ProblemInstance(models.Model):
     question_text = models.TextField()
     canonical_answer = models.TextField()
     multiple_choice_options = models.JSONField(null=True, blank=True)
-    created = models.DateTimeField(auto_now_add=True)
+    # default замість auto_now_add: масове завантаження (manage.py
+    # generate_synthetic_data) задає історичні часові мітки
+    created = models.DateTimeField(default=timezone.now)
 
 class Attempt(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
-    session_id = models.CharField(max_length=128, null=True, blank=True)  # for guests
+    session_id = models.CharField(max_length=128, null=True, blank=True, db_index=True)  # for guests
     problem = models.ForeignKey(ProblemInstance, on_delete=models.CASCADE)
-    user_answer = models.TextField()
+    user_answer = models.TextField()  # порожній, якщо обрано варіант (option_id)
+    option_id = models.PositiveSmallIntegerField(null=True, blank=True)
     is_correct = models.BooleanField()
     time_taken_ms = models.PositiveIntegerField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+    # Ідентифікатор рядка журналу write-behind (core.attempt_journal):
+    # повторна вставка того самого рядка після збою ігнорується
+    journal_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    @property
+    def answer_text(self):
+        """Відповідь для показу: введений текст або значення обраного варіанта."""
+        return answer_text(self.user_answer, self.option_id, self.problem.multiple_choice_options)
+
+
+def answer_text(user_answer, option_id, options):
+    if option_id is None:
+        return user_answer
+    option = find_option(options, option_id)
+    return option['value'] if option else user_answer
 
 class ShareResult(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     attempt = models.ForeignKey(Attempt, on_delete=models.CASCADE)
     public = models.BooleanField(default=True)
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(default=timezone.now)
     expires_at = models.DateTimeField(null=True, blank=True)
+    # Сесія, якою поділились (див. core.views.share_key): повторне поширення
+    # повертає те саме посилання. Порожній у посилань, створених раніше
+    session_key = models.CharField(max_length=200, null=True, blank=True, unique=True, editable=False)
+    # Заморожені дані сторінки (core.views.share_snapshot): показ посилання —
+    # читання одного рядка, і сторінка не змінюється після поширення
+    snapshot = models.JSONField(null=True, blank=True, editable=False)
+
+
+class LeaderboardScore(models.Model):
+    """Очки користувача на дошці лідерів (core.leaderboards)."""
+    board = models.CharField(max_length=64)  # "<slug>:<difficulty>:<all|YYYY-Www>"
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_scores')
+    score = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'user'], name='unique_leaderboard_user'),
+        ]
+        indexes = [
+            # Довантаження змінених рядків дошки процесами
+            models.Index(fields=['board', 'updated'], name='leaderboard_board_updated'),
+        ]
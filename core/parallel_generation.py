@@ -0,0 +1,185 @@
+# core/parallel_generation.py
+"""
+Паралельна генерація задач сесії в локальному пулі процесів.
+
+Коли задач типу немає в каталозі (exercises.catalog), ``start_session``
+генерує 12 задач послідовно, і для дорогих типів (``integrals`` складності 3
+— ``sp.integrate`` сум exp/trig) це помітно. З ``GENERATION_POOL_ENABLED``
+слоти сесії для типів з ``GENERATION_POOL_SLUGS`` генеруються паралельно в
+пулі ``GENERATION_POOL_WORKERS`` процесів.
+
+Пул належить веб-процесу (ProcessPoolExecutor не можна розділити між
+воркерами gunicorn), тож без ліміту на хості було б ``workers ×
+GENERATION_POOL_WORKERS`` процесів пулу. Тому пул отримують лише воркери,
+що зайняли один із ``GENERATION_POOL_MAX_PROCESSES // GENERATION_POOL_WORKERS``
+слотів хоста (``flock`` на файл у ``GENERATION_POOL_LOCK_DIR``, знімається із
+завершенням воркера); решта генерує слоти послідовно з тими самими seed.
+
+Кожен слот має власний seed, похідний від seed сесії (``slot_seed``), і
+генерується ``generate_batch(difficulty, 1, seed=...)`` — тож результат
+не залежить від того, який процес пулу і коли його виконав, і сесію можна
+відтворити за її seed. Слоти, не готові за ``GENERATION_DEADLINE_MS``,
+генеруються в процесі запиту з тим самим seed за найпростішими шаблонами
+(складність 1) і зберігаються з цією складністю; ``fallback_slots`` називає
+їх, щоб сесію можна було відтворити (``start_session`` зберігає їх у сесії).
+
+Процеси пулу запускаються через ``spawn`` (без fork-у процесу з потоками
+й з'єднаннями з БД) і імпортують лише модулі генераторів, без Django.
+"""
+import fcntl
+import hashlib
+import importlib
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Складність шаблонів для слотів, що не встигли до дедлайну
+FALLBACK_DIFFICULTY = 1
+
+
+def slot_seed(session_seed, slot):
+    """Seed слоту: стабільний між процесами й запусками (не залежить від hash())."""
+    digest = hashlib.blake2b(f'{session_seed}:{slot}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+# Генератори в процесах пулу: шлях класу -> екземпляр
+_generators = {}
+
+
+def _generator(path):
+    gen = _generators.get(path)
+    if gen is None:
+        module, _, name = path.rpartition('.')
+        gen = _generators[path] = getattr(importlib.import_module(module), name)()
+    return gen
+
+
+def _generate_slot(path, difficulty, seed):
+    """Виконується в процесі пулу."""
+    return _generator(path).generate_batch(difficulty, 1, seed=seed)[0]
+
+
+def _warm(paths):
+    for path in paths:
+        _generator(path)
+
+
+_pool = None
+# Файл зайнятого слота хоста: блокування тримається до завершення процесу
+_pool_slot = None
+_pool_lock = threading.Lock()
+
+
+def _claim_slot():
+    """Займає вільний слот пулу на хості; повертає відкритий файл слота або None."""
+    directory = Path(settings.GENERATION_POOL_LOCK_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for slot in range(settings.GENERATION_POOL_MAX_PROCESSES // settings.GENERATION_POOL_WORKERS):
+        f = open(directory / f'{slot}.lock', 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            continue
+        return f
+    return None
+
+
+def get_pool():
+    """Пул процесу або None, якщо всі слоти хоста зайняті іншими воркерами."""
+    global _pool, _pool_slot
+    with _pool_lock:
+        if _pool is None:
+            if _pool_slot is None:
+                _pool_slot = _claim_slot()
+                if _pool_slot is None:
+                    return None
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.GENERATION_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_pool(generators):
+    """Запускає процеси пулу й імпортує в них генератори (до першої сесії)."""
+    pool = get_pool()
+    if pool is None:
+        return
+    paths = [class_path(gen) for gen in generators]
+    for _ in range(settings.GENERATION_POOL_WORKERS):
+        pool.submit(_warm, paths)
+
+
+def class_path(gen):
+    return f'{type(gen).__module__}.{type(gen).__qualname__}'
+
+
+def generate_session(gen, difficulty, n, seed, deadline_ms=None):
+    """
+    ``n`` задач для ``gen`` у форматі ``generate``; задача, згенерована за
+    запасними шаблонами, має ключ ``difficulty``. Порядок слотів зберігається.
+    """
+    deadline_ms = settings.GENERATION_DEADLINE_MS if deadline_ms is None else deadline_ms
+    seeds = [slot_seed(seed, slot) for slot in range(n)]
+    path = class_path(gen)
+    results = [None] * n
+
+    pool = get_pool()
+    if pool is None:
+        # Слоти хоста зайняті: послідовно, з тими самими seed і без дедлайну
+        return [gen.generate_batch(difficulty, 1, seed=s)[0] for s in seeds]
+    started = time.perf_counter()
+    try:
+        futures = {pool.submit(_generate_slot, path, difficulty, s): slot for slot, s in enumerate(seeds)}
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        futures = {}
+    done, pending = wait(futures, timeout=deadline_ms / 1000)
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except BrokenProcessPool:
+            _discard_pool(pool)
+        except Exception:
+            logger.exception("Generating %s slot %s failed", path, futures[future])
+    for future in pending:
+        # Уже запущені слоти дорахуються у фоні й будуть відкинуті
+        future.cancel()
+
+    # Слоти після дедлайну або з помилкою
+    missing = [slot for slot, result in enumerate(results) if result is None]
+    if missing:
+        logger.warning(
+            "%s of %s %s slots not ready by the %s ms deadline (%.0f ms); using difficulty %s patterns",
+            len(missing), n, gen.slug, deadline_ms, (time.perf_counter() - started) * 1000,
+            FALLBACK_DIFFICULTY,
+        )
+    for slot in missing:
+        results[slot] = {
+            **gen.generate_batch(FALLBACK_DIFFICULTY, 1, seed=seeds[slot])[0],
+            'difficulty': FALLBACK_DIFFICULTY,
+        }
+    return results
+
+
+def fallback_slots(batch):
+    """Номери слотів ``generate_session``, згенерованих за запасними шаблонами."""
+    return [slot for slot, data in enumerate(batch) if 'difficulty' in data]
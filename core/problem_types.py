@@ -0,0 +1,104 @@
+# core/problem_types.py
+"""
+Каталог типів задач (ProblemType) у пам'яті процесу.
+
+Таблиця змінюється кілька разів на рік, а читається на кожній сесії й
+відповіді. ``problem_types()`` повертає каталог, завантажений одним запитом,
+з пошуком за slug та id без звернень до БД.
+
+Інвалідація між воркерами — через штамп версії в кеші Django
+(``VERSION_KEY``): збереження чи видалення ProblemType (адмінка,
+``populate_problem_types``) після коміту записує новий штамп, а кожен процес
+порівнює свій штамп із кешем не частіше, ніж раз на
+``PROBLEM_TYPES_CHECK_INTERVAL`` с. Щоб це працювало між воркерами
+gunicorn, кеш має бути спільним (Redis або файловий, див. settings).
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404
+
+from core.models import ProblemType
+
+VERSION_KEY = 'problem_types:version'
+
+
+class ProblemTypeCatalog:
+    """Незмінний знімок таблиці ProblemType (у порядку id)."""
+
+    def __init__(self, types, version):
+        self.version = version
+        self._by_slug = {pt.slug: pt for pt in types}
+        self._by_id = {pt.pk: pt for pt in types}
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def get(self, slug):
+        return self._by_slug.get(slug)
+
+    def get_by_id(self, pk):
+        return self._by_id.get(pk)
+
+    def get_or_404(self, slug):
+        pt = self._by_slug.get(slug)
+        if pt is None:
+            raise Http404(f"No problem type {slug!r}")
+        return pt
+
+    def filter(self, slugs):
+        slugs = set(slugs)
+        return [pt for pt in self if pt.slug in slugs]
+
+
+_catalog = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def current_version():
+    """Штамп версії з кешу; якщо його немає (холодний кеш), створює."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def problem_types():
+    global _catalog, _checked_at
+    catalog = _catalog
+    now = time.monotonic()
+    if catalog is not None and now - _checked_at < settings.PROBLEM_TYPES_CHECK_INTERVAL:
+        return catalog
+    version = current_version()
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = ProblemTypeCatalog(list(ProblemType.objects.order_by('pk')), version)
+        _checked_at = now
+        return _catalog
+
+
+def bump_version():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate():
+    """Скидає каталог цього процесу; інші процеси — через ``bump_version``."""
+    global _catalog
+    _catalog = None
+
+
+@receiver([post_save, post_delete], sender=ProblemType)
+def problem_type_changed(sender, **kwargs):
+    invalidate()
+    transaction.on_commit(bump_version)
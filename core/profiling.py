@@ -0,0 +1,178 @@
+# core/profiling.py
+"""
+Профілювання запитів по фазах: SQL, сесія, генерація, перевірка, шаблони.
+
+``ProfilingMiddleware`` (core/middleware.py) створює ``RequestProfile`` на
+кожен запит і кладе його в contextvar; код позначає фази через
+``with phase('check'): ...``. Поза запитом ``phase`` нічого не робить.
+``query_budget`` обмежує кількість SQL-запитів окремого view.
+"""
+import contextvars
+import functools
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+perf_logger = logging.getLogger('trainmath.perf')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+# Таблиця сесій Django: запити до неї рахуються як фаза session
+SESSION_TABLE = 'django_session'
+
+
+class RequestProfile:
+    """Накопичує тривалість фаз і SQL-запити одного запиту."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = []
+
+    def add(self, name, seconds):
+        total, count = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (total + seconds, count + 1)
+
+    def add_query(self, sql, seconds):
+        self.queries.append((sql, seconds))
+        self.add('db', seconds)
+        if SESSION_TABLE in sql:
+            self.add('session', seconds)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def duration_ms(self, name):
+        return self.phases.get(name, (0.0, 0))[0] * 1000
+
+    def top_queries(self, limit=5, max_sql=300):
+        ordered = sorted(self.queries, key=lambda q: q[1], reverse=True)[:limit]
+        return [{'sql': sql[:max_sql], 'ms': round(seconds * 1000, 2)} for sql, seconds in ordered]
+
+    def server_timing(self):
+        """Значення заголовка Server-Timing."""
+        parts = []
+        for name, (total, count) in self.phases.items():
+            entry = f'{name};dur={total * 1000:.1f}'
+            if name == 'db':
+                entry += f';desc="{count} queries"'
+            parts.append(entry)
+        parts.append(f'total;dur={self.elapsed * 1000:.1f}')
+        return ', '.join(parts)
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.elapsed * 1000, 2),
+            'queries': len(self.queries),
+            'phases': {name: round(total * 1000, 2) for name, (total, _) in self.phases.items()},
+        }
+
+
+def current_profile():
+    return _current.get()
+
+
+def start_profile():
+    """Починає профіль запиту; повертає токен для ``end_profile``."""
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def end_profile(token):
+    _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Міряє блок коду як фазу ``name`` поточного запиту."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+def query_timer(execute, sql, params, many, context):
+    """``execute_wrapper`` для з'єднань БД: записує SQL і його тривалість."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+_SAVEPOINT_SQL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """View виконав більше SQL-запитів, ніж дозволяє його ``query_budget``."""
+
+
+def query_budget(limit):
+    """
+    Декоратор view: не більше ``limit`` SQL-запитів за виклик (враховуються
+    й ліниві сесія та користувач, але не збереження сесії після view).
+    Якщо ``QUERY_BUDGET_STRICT`` — перевищення кидає ``QueryBudgetExceeded``
+    (тести й DEBUG), інакше пишеться попередження в ``trainmath.perf``.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            queries = []
+
+            def count(execute, sql, params, many, context):
+                # Точки збереження вкладених atomic — не звернення до даних
+                if not sql.startswith(_SAVEPOINT_SQL):
+                    queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(count))
+                response = view(request, *args, **kwargs)
+            if len(queries) > limit:
+                message = (f"{view.__name__} ran {len(queries)} queries, budget is {limit}: "
+                           + "; ".join(sql[:120] for sql in queries))
+                if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                    raise QueryBudgetExceeded(message)
+                perf_logger.warning(message)
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+class _ProfiledTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        with phase('template'):
+            return self.template.render(context, request)
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """Шаблонний backend Django, що міряє рендеринг як фазу ``template``."""
+
+    def from_string(self, template_code):
+        return _ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _ProfiledTemplate(super().get_template(template_name))
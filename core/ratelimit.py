@@ -0,0 +1,102 @@
+# core/ratelimit.py
+"""
+Обмеження частоти запитів відрами токенів (token bucket) у спільному кеші.
+
+Правило (``settings.RATELIMIT_RULES``) задає для кожної області — користувач,
+сесія, IP — місткість відра і час його повного наповнення. Запит проходить,
+лише якщо токен є в усіх відрах, до яких він належить; інакше view
+повертає 429 з ``Retry-After``.
+
+Відро зберігається одним числом — "теоретичним часом прибуття" (GCRA):
+це еквівалент token bucket без окремого лічильника токенів і фонового
+поповнення. Запис неатомарний (get/set кешу), тож при одночасних запитах
+може проскочити кілька зайвих — для захисту від скриптів цього досить.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core.metrics import RATE_LIMITED
+
+KEY_PREFIX = 'ratelimit'
+
+
+def parse_rate(rate):
+    """``"30/60"`` -> (30, 60.0): запитів за секунд."""
+    count, _, seconds = rate.partition('/')
+    return int(count), float(seconds or 1)
+
+
+def client_ip(request):
+    header = getattr(settings, 'RATELIMIT_IP_HEADER', '')
+    ip = request.META.get(header) if header else None
+    return ip or request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def identities(request):
+    """Області, за якими рахується запит: [(scope, ідентифікатор)]."""
+    result = []
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        result.append(('user', str(user.pk)))
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        result.append(('session', session.session_key))
+    result.append(('ip', client_ip(request)))
+    return result
+
+
+def hit(request, rule, now=None):
+    """
+    Списує по токену з усіх відер запиту за правилом ``rule``. Повертає
+    None, якщо запит дозволено, або кількість секунд до наступного токена.
+    Якщо хоч одне відро порожнє, не списується нічого.
+    """
+    if not getattr(settings, 'RATELIMIT_ENABLED', True):
+        return None
+    limits = settings.RATELIMIT_RULES[rule]
+    now = time.time() if now is None else now
+
+    buckets = []
+    for scope, ident in identities(request):
+        if scope not in limits:
+            continue
+        count, period = parse_rate(limits[scope])
+        buckets.append((scope, f'{KEY_PREFIX}:{rule}:{scope}:{ident}', period / count, period))
+    stored = cache.get_many([key for _, key, _, _ in buckets])
+
+    updates = {}
+    wait, blocked_scope = 0.0, None
+    for scope, key, interval, period in buckets:
+        tat = max(stored.get(key, now), now) + interval
+        if tat - now > period:
+            if tat - period - now > wait:
+                wait, blocked_scope = tat - period - now, scope
+        else:
+            updates[key] = (tat, period)
+
+    if blocked_scope is not None:
+        RATE_LIMITED.labels(rule, blocked_scope).inc()
+        return wait
+    for key, (tat, period) in updates.items():
+        cache.set(key, tat, math.ceil(period))
+    return None
+
+
+def rule_for_slug(rule, slug):
+    """Окреме правило для дорогих (sympy) типів задач, якщо воно є."""
+    if slug in getattr(settings, 'RATELIMIT_EXPENSIVE_SLUGS', ()):
+        expensive = f'{rule}_expensive'
+        if expensive in settings.RATELIMIT_RULES:
+            return expensive
+    return rule
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse('Too many requests, please slow down.', status=429,
+                            content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
@@ -0,0 +1,292 @@
+# core/synthetic.py
+"""
+Синтетичний набір даних масштабу продакшену: користувачі, екземпляри задач,
+спроби й поширені результати.
+
+Дані будуються сесіями по 12 задач, як у ``start_session``: для кожної
+спроби створюється свій ``ProblemInstance`` (текст береться з пулу,
+згенерованого справжніми генераторами). Активність користувачів має важкий
+хвіст (Парето), правильність залежить від "вміння" користувача (Beta) і
+складності, час відповіді — логнормальний. Часові мітки йдуть від старих до
+нових, з добовим профілем навантаження.
+
+``Loader`` пише рядки батчами: ``bulk_create`` на SQLite, ``COPY`` на
+PostgreSQL. Первинні ключі призначаються тут же (зовнішні ключі відомі
+до запису), а послідовності скидаються в кінці.
+"""
+import io
+import json
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import Attempt, ProblemInstance, ProblemType, ShareResult
+
+SESSION_SIZE = 12
+
+# Частки складностей і типів задач серед сесій
+DIFFICULTY_WEIGHTS = {1: 0.5, 2: 0.3, 3: 0.2}
+SLUG_WEIGHTS = {
+    'arithmetic': 0.35,
+    'equations': 0.2,
+    'algebraic': 0.15,
+    'derivatives': 0.15,
+    'integrals': 0.15,
+}
+# Медіанний час відповіді на легкому рівні, мс
+BASE_TIME_MS = {
+    'arithmetic': 6000,
+    'equations': 20000,
+    'algebraic': 30000,
+    'derivatives': 35000,
+    'integrals': 45000,
+}
+DIFFICULTY_TIME = {1: 1.0, 2: 1.6, 3: 2.3}
+DIFFICULTY_SUCCESS = {1: 1.0, 2: 0.85, 3: 0.7}
+# Добовий профіль: відносна кількість сесій за годину доби
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 3, 5, 7, 8, 8, 8, 8, 9, 10, 11, 12, 13, 13, 12, 10, 7, 4, 2]
+
+MIN_TIME_MS = 800
+MAX_TIME_MS = 15 * 60 * 1000
+
+
+def _copy_value(value):
+    """Значення у текстовому форматі COPY PostgreSQL."""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class Loader:
+    """
+    Буферизований запис рядків (dict ``attname -> значення``) у кілька
+    таблиць. ``flush`` пише всі буфери в порядку залежностей, тож зовнішні
+    ключі завжди вказують на вже записані рядки.
+    """
+
+    def __init__(self, models, batch_size=5000, using='default', method=None, progress=None):
+        self.models = list(models)
+        self.batch_size = batch_size
+        self.using = using
+        self.connection = connections[using]
+        if method is None:
+            method = 'copy' if self.connection.vendor == 'postgresql' else 'bulk_create'
+        self.method = method
+        self.progress = progress
+        self.buffers = {model: [] for model in self.models}
+        self.counts = {model: 0 for model in self.models}
+        self.seconds = {model: 0.0 for model in self.models}
+        self.next_ids = {
+            model: (model.objects.using(using).aggregate(m=Max('pk'))['m'] or 0) + 1
+            for model in self.models
+        }
+
+    def allocate_id(self, model):
+        pk = self.next_ids[model]
+        self.next_ids[model] = pk + 1
+        return pk
+
+    def add(self, model, row):
+        """Додає рядок із призначеним ``id``; повертає цей id."""
+        row['id'] = self.allocate_id(model)
+        buffer = self.buffers[model]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+        return row['id']
+
+    def flush(self):
+        with transaction.atomic(using=self.using):
+            for model in self.models:
+                rows = self.buffers[model]
+                if not rows:
+                    continue
+                started = time.perf_counter()
+                if self.method == 'copy':
+                    self._copy(model, rows)
+                else:
+                    model.objects.using(self.using).bulk_create(
+                        [model(**row) for row in rows], batch_size=self.batch_size
+                    )
+                self.seconds[model] += time.perf_counter() - started
+                self.counts[model] += len(rows)
+                self.buffers[model] = []
+        if self.progress:
+            self.progress(self)
+
+    def _copy(self, model, rows):
+        fields = model._meta.concrete_fields
+        defaults = {f.attname: f.get_default() for f in fields if f.attname not in rows[0]}
+        buf = io.StringIO()
+        for row in rows:
+            buf.write('\t'.join(
+                _copy_value(row[f.attname] if f.attname in row else defaults[f.attname])
+                for f in fields
+            ))
+            buf.write('\n')
+        buf.seek(0)
+        table = self.connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(self.connection.ops.quote_name(f.column) for f in fields)
+        sql = f'COPY {table} ({columns}) FROM STDIN'
+        with self.connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buf)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buf.getvalue())
+
+    def finish(self):
+        """Дописує залишки буферів і скидає послідовності первинних ключів."""
+        self.flush()
+        statements = self.connection.ops.sequence_reset_sql(no_style(), self.models)
+        if statements:
+            with self.connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+def _weighted(rng, weights):
+    keys = list(weights)
+    return lambda: rng.choices(keys, weights=[weights[k] for k in keys])[0]
+
+
+def build_problem_pool(registry, slugs, per_case=200, seed=0):
+    """
+    Пул шаблонів задач ``(slug, difficulty) -> [problem dict]``, згенерованих
+    справжніми генераторами; екземпляри задач копіюють їхній текст.
+    """
+    pool = {}
+    for i, slug in enumerate(slugs):
+        for difficulty in DIFFICULTY_WEIGHTS:
+            pool[(slug, difficulty)] = registry[slug].generate_batch(
+                difficulty, per_case, seed=seed * 1000 + i * 10 + difficulty
+            )
+    return pool
+
+
+def _wrong_answer(rng, problem):
+    options = [o['value'] for o in problem.get('multiple_choice') or [] if not o['is_correct']]
+    if options:
+        return rng.choice(options)
+    return f"{problem['canonical_answer']} + {rng.randint(1, 9)}"
+
+
+def generate_dataset(loader, registry, users=1000, attempts=100000, days=180, guest_ratio=0.3,
+                     share_ratio=0.05, pool_size=200, password=None, prefix='synth', seed=0):
+    """
+    Генерує й записує через ``loader`` ``users`` користувачів і ``attempts``
+    спроб (сесіями по 12), з ``share_ratio`` сесій, що поширили результат.
+    Повертає dict з кількістю створених сесій.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+
+    types = {pt.slug: pt.pk for pt in ProblemType.objects.filter(slug__in=list(registry))}
+    slug_weights = {slug: w for slug, w in SLUG_WEIGHTS.items() if slug in types}
+    slug_weights.update({slug: 0.1 for slug in types if slug not in slug_weights})
+    if not slug_weights:
+        raise ValueError("No problem types in the database; run populate_problem_types first")
+    pool = build_problem_pool(registry, list(slug_weights), per_case=pool_size, seed=seed)
+    pick_slug = _weighted(rng, slug_weights)
+    pick_difficulty = _weighted(rng, DIFFICULTY_WEIGHTS)
+
+    now = timezone.now()
+    window_start = now - timedelta(days=days)
+
+    # Користувачі: активність з важким хвостом і "вміння"
+    password_hash = make_password(password)
+    existing = User.objects.filter(username__startswith=f'{prefix}_').count()
+    user_ids, user_skill, cum_weights = [], [], []
+    total_weight = 0.0
+    for i in range(existing, existing + users):
+        username = f'{prefix}_{i:07d}'
+        joined = window_start - timedelta(days=rng.uniform(0, 365))
+        user_ids.append(loader.add(User, {
+            'username': username,
+            'email': f'{username}@example.com',
+            'password': password_hash,
+            'date_joined': joined,
+            'is_active': True,
+        }))
+        user_skill.append(rng.betavariate(5, 2))
+        total_weight += rng.paretovariate(1.2)
+        cum_weights.append(total_weight)
+
+    sessions = math.ceil(attempts / SESSION_SIZE)
+    remaining = attempts
+    for s in range(sessions):
+        # Сесії рівномірно по днях вікна (до вчора), години — за добовим профілем
+        day = window_start + timedelta(days=s * max(days - 1, 0) / sessions)
+        hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        ts = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+
+        if user_ids and rng.random() >= guest_ratio:
+            k = rng.choices(range(len(user_ids)), cum_weights=cum_weights)[0]
+            user_id, session_id, skill = user_ids[k], None, user_skill[k]
+        else:
+            user_id, session_id, skill = None, uuid.UUID(int=rng.getrandbits(128)).hex, rng.betavariate(4, 2)
+
+        slug = pick_slug()
+        difficulty = pick_difficulty()
+        templates = pool[(slug, difficulty)]
+        p_correct = skill * DIFFICULTY_SUCCESS[difficulty]
+        median_ms = BASE_TIME_MS.get(slug, 20000) * DIFFICULTY_TIME[difficulty]
+
+        attempt_id = None
+        for _ in range(min(SESSION_SIZE, remaining)):
+            problem = rng.choice(templates)
+            problem_id = loader.add(ProblemInstance, {
+                'problem_type_id': types[slug],
+                'difficulty': difficulty,
+                'params': problem['params'],
+                'question_text': problem['question'],
+                'canonical_answer': problem['canonical_answer'],
+                'multiple_choice_options': problem.get('multiple_choice'),
+                'created': ts,
+            })
+            is_correct = rng.random() < p_correct
+            taken = median_ms * rng.lognormvariate(0, 0.5) * (1.0 if is_correct else 1.3)
+            taken = int(min(max(taken, MIN_TIME_MS), MAX_TIME_MS))
+            ts += timedelta(milliseconds=taken + rng.randint(300, 3000))
+            attempt_id = loader.add(Attempt, {
+                'user_id': user_id,
+                'session_id': session_id,
+                'problem_id': problem_id,
+                'user_answer': problem['canonical_answer'] if is_correct else _wrong_answer(rng, problem),
+                'is_correct': is_correct,
+                'time_taken_ms': taken,
+                'timestamp': ts,
+            })
+        remaining -= SESSION_SIZE
+
+        if attempt_id and rng.random() < share_ratio:
+            loader.add(ShareResult, {
+                'uuid': uuid.UUID(int=rng.getrandbits(128), version=4),
+                'attempt_id': attempt_id,
+                'public': True,
+                'created': ts,
+                'expires_at': None,
+            })
+
+    loader.finish()
+    return {'sessions': sessions}
@@ -1,37 +1,93 @@
+from functools import lru_cache
+
 from django import template
-import re
 
 register = template.Library()
 
 
+# Розмір пам'яті pretty_expr: на сторінках результатів ті самі вирази
+# (варіанти, канонічні відповіді) повторюються між запитами
+PRETTY_CACHE_SIZE = 4096
+
+_LATEX_WRAPPERS = ("\\left", "\\right")
+_ASCII_LETTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+@lru_cache(maxsize=PRETTY_CACHE_SIZE)
 def _prettify_expression(text: str) -> str:
     """Convert raw LaTeX-ish or sympy string to a concise, user-friendly form.
 
+    Один прохід по рядку: прибирає ``\\left``/``\\right``, ``^{k}`` -> ``^k``,
+    склеює пробіли між числом/літерою і літерою (``2 a b`` -> ``2ab``),
+    ``" * "`` -> ``·``, решту пробілів стискає до одного.
+
     Examples:
     - "\\left(2 a - 3 b\\right)^{2}" -> "(2a - 3b)^2"
-    - "a * b + 2 * a^2" -> "a·b + 2a^2"
+    - "a * b + 2 * a^2" -> "a·b + 2·a^2"
     """
-    if not text:
-        return ""
-
-    s = str(text)
-    # Remove LaTeX left/right wrappers
-    s = s.replace("\\left", "").replace("\\right", "")
-    # Replace LaTeX power ^{k} with ^k
-    s = re.sub(r"\^\{([^}]+)\}", r"^\1", s)
-    # Remove spaces around single-letter variables like "2 a" -> "2a"
-    s = re.sub(r"(\d)\s+([a-zA-Z])", r"\1\2", s)
-    s = re.sub(r"([a-zA-Z])\s+([a-zA-Z])", r"\1\2", s)
-    # Multiplication: replace " * " with middle dot
-    s = s.replace(" * ", "·")
-    # Clean multiple spaces
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    out = []
+    n = len(text)
+    close_brace = -1  # позиція "}" від ^{...}, яку треба пропустити
+    i = 0
+    while i < n:
+        ch = text[i]
+        if ch == "\\" and text.startswith(_LATEX_WRAPPERS, i):
+            i += 5 if text.startswith("\\left", i) else 6
+        elif ch == "^" and i > close_brace and text.startswith("{", i + 1):
+            end = text.find("}", i + 2)
+            if end > i + 2:
+                out.append("^")
+                close_brace = end
+                i += 2
+            else:
+                out.append(ch)
+                i += 1
+        elif i == close_brace:
+            i += 1
+        elif ch.isspace():
+            # Пробіли разом з \\left/\\right між ними — один проміжок
+            k = i
+            spaces = 0
+            last = ""
+            while k < n:
+                if text[k].isspace():
+                    last = text[k]
+                    spaces += 1
+                    k += 1
+                elif text.startswith(_LATEX_WRAPPERS, k):
+                    k += 5 if text.startswith("\\left", k) else 6
+                elif k == close_brace:
+                    # "}" від ^{...} зникає: пробіли навколо нього — один проміжок
+                    k += 1
+                else:
+                    break
+            prev = out[-1] if out else ""
+            # Пробіл після "*" (можливо, за "}" від ^{...})
+            after_star = k + 1 if text.startswith("*", k) else -1
+            if after_star == close_brace:
+                after_star += 1
+            if after_star > 0 and text.startswith(" ", after_star) and last == " ":
+                # " * " -> "·" (пробіли перед ним стискаються до одного)
+                if spaces > 1 and out:
+                    out.append(" ")
+                out.append("·")
+                k = after_star + 1
+            elif k < n and text[k] in _ASCII_LETTERS and (prev in _ASCII_LETTERS or prev.isdecimal()):
+                pass  # "2 a" -> "2a", "a b" -> "ab"
+            elif out and k < n:
+                out.append(" ")
+            i = k
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out).strip()
 
 
 @register.filter(name="pretty_expr")
 def pretty_expr(value: str) -> str:
-    return _prettify_expression(value)
+    if not value:
+        return ""
+    return _prettify_expression(str(value))
 
 
 @register.filter(name="minutes")
@@ -1,7 +1,9 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from unittest import skipUnless
+from django.db import connection
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from core.models import ProblemType, ProblemInstance, Attempt, ShareResult
+from core.models import ProblemType, ProblemInstance, Attempt, ShareResult, LeaderboardScore
 from exercises.arithmetic import ArithmeticProblem
 import json
 
@@ -173,6 +175,62 @@ class CoreViewsTest(TestCase):
         response = self.client.get(reverse('share_public', args=[share_result.uuid]))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Shared Result')
+        # Посилання без знімка отримує його під час першого показу
+        self.assertEqual(ShareResult.objects.get().snapshot['total_time_ms'], 1000)
+
+    def test_share_is_idempotent_and_frozen(self):
+        problem = ProblemInstance.objects.create(
+            problem_type=self.problem_type, difficulty=1, params={},
+            question_text='2 + 3', canonical_answer='5'
+        )
+        attempt = Attempt.objects.create(user=self.user, problem=problem, user_answer='5',
+                                         is_correct=True, time_taken_ms=1000)
+        first = self.client.get(reverse('share_attempt', args=[attempt.id]))
+        second = self.client.get(reverse('share_attempt', args=[attempt.id]))
+        self.assertEqual(first.url, second.url)
+        self.assertEqual(ShareResult.objects.count(), 1)
+
+        # Нові спроби після поширення сторінку не змінюють
+        Attempt.objects.create(user=self.user, problem=problem, user_answer='7',
+                               is_correct=False, time_taken_ms=500)
+        with self.assertNumQueries(1):
+            response = self.client.get(first.url)
+        self.assertEqual(len(response.context['attempts_list']), 1)
+        self.assertEqual(response.context['total_time_ms'], 1000)
+        self.assertNotContains(response, '<td>7</td>')
+
+    def test_share_snapshots_the_shared_session(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        self.client.login(username='testuser', password='testpass123')
+        start = timezone.now() - timedelta(hours=1)
+
+        def play(answers, offset):
+            problems = [ProblemInstance.objects.create(problem_type=self.problem_type, difficulty=1, params={},
+                                                       question_text='2 + 3', canonical_answer='5')
+                        for _ in answers]
+            attempts = [Attempt.objects.create(user=self.user, problem=p, user_answer=answer, is_correct=False,
+                                               time_taken_ms=100, timestamp=start + timedelta(seconds=offset + i))
+                        for i, (p, answer) in enumerate(zip(problems, answers))]
+            return problems, attempts
+
+        play(['1'] * 5, 0)
+        first_problems, first = play(['2'] * 3, 100)
+        second_problems, _ = play(['3'] * 12, 200)
+
+        # Сесія браузера — перша: рівно її задачі, без попередніх і пізніших спроб
+        session = self.client.session
+        session['session_problems'] = [p.pk for p in first_problems]
+        session.save()
+        response = self.client.get(self.client.get(reverse('share_attempt', args=[first[-1].id])).url)
+        self.assertEqual([a.user_answer for a in response.context['attempts_list']], ['2'] * 3)
+
+        # Старіша сесія: останні SESSION_SIZE спроб до поширеної включно
+        session = self.client.session
+        session['session_problems'] = [p.pk for p in second_problems]
+        session.save()
+        response = self.client.get(self.client.get(reverse('share_attempt', args=[first[1].id])).url)
+        self.assertEqual([a.user_answer for a in response.context['attempts_list']], ['1'] * 5 + ['2'] * 2)
 
     def test_about_view(self):
         response = self.client.get(reverse('about'))
@@ -287,4 +345,867 @@ class ShareResultModelTest(TestCase):
         share_result = ShareResult.objects.create(attempt=self.attempt)
         self.assertEqual(share_result.attempt, self.attempt)
         self.assertTrue(share_result.public)
-        self.assertIsNotNone(share_result.uuid)
\ No newline at end of file
+        self.assertIsNotNone(share_result.uuid)
+
+class BenchTest(TestCase):
+    def test_percentile(self):
+        from core.bench import percentile
+        values = [0.004, 0.001, 0.003, 0.002, 0.005]
+        self.assertEqual(percentile(values, 50), 0.003)
+        self.assertAlmostEqual(percentile(values, 100), 0.005)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_compare_flags_regressions(self):
+        from core.bench import compare
+        baseline = {'results': {'check:arithmetic:correct': {'p50_ms': 1.0, 'p95_ms': 2.0}}}
+        current = {'results': {'check:arithmetic:correct': {'p50_ms': 1.1, 'p95_ms': 3.0}}}
+        regressions = compare(current, baseline, threshold=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(regressions[0]['metric'], 'p95_ms')
+
+    def test_pretty_expr_matches_legacy_formatter(self):
+        from core.bench import legacy_prettify, result_page_expressions
+        from core.templatetags.math_format import pretty_expr
+        from core.views import PROBLEM_REGISTRY
+        self.assertEqual(pretty_expr('\\left(2 a - 3 b\\right)^{2}'), '(2a - 3b)^2')
+        self.assertEqual(pretty_expr('a * b + 2 * a^{2}'), 'a·b + 2·a^2')
+        self.assertEqual(pretty_expr('x^{a^{2}}  +  \\frac{1}{2}'), 'x^a^{2} + \\frac{1}{2}')
+        self.assertEqual(pretty_expr(None), '')
+        # Пробіли всередині ^{...} і навколо "}"
+        for expr in ('3^{ }\n(-b', '^{3  }xx', '^{a }b', 'x^{2 } * y', '^{ *} ', 'x^{ 2}  \\left(a\\right)'):
+            self.assertEqual(pretty_expr(expr), legacy_prettify(expr), repr(expr))
+        for seed in range(5):
+            for expr in result_page_expressions(PROBLEM_REGISTRY, seed=seed):
+                self.assertEqual(pretty_expr(expr), legacy_prettify(expr), expr)
+
+    def test_check_suite_verdicts(self):
+        from core import bench
+        from core.views import PROBLEM_REGISTRY
+        registry = {'arithmetic': PROBLEM_REGISTRY['arithmetic']}
+        corpus = bench.build_corpus(registry, per_case=2)
+        report = bench.run(registry, corpus, suites=['check'], repeat=1)
+        self.assertEqual(report['mismatches'], [])
+        self.assertIn('check:arithmetic:correct', report['results'])
+
+
+class LoadTestHarnessTest(TestCase):
+    def test_parse_mix(self):
+        from core.loadtest import parse_mix
+        self.assertEqual(
+            parse_mix('arithmetic:1=3, integrals:3'),
+            [('arithmetic', 1, 3.0), ('integrals', 3, 1.0)],
+        )
+        with self.assertRaises(ValueError):
+            parse_mix('')
+
+    def test_answers_with_option_ids(self):
+        from core.loadtest import Student
+        pt = ProblemType.objects.create(slug='algebraic', name='Algebraic', impl_path='x')
+        problem = ProblemInstance.objects.create(
+            problem_type=pt, difficulty=1, params={}, question_text='(a+b)^2', canonical_answer='a**2',
+            multiple_choice_options=[{'id': 1, 'text': 'a^2', 'value': 'a**2', 'is_correct': True},
+                                     {'id': 2, 'text': 'b^2', 'value': 'b**2', 'is_correct': False}],
+        )
+        session = self.client.session
+        session['session_problems'] = [problem.pk]
+        session.save()
+        page = self.client.get(reverse('show_question', args=[problem.pk])).content.decode()
+        self.assertIn(Student.answer(page)['option'], ('1', '2'))
+        self.assertEqual(set(Student.answer('<input name="answer" value="x&amp;y">')), {'answer'})
+
+    def test_stats_report(self):
+        from core.loadtest import Stats
+        stats = Stats()
+        stats.record('submit_answer', 0.010, ok=True, queries=6)
+        stats.record('submit_answer', 0.030, ok=False, queries=8)
+        stats.session_done(True)
+        report = stats.report(elapsed=1.0)
+        endpoint = report['endpoints']['submit_answer']
+        self.assertEqual(report['requests'], 2)
+        self.assertEqual(endpoint['error_rate'], 0.5)
+        self.assertEqual(endpoint['db_queries_mean'], 7)
+        self.assertEqual(report['sessions_completed'], 1)
+
+    def test_submit_backs_off_on_429(self):
+        import io
+        import urllib.error
+        from email.message import Message
+        from unittest import mock
+        from core.loadtest import Stats, Student
+
+        def response(code, **headers):
+            message = Message()
+            for name, value in headers.items():
+                message[name.replace('_', '-')] = value
+            return urllib.error.HTTPError('http://test/submit/1/', code, '', message, io.BytesIO(b''))
+
+        stats = Stats()
+        student = Student('http://test', stats)
+        with mock.patch.object(student.opener, 'open', side_effect=[
+            response(429, Retry_After='0'), response(302, Location='/result/1/'),
+        ]), mock.patch('core.loadtest.time.sleep') as sleep:
+            status, location, _ = student.request('submit_answer', '/submit/1/', {'answer': '1'}, retries=2)
+        self.assertEqual((status, location), (302, '/result/1/'))
+        sleep.assert_called_once_with(0)
+        endpoint = stats.report(elapsed=1.0)['endpoints']['submit_answer']
+        self.assertEqual((endpoint['errors'], endpoint['throttled']), (0, 1))
+
+        with mock.patch.object(student.opener, 'open', side_effect=[response(429, Retry_After='5')]):
+            self.assertEqual(student.request('submit_answer', '/submit/1/', {'answer': '1'})[0], 429)
+        self.assertEqual(stats.report(elapsed=1.0)['endpoints']['submit_answer']['errors'], 1)
+
+    def test_query_count_header(self):
+        with self.settings(QUERY_COUNT_HEADER=True):
+            response = self.client.get(reverse('home'))
+        self.assertIn('X-DB-Query-Count', response)
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.problem_type = ProblemType.objects.create(
+            slug='arithmetic',
+            name='Mental Arithmetic',
+            impl_path='exercises.arithmetic.ArithmeticProblem'
+        )
+        self.problem = ProblemInstance.objects.create(
+            problem_type=self.problem_type,
+            difficulty=1,
+            params={'operands': [2, 3], 'operators': ['+']},
+            question_text='2 + 3',
+            canonical_answer='5'
+        )
+
+    def test_server_timing_phases(self):
+        with self.settings(PERF_SERVER_TIMING=True):
+            response = self.client.post(reverse('submit_answer', args=[self.problem.id]), {'answer': '5'})
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('check;dur=', timing)
+        self.assertIn('session;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_template_phase(self):
+        with self.settings(PERF_SERVER_TIMING=True):
+            response = self.client.get(reverse('show_question', args=[self.problem.id]))
+        self.assertIn('template;dur=', response['Server-Timing'])
+
+    def test_slow_request_log(self):
+        with self.settings(PERF_SLOW_REQUEST_MS=0):
+            with self.assertLogs('trainmath.perf', level='WARNING') as logs:
+                self.client.get(reverse('show_question', args=[self.problem.id]))
+        self.assertIn('top_queries', logs.output[0])
+        self.assertIn('show_question', logs.output[0])
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.problem_type = ProblemType.objects.create(
+            slug='arithmetic',
+            name='Mental Arithmetic',
+            impl_path='exercises.arithmetic.ArithmeticProblem'
+        )
+        self.problem = ProblemInstance.objects.create(
+            problem_type=self.problem_type,
+            difficulty=1,
+            params={'operands': [2, 3], 'operators': ['+']},
+            question_text='2 + 3',
+            canonical_answer='5'
+        )
+
+    def test_metrics_exposed_to_staff(self):
+        self.client.post(reverse('submit_answer', args=[self.problem.id]), {'answer': '5'})
+        User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.login(username='staff', password='testpass123')
+        with self.settings(METRICS_ALLOWED_IPS=[]):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('trainmath_problem_calls_total{difficulty="1",operation="check",slug="arithmetic",verdict="correct"}', body)
+        self.assertIn('trainmath_view_requests_total{method="POST",status="302",view="submit_answer"}', body)
+
+    def test_metrics_forbidden_for_anonymous(self):
+        with self.settings(METRICS_ALLOWED_IPS=[]):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_check_verdict(self):
+        from core.metrics import check_verdict
+        self.assertEqual(check_verdict(True, None), 'correct')
+        self.assertEqual(check_verdict(False, None), 'incorrect')
+        self.assertEqual(check_verdict(False, 'Invalid input format.'), 'invalid')
+
+
+class AttemptExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='testpass123', is_staff=True, is_superuser=True)
+        for slug in ('arithmetic', 'integrals'):
+            pt = ProblemType.objects.create(slug=slug, name=slug, impl_path='x')
+            problem = ProblemInstance.objects.create(
+                problem_type=pt, difficulty=2, params={}, question_text='q', canonical_answer='1'
+            )
+            Attempt.objects.create(user=self.user, problem=problem, user_answer='1, "one"',
+                                   is_correct=True, time_taken_ms=1500)
+            Attempt.objects.create(session_id='guest', problem=problem, user_answer='2',
+                                   is_correct=False, time_taken_ms=900)
+
+    def test_csv_and_jsonl_streams(self):
+        import csv
+        from core import exports
+        rows = list(csv.reader(b''.join(exports.export_stream('csv')).decode().splitlines()))
+        self.assertEqual(rows[0], [name for name, _ in exports.COLUMNS])
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][3], 'analyst')
+        self.assertEqual(rows[1][10], '1, "one"')
+
+        lines = b''.join(exports.export_stream('jsonl', slugs=['integrals'])).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([r['problem_type'] for r in records], ['integrals', 'integrals'])
+        self.assertEqual(records[1]['session_id'], 'guest')
+
+    def test_option_answers_export_option_value(self):
+        from core import exports
+        problem = ProblemInstance.objects.first()
+        problem.multiple_choice_options = [{'id': 1, 'text': '2', 'value': '2', 'is_correct': True},
+                                           {'id': 2, 'text': '3', 'value': '3', 'is_correct': False}]
+        problem.save()
+        Attempt.objects.create(session_id='mc', problem=problem, user_answer='', option_id=2,
+                               is_correct=False, time_taken_ms=700)
+        lines = b''.join(exports.export_stream('jsonl', chunk_size=2)).decode().splitlines()
+        record = json.loads(lines[-1])
+        self.assertEqual((record['user_answer'], record['option_id']), ('3', 2))
+        self.assertEqual(json.loads(lines[0])['user_answer'], '1, "one"')
+
+    def test_date_filter(self):
+        import datetime
+        from django.utils import timezone
+        from core import exports
+        old = timezone.now() - datetime.timedelta(days=10)
+        Attempt.objects.filter(session_id='guest').update(timestamp=old)
+        day = timezone.localdate(old)
+        lines = b''.join(exports.export_stream('jsonl', date_from=day, date_to=day)).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(json.loads(line)['session_id'] == 'guest' for line in lines))
+
+    def test_admin_view_streams_gzip(self):
+        import gzip
+        url = reverse('admin_export_attempts')
+        self.assertEqual(self.client.get(url).status_code, 302)  # login required
+        self.client.login(username='analyst', password='testpass123')
+        response = self.client.get(url, {'format': 'csv', 'gzip': '1', 'type': 'arithmetic'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="attempts.csv.gz"', response['Content-Disposition'])
+        body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual(len(body.splitlines()), 3)
+        self.assertEqual(self.client.get(url, {'from': 'yesterday'}).status_code, 400)
+
+    def test_command_writes_file(self):
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.jsonl')
+            call_command('export_attempts', '--format', 'jsonl', '--output', path, stderr=io.StringIO())
+            with open(path, encoding='utf-8') as fh:
+                self.assertEqual(len(fh.readlines()), 4)
+
+
+class SyntheticDataTest(TestCase):
+    def setUp(self):
+        for slug in ('arithmetic', 'equations'):
+            ProblemType.objects.create(slug=slug, name=slug, impl_path='x')
+
+    def test_generate_dataset_with_bulk_create(self):
+        from django.utils import timezone
+        from core import synthetic
+        from core.views import PROBLEM_REGISTRY
+        loader = synthetic.Loader([User, ProblemInstance, Attempt, ShareResult], batch_size=50)
+        synthetic.generate_dataset(loader, PROBLEM_REGISTRY, users=20, attempts=130, days=30,
+                                   share_ratio=0.5, pool_size=5, seed=1)
+        self.assertEqual(User.objects.filter(username__startswith='synth_').count(), 20)
+        self.assertEqual(Attempt.objects.count(), 130)
+        self.assertEqual(ProblemInstance.objects.count(), 130)
+        self.assertTrue(ShareResult.objects.exists())
+        self.assertLess(Attempt.objects.latest('timestamp').timestamp, timezone.now())
+        self.assertTrue(Attempt.objects.filter(user__isnull=True).exclude(session_id=None).exists())
+        # Послідовність ключів продовжується після явно призначених id
+        problem = ProblemInstance.objects.first()
+        attempt = Attempt.objects.create(problem=problem, user_answer='1', is_correct=True, time_taken_ms=1)
+        self.assertEqual(attempt.id, 131)
+
+    def test_copy_value_escaping(self):
+        from core.synthetic import _copy_value
+        self.assertEqual(_copy_value(None), '\\N')
+        self.assertEqual(_copy_value(True), 't')
+        self.assertEqual(_copy_value('a\tb\\c\n'), 'a\\tb\\\\c\\n')
+        self.assertEqual(_copy_value({'a': [1]}), '{"a": [1]}')
+
+
+class BackupTest(TestCase):
+    def test_days_to_export(self):
+        import datetime
+        from core.backup import days_to_export
+        d = datetime.date
+        self.assertEqual(days_to_export({}, None, d(2025, 1, 5)), [])
+        self.assertEqual(len(days_to_export({}, d(2025, 1, 1), d(2025, 1, 5))), 5)
+        index = {'2025-01-03': {'rows': 1}, '2025-01-04': {'rows': 2}}
+        self.assertEqual(days_to_export(index, d(2025, 1, 1), d(2025, 1, 6), overlap_days=1),
+                         [d(2025, 1, 3), d(2025, 1, 4), d(2025, 1, 5), d(2025, 1, 6)])
+        self.assertEqual(days_to_export(index, d(2025, 1, 1), d(2025, 1, 6), full=True)[0], d(2025, 1, 1))
+
+    def test_days_with_other_columns_are_reexported(self):
+        import datetime
+        from core.backup import attempt_columns, copy_in_sql, days_to_export
+        d = datetime.date
+        columns = attempt_columns()
+        old = [c for c in columns if c not in ('option_id', 'journal_id')]
+        index = {'2025-01-01': {'rows': 1, 'columns': old}, '2025-01-02': {'rows': 1},
+                 '2025-01-05': {'rows': 1, 'columns': columns}}
+        self.assertEqual(days_to_export(index, d(2025, 1, 1), d(2025, 1, 6), overlap_days=1, columns=columns),
+                         [d(2025, 1, 1), d(2025, 1, 2), d(2025, 1, 4), d(2025, 1, 5), d(2025, 1, 6)])
+        # Файл доби відновлюється у ті колонки, з якими його знято
+        sql = copy_in_sql('core_attempt', old)
+        self.assertIn('"user_answer"', sql)
+        self.assertNotIn('journal_id', sql)
+        self.assertEqual(copy_in_sql('core_attempt'), 'COPY core_attempt FROM STDIN')
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY requires PostgreSQL')
+    def test_restore_day_file_written_before_column_was_added(self):
+        import gzip
+        import io
+        from core.backup import attempt_columns, copy_in, copy_in_sql
+        pt = ProblemType.objects.create(slug='arithmetic', name='Arithmetic', impl_path='x')
+        problem = ProblemInstance.objects.create(problem_type=pt, difficulty=1, params={},
+                                                 question_text='1 + 1', canonical_answer='2')
+        old = [c for c in attempt_columns() if c not in ('option_id', 'journal_id')]
+        values = {'id': '900001', 'user_id': '\\N', 'session_id': 'guest', 'problem_id': str(problem.pk),
+                  'user_answer': '2', 'is_correct': 't', 'time_taken_ms': '1000',
+                  'timestamp': '2025-01-01 10:00:00+00'}
+        day_file = io.BytesIO(gzip.compress(('\t'.join(values[c] for c in old) + '\n').encode()))
+        with connection.cursor() as cursor, gzip.open(day_file, 'rb') as fh:
+            copy_in(cursor, copy_in_sql(Attempt._meta.db_table, old), fh)
+        attempt = Attempt.objects.get(pk=900001)
+        self.assertEqual((attempt.user_answer, attempt.option_id, attempt.journal_id), ('2', None, None))
+
+    def test_connection_args_and_vendor_check(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from core.backup import pg_connection_args
+        args, env, name = pg_connection_args({'NAME': 'tm', 'HOST': 'db', 'PORT': 5432, 'USER': 'u', 'PASSWORD': 'p'})
+        self.assertEqual(args, ['-h', 'db', '-p', '5432', '-U', 'u'])
+        self.assertEqual((env['PGPASSWORD'], name), ('p', 'tm'))
+        with self.assertRaisesMessage(CommandError, 'requires PostgreSQL'):
+            call_command('backup_db', '--output', '/nonexistent')
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRoutingTest(TransactionTestCase):
+    # TransactionTestCase: другий псевдонім бачить лише закомічені дані
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        from core import db_router
+        db_router._health.clear()
+        self.addCleanup(db_router._health.clear)
+        pt = ProblemType.objects.create(slug='arithmetic', name='Arithmetic', impl_path='x')
+        self.problem = ProblemInstance.objects.create(
+            problem_type=pt, difficulty=1, params={}, question_text='1 + 1', canonical_answer='2'
+        )
+        self.attempt = Attempt.objects.create(session_id='guest', problem=self.problem, user_answer='2',
+                                              is_correct=True, time_taken_ms=1000)
+        self.share = ShareResult.objects.create(attempt=self.attempt)
+
+    def _replica_queries(self, url):
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(replica)
+
+    def test_read_only_view_uses_replica(self):
+        self.assertGreater(self._replica_queries(reverse('share_public', args=[self.share.uuid])), 0)
+
+    def test_recent_write_sticks_to_primary(self):
+        response = self.client.post(reverse('submit_answer', args=[self.problem.pk]), {'answer': '2'})
+        self.assertIn('tm_primary', response.cookies)
+        self.assertEqual(self._replica_queries(response.url), 0)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        from unittest import mock
+        with mock.patch('core.db_router.replica_lag', return_value=3600.0):
+            self.assertEqual(self._replica_queries(reverse('share_public', args=[self.share.uuid])), 0)
+
+    def test_write_inside_replica_block_switches_to_primary(self):
+        from core.db_router import read_replica
+        with read_replica() as alias:
+            self.assertEqual(alias, 'replica')
+            self.assertEqual(Attempt.objects.all().db, 'replica')
+            ShareResult.objects.create(attempt=self.attempt)
+            self.assertEqual(Attempt.objects.all().db, 'default')
+        self.assertEqual(Attempt.objects.all().db, 'default')
+
+
+class ProblemTypeCatalogTest(TestCase):
+    def setUp(self):
+        from core import problem_types
+        problem_types.invalidate()
+        self.pt = ProblemType.objects.create(slug='arithmetic', name='Arithmetic', impl_path='x')
+
+    def test_lookups_without_queries(self):
+        from core.problem_types import problem_types
+        catalog = problem_types()
+        with self.assertNumQueries(0):
+            self.assertEqual(problem_types().get('arithmetic').pk, self.pt.pk)
+            self.assertEqual(problem_types().get_by_id(self.pt.pk).slug, 'arithmetic')
+            self.assertEqual(problem_types().filter({'arithmetic', 'missing'}), [catalog.get('arithmetic')])
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('start_session', args=['arithmetic']))
+            self.client.get(response.url)
+            self.client.post(reverse('submit_answer', args=[int(response.url.rstrip('/').split('/')[-1])]),
+                             {'answer': '0'})
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "core_problemtype"' in q['sql']])
+
+    def test_save_and_version_bump_invalidate(self):
+        from core import problem_types
+        self.assertEqual(problem_types.problem_types().get('arithmetic').name, 'Arithmetic')
+        self.pt.name = 'Mental arithmetic'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pt.save()
+        self.assertEqual(problem_types.problem_types().get('arithmetic').name, 'Mental arithmetic')
+
+        # Зміна в іншому процесі: лише новий штамп у спільному кеші
+        version = problem_types.problem_types().version
+        ProblemType.objects.filter(pk=self.pt.pk).update(name='Renamed elsewhere')
+        problem_types.bump_version()
+        self.assertNotEqual(problem_types.current_version(), version)
+        with self.settings(PROBLEM_TYPES_CHECK_INTERVAL=0):
+            self.assertEqual(problem_types.problem_types().get('arithmetic').name, 'Renamed elsewhere')
+
+
+class SessionFlowMixin:
+    """Проходить сесію повністю: будь-який view понад свій query_budget валить тест."""
+
+    def setUp(self):
+        from core import problem_types
+        problem_types.invalidate()
+        for slug in ('arithmetic', 'algebraic'):
+            ProblemType.objects.create(slug=slug, name=slug.title(), impl_path='x')
+        self.user = User.objects.create_user(username='budget', password='testpass123')
+
+    def _play_session(self, slug, correct=False):
+        response = self.client.get(reverse('start_session', args=[slug]), {'difficulty': 2})
+        self.assertEqual(response.status_code, 302)
+        while '/question/' in response.url:
+            self.assertEqual(self.client.get(response.url).status_code, 200)
+            pk = int(response.url.rstrip('/').split('/')[-1])
+            answer = ProblemInstance.objects.get(pk=pk).canonical_answer if correct else '1'
+            response = self.client.post(reverse('submit_answer', args=[pk]), {'answer': answer})
+        self.assertEqual(self.client.get(response.url).status_code, 200)
+        return Attempt.objects.latest('id')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTest(SessionFlowMixin, TestCase):
+    def test_session_flow_within_budget(self):
+        attempt = self._play_session('algebraic')
+        share = self.client.get(reverse('share_attempt', args=[attempt.pk]))
+        self.assertEqual(self.client.get(share.url).status_code, 200)
+
+        self.client.login(username='budget', password='testpass123')
+        attempt = self._play_session('arithmetic')
+        self._play_session('arithmetic')
+        self.assertEqual(Attempt.objects.filter(user=self.user).count(), 24)
+        self.assertEqual(self.client.get(reverse('users:profile')).status_code, 200)
+        share = self.client.get(reverse('share_attempt', args=[attempt.pk]))
+        self.assertEqual(self.client.get(share.url).status_code, 200)
+
+    def test_exceeding_budget_fails(self):
+        from core.profiling import QueryBudgetExceeded, query_budget
+
+        @query_budget(1)
+        def chatty(request):
+            list(ProblemType.objects.all())
+            list(ProblemType.objects.all())
+
+        with self.assertRaises(QueryBudgetExceeded):
+            chatty(None)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetAutocommitTest(SessionFlowMixin, TransactionTestCase):
+    """Без обгорткової транзакції TestCase BEGIN/COMMIT рахуються, як у продакшені."""
+
+    def test_correct_answers_within_budget(self):
+        # Перша правильна відповідь на дошці створює її рядки (BEGIN + INSERT)
+        self.client.login(username='budget', password='testpass123')
+        attempt = self._play_session('arithmetic', correct=True)
+        self.assertTrue(attempt.is_correct)
+        self.assertEqual(LeaderboardScore.objects.get(board='arithmetic:2:all', user=self.user).score, 12)
+
+
+@override_settings(RATELIMIT_RULES={
+    'submit': {'user': '5/60', 'session': '2/60', 'ip': '100/60'},
+    'submit_expensive': {'ip': '1/10'},
+})
+class RateLimitTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        pt = ProblemType.objects.create(slug='arithmetic', name='Arithmetic', impl_path='x')
+        self.problem = ProblemInstance.objects.create(
+            problem_type=pt, difficulty=1, params={}, question_text='1 + 1', canonical_answer='2'
+        )
+
+    def test_session_bucket_returns_429_with_retry_after(self):
+        from core.metrics import RATE_LIMITED
+        url = reverse('submit_answer', args=[self.problem.pk])
+        before = RATE_LIMITED.labels('submit', 'session')._value.get()
+        # Перша відповідь гостя ще без сесії (вона створюється в submit_answer)
+        for _ in range(3):
+            self.assertEqual(self.client.post(url, {'answer': '2'}).status_code, 302)
+        response = self.client.post(url, {'answer': '2'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Attempt.objects.count(), 3)
+        self.assertEqual(RATE_LIMITED.labels('submit', 'session')._value.get(), before + 1)
+        # Інший клієнт (нова сесія) не зачеплений
+        self.assertEqual(Client().post(url, {'answer': '2'}).status_code, 302)
+
+    def test_expensive_rule_and_refill(self):
+        from django.test import RequestFactory
+        from core import ratelimit
+        self.assertEqual(ratelimit.rule_for_slug('submit', 'integrals'), 'submit_expensive')
+        self.assertEqual(ratelimit.rule_for_slug('submit', 'arithmetic'), 'submit')
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        self.assertIsNone(ratelimit.hit(request, 'submit_expensive', now=1000.0))
+        self.assertAlmostEqual(ratelimit.hit(request, 'submit_expensive', now=1004.0), 6.0)
+        self.assertIsNone(ratelimit.hit(request, 'submit_expensive', now=1010.0))
+
+
+class MultipleChoiceOptionTest(TestCase):
+    def setUp(self):
+        pt = ProblemType.objects.create(slug='derivatives', name='Derivatives', impl_path='x')
+        from exercises.base import number_options
+        self.problem = ProblemInstance.objects.create(
+            problem_type=pt, difficulty=1, params={'function': 'x**2', 'type': 'derivative'},
+            question_text='x^{2}', canonical_answer='2*x',
+            multiple_choice_options=number_options([
+                {'text': '2 x + 1', 'value': '2*x + 1', 'is_correct': False},
+                {'text': '2 x', 'value': '2*x', 'is_correct': True},
+            ]),
+        )
+        self.url = reverse('submit_answer', args=[self.problem.pk])
+
+    def test_question_posts_option_ids(self):
+        response = self.client.get(reverse('show_question', args=[self.problem.pk]))
+        self.assertContains(response, 'name="option"', count=2)
+        self.assertContains(response, 'value="2"')
+
+    def test_option_checked_without_checker(self):
+        from unittest import mock
+        from core.views import PROBLEM_REGISTRY
+        with mock.patch.object(PROBLEM_REGISTRY['derivatives'], 'check') as check:
+            self.client.post(self.url, {'option': '2'})
+            self.client.post(self.url, {'option': '1'})
+            self.client.post(self.url, {'option': '9'})
+        check.assert_not_called()
+        attempts = list(Attempt.objects.order_by('pk'))
+        self.assertEqual([(a.is_correct, a.option_id, a.user_answer) for a in attempts],
+                         [(True, 2, ''), (False, 1, ''), (False, None, '')])
+        self.assertEqual(attempts[0].answer_text, '2*x')
+
+    def test_result_rows_show_option_value(self):
+        from core.views import attempt_rows
+        self.client.post(self.url, {'option': '1'})
+        [row] = attempt_rows(Attempt.objects.all())
+        self.assertEqual(row.user_answer, '2*x + 1')
+
+    def test_legacy_options_use_checker(self):
+        ProblemInstance.objects.filter(pk=self.problem.pk).update(multiple_choice_options=[
+            {'text': '2 x', 'value': '2*x', 'is_correct': True},
+        ])
+        self.client.post(self.url, {'answer': '2*x'})
+        attempt = Attempt.objects.get()
+        self.assertTrue(attempt.is_correct)
+        self.assertEqual((attempt.user_answer, attempt.option_id), ('2*x', None))
+
+
+class AttemptJournalTest(TestCase):
+    def setUp(self):
+        import os
+        import shutil
+        import tempfile
+        from core import attempt_journal
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.override = override_settings(ATTEMPT_WRITE_BEHIND=True, ATTEMPT_JOURNAL_DIR=directory)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.journal = attempt_journal.AttemptJournal(directory, background=False)
+        previous = attempt_journal._journal, attempt_journal._journal_pid
+        attempt_journal._journal, attempt_journal._journal_pid = self.journal, os.getpid()
+        self.addCleanup(setattr, attempt_journal, '_journal', previous[0])
+        self.addCleanup(setattr, attempt_journal, '_journal_pid', previous[1])
+
+        pt = ProblemType.objects.create(slug='arithmetic', name='Arithmetic', impl_path='x')
+        self.problems = [
+            ProblemInstance.objects.create(problem_type=pt, difficulty=1, params={},
+                                           question_text=f'{n} + 1', canonical_answer=str(n + 1))
+            for n in range(3)
+        ]
+        session = self.client.session
+        session['session_problems'] = [p.pk for p in self.problems]
+        session['current_problem_index'] = 0
+        session.save()
+
+    def submit(self, problem, answer):
+        return self.client.post(reverse('submit_answer', args=[problem.pk]), {'answer': answer})
+
+    def test_results_read_through_pending_attempts(self):
+        self.submit(self.problems[0], '1')
+        self.submit(self.problems[1], '0')
+        self.assertEqual(Attempt.objects.count(), 0)
+        # Остання спроба сесії вставляється одразу: сторінці результату потрібен id
+        response = self.submit(self.problems[2], '3')
+        attempt = Attempt.objects.get()
+        self.assertRedirects(response, reverse('result', args=[attempt.pk]))
+
+        rows = self.client.get(response['Location']).context['attempts_list']
+        self.assertEqual([(r.question_text, r.is_correct) for r in rows],
+                         [('0 + 1', True), ('1 + 1', False), ('2 + 1', True)])
+
+        self.assertEqual(self.journal.flush(), 2)
+        self.assertEqual(Attempt.objects.count(), 3)
+        self.assertEqual(len(self.client.get(response['Location']).context['attempts_list']), 3)
+
+    def test_crashed_segment_is_recovered_once(self):
+        from core import attempt_journal
+        self.submit(self.problems[0], '1')
+        self.submit(self.problems[1], '2')
+        # "Падіння": блокування відпущене, сегмент не закритий, останній рядок недописаний
+        self.journal._file.write('{"user_id": nul')
+        self.journal._file.close()
+        path = self.journal._path
+        pending = attempt_journal.pending_attempts(None, self.client.session.session_key)
+        self.assertEqual(len(pending), 2)
+        # Сегмент вставлений, але не видалений — повторна вставка не дублює
+        attempt_journal.insert_entries(pending)
+        self.assertTrue(path.exists())
+        self.assertEqual(attempt_journal.recover(self.journal.directory), (1, 2))
+        self.assertFalse(path.exists())
+        self.assertEqual(Attempt.objects.filter(is_correct=True).count(), 2)
+
+    def test_pending_reads_only_new_lines(self):
+        from unittest import mock
+        from core import attempt_journal
+        session_key = self.client.session.session_key
+        self.submit(self.problems[0], '1')
+        self.assertEqual(len(attempt_journal.pending_attempts(None, session_key)), 1)
+        self.submit(self.problems[1], '2')
+        with mock.patch.object(attempt_journal, '_parse_entry', wraps=attempt_journal._parse_entry) as parse:
+            self.assertEqual(len(attempt_journal.pending_attempts(None, session_key)), 2)
+            # Закритий сегмент зберігає індекс: нічого не розбирається повторно
+            self.journal._rotate()
+            self.assertEqual(len(attempt_journal.pending_attempts(None, session_key)), 2)
+        self.assertEqual(parse.call_count, 1)
+        self.journal.flush()
+        self.assertEqual(attempt_journal.pending_attempts(None, session_key), [])
+        self.assertEqual(self.journal._index, {})
+
+    def test_live_segment_is_not_recovered(self):
+        from core import attempt_journal
+        self.submit(self.problems[0], '1')
+        self.assertEqual(attempt_journal.recover(self.journal.directory), (0, 0))
+        self.assertEqual(Attempt.objects.count(), 0)
+
+    def test_segment_claimed_by_another_flusher_is_skipped(self):
+        import fcntl
+        from django.utils import timezone
+        from core import attempt_journal, leaderboards, problem_types
+        problem_types.invalidate()
+        leaderboards.reset()
+        self.addCleanup(leaderboards.reset)
+        user = User.objects.create_user(username='flusher', password='pw')
+        attempt_journal.record_attempt(user_id=user.pk, session_id=None, problem=self.problems[0],
+                                       user_answer='1', option_id=None, is_correct=True,
+                                       time_taken_ms=100, timestamp=timezone.now())
+        self.journal._rotate()
+        (path,) = self.journal.directory.iterdir()
+        with open(path, 'rb') as claimed:
+            # Сегмент вставляє інший флашер
+            fcntl.flock(claimed, fcntl.LOCK_EX)
+            self.assertEqual(attempt_journal.recover(self.journal.directory), (0, 0))
+        self.assertEqual(attempt_journal.recover(self.journal.directory), (1, 1))
+        self.assertEqual(attempt_journal.recover(self.journal.directory), (0, 0))
+        self.assertEqual(LeaderboardScore.objects.get(board='arithmetic:1:all', user=user).score, 1)
+
+    def test_late_guest_attempts_requeue_finished_merge(self):
+        from django.utils import timezone
+        from users.models import GuestMerge
+        self.submit(self.problems[0], '1')
+        user = User.objects.create_user(username='late', password='pw')
+        GuestMerge.objects.create(session_key=self.client.session.session_key, user=user,
+                                  finished_at=timezone.now())
+        with override_settings(GUEST_MERGE_IN_THREAD=False):
+            self.journal.flush()
+        self.assertIsNone(GuestMerge.objects.get().finished_at)
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        from core import leaderboards, problem_types
+        problem_types.invalidate()
+        leaderboards.reset()
+        self.addCleanup(leaderboards.reset)
+        pt = ProblemType.objects.create(slug='arithmetic', name='Arithmetic', impl_path='x')
+        self.problem = ProblemInstance.objects.create(
+            problem_type=pt, difficulty=2, params={}, question_text='1 + 1', canonical_answer='2'
+        )
+        self.users = [User.objects.create_user(username=f'u{n}', password='pw') for n in range(3)]
+
+    def answer(self, user, correct=True, **kwargs):
+        return Attempt.objects.create(user=user, problem=self.problem, user_answer='2',
+                                      is_correct=correct, time_taken_ms=1000, **kwargs)
+
+    def test_board_ranks_with_ties(self):
+        from core.leaderboards import Board
+        board = Board('x')
+        for user_id, score in [(1, 5), (2, 9), (3, 5), (4, 1)]:
+            board.set(user_id, score)
+        board.set(4, 7)
+        self.assertEqual(board.top(3), [(1, 2, 9), (2, 4, 7), (3, 1, 5)])
+        self.assertEqual(board.rank(3), (3, 5))
+        self.assertIsNone(board.rank(99))
+        board.set(2, 0)
+        self.assertEqual((len(board), board.rank(4)), (3, (1, 7)))
+
+    def test_attempts_update_boards_incrementally(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from core import leaderboards
+        a, b, c = self.users
+        self.answer(a)
+        self.answer(a)
+        self.answer(b)
+        self.answer(b, correct=False)
+        self.answer(c, timestamp=timezone.now() - timedelta(weeks=3))
+        week = leaderboards.leaderboard('arithmetic', 2, 'week', user_id=b.pk)
+        self.assertEqual(week['top'], [(1, a.pk, 2), (2, b.pk, 1)])
+        self.assertEqual(week['me'], (2, 1))
+        all_time = leaderboards.leaderboard('arithmetic', 2, 'all', user_id=c.pk)
+        self.assertEqual(all_time['me'], (2, 1))
+        self.assertEqual(all_time['total'], 3)
+
+        # Індекс процесу оновлюється без повного перечитування
+        self.answer(c)
+        self.assertEqual(leaderboards.leaderboard('arithmetic', 2, 'all', user_id=c.pk)['me'], (1, 2))
+
+    def test_merged_guest_attempts_score(self):
+        from users.merge import enqueue, process_pending
+        Attempt.objects.create(session_id='guest', problem=self.problem, user_answer='2',
+                               is_correct=True, time_taken_ms=1)
+        with override_settings(GUEST_MERGE_IN_THREAD=False):
+            enqueue('guest', self.users[0])
+        process_pending()
+        self.assertEqual(
+            LeaderboardScore.objects.get(board='arithmetic:2:all', user=self.users[0]).score, 1
+        )
+
+    def test_rebuild_matches_incremental_and_drops_old_weeks(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from core import leaderboards
+        a, b, _ = self.users
+        self.answer(a)
+        self.answer(b)
+        self.answer(b, timestamp=timezone.now() - timedelta(weeks=20))
+        incremental = set(LeaderboardScore.objects.values_list('board', 'user_id', 'score'))
+        LeaderboardScore.objects.filter(user=a).update(score=40)
+
+        self.assertEqual(leaderboards.rebuild(weeks=8), 4)
+        rebuilt = set(LeaderboardScore.objects.values_list('board', 'user_id', 'score'))
+        self.assertEqual(rebuilt, {row for row in incremental if not row[0].endswith(
+            leaderboards.week_window(timezone.now() - timedelta(weeks=20)))})
+
+    def test_leaderboard_view(self):
+        self.answer(self.users[0])
+        self.client.login(username='u0', password='pw')
+        response = self.client.get(reverse('leaderboard', args=['arithmetic', 2]), {'window': 'all'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Your place: 1 (1 correct)')
+        self.assertEqual(self.client.get(reverse('leaderboard', args=['nope', 2])).status_code, 404)
+
+
+class ParallelGenerationTest(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from core import parallel_generation
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        override = override_settings(GENERATION_POOL_LOCK_DIR=directory, GENERATION_POOL_MAX_PROCESSES=4)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(self.release_slot)
+        self.addCleanup(lambda: parallel_generation._pool and parallel_generation._discard_pool(parallel_generation._pool))
+
+    def release_slot(self):
+        from core import parallel_generation
+        if parallel_generation._pool_slot is not None:
+            parallel_generation._pool_slot.close()
+            parallel_generation._pool_slot = None
+
+    @override_settings(GENERATION_POOL_WORKERS=2, GENERATION_POOL_MAX_PROCESSES=3)
+    def test_workers_without_host_slot_generate_serially(self):
+        import fcntl
+        from django.conf import settings
+        from core.parallel_generation import generate_session, get_pool, slot_seed
+        from exercises.calculus import DerivativesProblem
+        self.release_slot()
+        # Єдиний слот хоста (3 // 2) зайняв інший воркер
+        with open(f'{settings.GENERATION_POOL_LOCK_DIR}/0.lock', 'a') as taken:
+            fcntl.flock(taken, fcntl.LOCK_EX)
+            self.assertIsNone(get_pool())
+            gen = DerivativesProblem()
+            batch = generate_session(gen, 2, 2, seed=5, deadline_ms=0)
+        self.assertEqual(batch, [gen.generate_batch(2, 1, seed=slot_seed(5, slot))[0] for slot in range(2)])
+        self.assertIsNotNone(get_pool())
+
+    @override_settings(GENERATION_POOL_WORKERS=2)
+    def test_pool_matches_serial_per_slot_seeds(self):
+        from core.parallel_generation import generate_session, slot_seed
+        from exercises.calculus import DerivativesProblem
+        gen = DerivativesProblem()
+        batch = generate_session(gen, 2, 4, seed=42, deadline_ms=60000)
+        expected = [gen.generate_batch(2, 1, seed=slot_seed(42, slot))[0] for slot in range(4)]
+        self.assertEqual(batch, expected)
+        self.assertNotEqual(slot_seed(42, 0), slot_seed(42, 1))
+
+    @override_settings(GENERATION_POOL_WORKERS=1)
+    def test_deadline_falls_back_to_cheaper_patterns(self):
+        from core.parallel_generation import generate_session, slot_seed
+        from exercises.calculus import IntegralsProblem
+        gen = IntegralsProblem()
+        with self.assertLogs('core.parallel_generation', 'WARNING'):
+            batch = generate_session(gen, 3, 3, seed=7, deadline_ms=0)
+        self.assertEqual([data['difficulty'] for data in batch], [1, 1, 1])
+        self.assertEqual(batch[0]['question'], gen.generate_batch(1, 1, seed=slot_seed(7, 0))[0]['question'])
+
+    @override_settings(GENERATION_POOL_ENABLED=True, GENERATION_POOL_SLUGS=['derivatives'])
+    def test_start_session_stores_fallback_difficulty(self):
+        from unittest import mock
+        ProblemType.objects.create(slug='derivatives', name='Derivatives', impl_path='x')
+        fallback = {'question': 'x', 'canonical_answer': '1', 'params': {}, 'difficulty': 1}
+        with mock.patch('core.views.default_catalog', return_value=None), \
+                mock.patch('core.parallel_generation.generate_session', return_value=[fallback] * 12) as generate:
+            self.client.get(reverse('start_session', args=['derivatives']), {'difficulty': 3})
+        self.assertEqual(generate.call_args.args[3], self.client.session['session_seed'])
+        self.assertEqual(self.client.session['session_fallback_slots'], list(range(12)))
+        self.assertEqual(set(ProblemInstance.objects.values_list('difficulty', flat=True)), {1})
+
@@ -13,6 +13,12 @@ urlpatterns = [
     path("share/<int:attempt_id>/", views.share_attempt, name="share_attempt"),
     path("s/<uuid:uuid>/", views.share_public, name="share_public"),
 
+    # таблиці лідерів
+    path("leaderboard/<slug:slug>/<int:difficulty>/", views.leaderboard_view, name="leaderboard"),
+
     # інфо-сторінка
     path("about/", views.about, name="about"),
+
+    # метрики Prometheus (staff / локальний скрейпер)
+    path("metrics/", views.metrics, name="metrics"),
 ]
@@ -2,13 +2,30 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+from django.contrib.auth import get_user_model
 
-from core.models import ProblemType, ProblemInstance, Attempt, ShareResult
+from core.models import ProblemInstance, Attempt, ShareResult, answer_text
+from core.profiling import phase, query_budget
+from core.db_router import replica_reads
+from core.templatetags.math_format import pretty_expr
+from core.problem_types import problem_types
+from core.attempt_journal import record_attempt, pending_attempts
+from core import leaderboards, parallel_generation, ratelimit
+from core.metrics import track_problem, check_verdict, render_latest, SESSIONS_STARTED, SESSIONS_COMPLETED
 from exercises.arithmetic import ArithmeticProblem
 from exercises.algebraic import AlgebraicIdentitiesProblem
 from exercises.equations import EquationsProblem
 from exercises.calculus import DerivativesProblem, IntegralsProblem
-from django.http import HttpResponse
+from exercises.catalog import default_catalog
+from exercises.base import number_options, find_option
+from users.merge import GUEST_SESSION_KEY
+from django.http import HttpResponse, HttpResponseForbidden
+from typing import NamedTuple
+import random
+
+# Кількість задач у сесії
+SESSION_SIZE = 12
 
 # Реєстр генераторів задач
 # Додавай нові генератори сюди
@@ -21,6 +38,12 @@ PROBLEM_REGISTRY = {
 }
 
 
+def with_problem_type(problem):
+    """Підставляє тип задачі з каталогу в пам'яті, щоб шаблон не робив окремого запиту."""
+    problem.problem_type = problem_types().get_by_id(problem.problem_type_id) or problem.problem_type
+    return problem
+
+
 # =============================
 # Home
 # =============================
@@ -30,7 +53,7 @@ def home(request):
     """
     # Show only active problem types present in the registry
     active_slugs = set(PROBLEM_REGISTRY.keys())
-    types = ProblemType.objects.filter(slug__in=active_slugs)
+    types = problem_types().filter(active_slugs)
     return render(request, 'core/home.html', {'types': types})
 
 
@@ -38,6 +61,7 @@ def home(request):
 # Start Session
 # =============================
 @require_http_methods(["GET"])
+@query_budget(4)
 def start_session(request, slug):
     """
     Створює нову сесію з 12 задач для обраного типу (slug).
@@ -50,28 +74,38 @@ def start_session(request, slug):
         return redirect('home')
 
     # Генеруємо 12 задач
-    pt = get_object_or_404(ProblemType, slug=slug)
-    problem_instances = []
-    
+    pt = problem_types().get_or_404(slug)
+
     ensure_division = True if slug in ['arithmetic'] else False
-    for i in range(12):
-        if ensure_division and i == 0:
+    catalog = default_catalog()
+    with phase('generate'), track_problem('generate_batch', slug, difficulty):
+        if catalog is not None and catalog.has(slug, difficulty):
+            # Скінченний простір задач: беремо з прекомпільованого каталогу
+            batch = catalog.sample_batch(slug, difficulty, SESSION_SIZE)
+        elif settings.GENERATION_POOL_ENABLED and slug in settings.GENERATION_POOL_SLUGS:
+            # Дорогі типи: слоти паралельно в пулі процесів з дедлайном
+            seed = random.getrandbits(63)
+            request.session['session_seed'] = seed
+            batch = parallel_generation.generate_session(gen, difficulty, SESSION_SIZE, seed)
+            # Разом із seed відтворює сесію: ці слоти згенеровані зі складністю 1
+            request.session['session_fallback_slots'] = parallel_generation.fallback_slots(batch)
+        elif ensure_division and hasattr(gen, 'generate_division'):
             # Guarantee at least one division with whole result
-            if hasattr(gen, 'generate_division'):
-                data = gen.generate_division(difficulty)
-            else:
-                data = gen.generate(difficulty)
+            batch = [gen.generate_division(difficulty)] + gen.generate_batch(difficulty, SESSION_SIZE - 1)
         else:
-            data = gen.generate(difficulty)
-        pi = ProblemInstance.objects.create(
+            batch = gen.generate_batch(difficulty, SESSION_SIZE)
+    # Один INSERT на всю сесію (id повертаються на PostgreSQL і SQLite 3.35+)
+    problem_instances = ProblemInstance.objects.bulk_create([
+        ProblemInstance(
             problem_type=pt,
-            difficulty=difficulty,
+            difficulty=data.get('difficulty', difficulty),
             params=data['params'],
             question_text=data['question'],
             canonical_answer=data['canonical_answer'],
-            multiple_choice_options=data.get('multiple_choice', None)
+            multiple_choice_options=number_options(data.get('multiple_choice', None))
         )
-        problem_instances.append(pi)
+        for data in batch
+    ])
 
     # Зберегти інформацію про сесію
     request.session['session_problems'] = [pi.id for pi in problem_instances]
@@ -79,6 +113,7 @@ def start_session(request, slug):
     request.session['session_start_time'] = timezone.now().timestamp()
     request.session['session_type'] = slug
     request.session['session_difficulty'] = difficulty
+    SESSIONS_STARTED.labels(slug, str(difficulty)).inc()
 
     # Перенаправити на перше питання
     return redirect('show_question', pk=problem_instances[0].id)
@@ -87,12 +122,16 @@ def start_session(request, slug):
 # =============================
 # Show Question
 # =============================
+@query_budget(4)
 def show_question(request, pk):
     """
     Відображає питання користувачу
     """
-    pi = get_object_or_404(ProblemInstance, pk=pk)
-    return render(request, 'core/question.html', {'problem': pi})
+    pi = get_object_or_404(
+        ProblemInstance.objects.only('problem_type_id', 'difficulty', 'question_text', 'multiple_choice_options'),
+        pk=pk,
+    )
+    return render(request, 'core/question.html', {'problem': with_problem_type(pi)})
 
 
 # =============================
@@ -100,13 +139,27 @@ def show_question(request, pk):
 # =============================
 @require_http_methods(["POST"])
 @csrf_exempt  # можна прибрати, якщо не хочеш спрощення CSRF
+@query_budget(6)
 def submit_answer(request, pk):
     """
     Приймає відповідь користувача, перевіряє правильність
     і створює Attempt (спробу).
     """
-    pi = get_object_or_404(ProblemInstance, pk=pk)
+    pi = get_object_or_404(
+        ProblemInstance.objects.only('problem_type_id', 'difficulty', 'params', 'canonical_answer',
+                                     'multiple_choice_options'),
+        pk=pk,
+    )
     user_input = request.POST.get('answer', '').strip()
+    # Вибір варіанта надсилає його id; задачі, збережені до нумерації
+    # варіантів, надсилають значення в ``answer`` і перевіряються як текст
+    option_id = request.POST.get('option') if pi.multiple_choice_options else None
+
+    slug = with_problem_type(pi).problem_type.slug
+    # Перевірка відповіді може бути дорогою (sympy): обмежуємо частоту
+    retry_after = ratelimit.hit(request, ratelimit.rule_for_slug('submit', slug))
+    if retry_after is not None:
+        return ratelimit.too_many_requests(retry_after)
 
     # Обчислити час виконання для цього питання
     start_time = request.session.get('start_time')
@@ -115,33 +168,54 @@ def submit_answer(request, pk):
         time_taken_ms = int((timezone.now().timestamp() - float(start_time)) * 1000)
 
     # Перевірити відповідь через генератор
-    gen = PROBLEM_REGISTRY.get(pi.problem_type.slug)
-    is_correct, feedback = gen.check(user_input, pi.canonical_answer, pi.params)
+    gen = PROBLEM_REGISTRY.get(slug)
+    if option_id is not None:
+        # Правильність варіанта відома з генерації: пошук за id, без sympy
+        with phase('check'), track_problem('check_option', slug, pi.difficulty) as outcome:
+            option = find_option(pi.multiple_choice_options, option_id)
+            is_correct = bool(option and option['is_correct'])
+            feedback = None if option else "Unknown option"
+            outcome['verdict'] = check_verdict(is_correct, feedback)
+        user_input = ''
+        option_id = option['id'] if option else None
+    else:
+        with phase('check'), track_problem('check', slug, pi.difficulty) as outcome:
+            is_correct, feedback = gen.check(user_input, pi.canonical_answer, pi.params)
+            outcome['verdict'] = check_verdict(is_correct, feedback)
 
     # Хто користувач: автентифікований чи гість?
     user = request.user if request.user.is_authenticated else None
     if not request.session.session_key:
         request.session.create()
     session_id = None if user else request.session.session_key
+    if session_id:
+        # Після входу спроби цієї сесії перенесуться на користувача (users.merge)
+        request.session[GUEST_SESSION_KEY] = session_id
 
-    # Створити Attempt
-    attempt = Attempt.objects.create(
-        user=user,
+    # Перевірити, чи це останнє питання в сесії
+    session_problems = request.session.get('session_problems', [])
+    current_index = request.session.get('current_problem_index', 0)
+    is_last = current_index + 1 >= len(session_problems)
+
+    # Створити Attempt; у режимі write-behind — через журнал, крім останньої
+    # спроби сесії: сторінці результату потрібен її id
+    attempt = record_attempt(
+        durable=is_last,
+        user_id=user.pk if user else None,
         session_id=session_id,
         problem=pi,
         user_answer=user_input,
+        option_id=option_id,
         is_correct=is_correct,
         time_taken_ms=time_taken_ms,
+        timestamp=timezone.now(),
     )
 
     # Зберегти останній attempt у сесію
-    request.session['last_attempt_id'] = attempt.id
+    if attempt is not None:
+        request.session['last_attempt_id'] = attempt.id
 
-    # Перевірити, чи це останнє питання в сесії
-    session_problems = request.session.get('session_problems', [])
-    current_index = request.session.get('current_problem_index', 0)
-    
-    if current_index + 1 < len(session_problems):
+    if not is_last:
         # Є ще питання, перейти до наступного
         request.session['current_problem_index'] = current_index + 1
         next_problem_id = session_problems[current_index + 1]
@@ -149,28 +223,102 @@ def submit_answer(request, pk):
         return redirect('show_question', pk=next_problem_id)
     else:
         # Сесія завершена, показати результати
+        if session_problems:
+            SESSIONS_COMPLETED.labels(slug, str(pi.difficulty)).inc()
         return redirect('result', pk=attempt.id)
 
 
+# =============================
+# Result rows
+# =============================
+class AttemptRow(NamedTuple):
+    """Рядок таблиці спроб на сторінках результату: лише те, що показується."""
+    slug: str
+    question_text: str
+    user_answer: str
+    canonical_answer: str
+    time_taken_ms: int
+    is_correct: bool
+
+
+ATTEMPT_ROW_FIELDS = (
+    'problem__problem_type_id',
+    'problem__question_text',
+    'user_answer',
+    'problem__canonical_answer',
+    'time_taken_ms',
+    'is_correct',
+)
+
+
+def attempt_rows(queryset, pending=()):
+    """
+    Спроби як ``AttemptRow`` одним запитом (JOIN з ProblemInstance, тип — з
+    каталогу). ``pending`` — ще не вставлені рядки журналу write-behind
+    (core.attempt_journal): для них задачі читаються окремим запитом, а вже
+    вставлені відкидаються за ``journal_id``. Рядки впорядковані за часом
+    незалежно від порядку ``queryset``.
+    """
+    values = list(queryset.values_list(
+        'timestamp', 'journal_id', *ATTEMPT_ROW_FIELDS, 'option_id', 'problem__multiple_choice_options'
+    ))
+    flushed = {journal_id.hex for _, journal_id, *_ in values if journal_id}
+    pending = [entry for entry in pending if entry['journal_id'] not in flushed]
+    if pending:
+        problems = ProblemInstance.objects.only(
+            'problem_type_id', 'question_text', 'canonical_answer', 'multiple_choice_options'
+        ).in_bulk({entry['problem_id'] for entry in pending})
+        for entry in pending:
+            problem = problems.get(entry['problem_id'])
+            if problem is not None:
+                values.append((
+                    entry['timestamp'], None, problem.problem_type_id, problem.question_text,
+                    entry['user_answer'], problem.canonical_answer, entry['time_taken_ms'],
+                    entry['is_correct'], entry['option_id'], problem.multiple_choice_options,
+                ))
+    values.sort(key=lambda value: value[0])
+
+    types = problem_types()
+    rows = []
+    for _, _, type_id, question, answer, canonical, time_ms, is_correct, option_id, options in values:
+        pt = types.get_by_id(type_id)
+        rows.append(AttemptRow(pt.slug if pt else '', question, answer_text(answer, option_id, options),
+                               canonical, time_ms, is_correct))
+    return rows
+
+
+def session_attempt_rows(user_id, session_id):
+    """Спроби сесії: гостя — за session_id, користувача — з його останньої сесії."""
+    if user_id:
+        session_id = (Attempt.objects.filter(user_id=user_id).order_by('-timestamp')
+                      .values_list('session_id', flat=True).first())
+    return attempt_rows(
+        Attempt.objects.filter(session_id=session_id, user_id=user_id).order_by('timestamp'),
+        pending=pending_attempts(user_id, session_id),
+    )
+
+
+# Поля спроби (і її задачі), які показують шаблони результату
+RESULT_ATTEMPT_FIELDS = (
+    'user_id', 'session_id', 'is_correct', 'timestamp',
+    'problem__problem_type_id', 'problem__difficulty', 'problem__canonical_answer',
+)
+
+
 # =============================
 # Result View
 # =============================
+@replica_reads
+@query_budget(6)
 def result_view(request, pk):
     """
     Показує результат спроби (Attempt).
     """
-    attempt = get_object_or_404(Attempt, pk=pk)
-    # Collect all attempts in this session for this user/guest
-    # Determine the latest session for this user (or guest session id)
-    if attempt.user:
-        last_session = Attempt.objects.filter(user=attempt.user).order_by('-timestamp').values_list('session_id', flat=True).first()
-    else:
-        last_session = Attempt.objects.filter(session_id=attempt.session_id).order_by('-timestamp').values_list('session_id', flat=True).first()
-
-    attempts_list = Attempt.objects.filter(
-        session_id=last_session,
-        user=attempt.user,
-    ).order_by('timestamp')
+    attempt = get_object_or_404(
+        Attempt.objects.select_related('problem').only(*RESULT_ATTEMPT_FIELDS), pk=pk
+    )
+    with_problem_type(attempt.problem)
+    attempts_list = session_attempt_rows(attempt.user_id, attempt.session_id)
     total_ms = sum(a.time_taken_ms for a in attempts_list)
     return render(request, 'core/result.html', {
         'attempt': attempt,
@@ -182,38 +330,127 @@ def result_view(request, pk):
 # =============================
 # Share Attempt
 # =============================
+def share_key(attempt):
+    """
+    Ключ сесії для ``ShareResult.session_key``. Сесію визначає її остання
+    спроба — саме з її сторінки результату діляться посиланням.
+    """
+    return f'attempt:{attempt.pk}'
+
+
+def shared_session_rows(attempt, problem_ids=None):
+    """
+    Спроби сесії, останньою спробою якої є ``attempt``: того самого гостя чи
+    користувача і не пізніші за неї. У користувача session_id немає, тож
+    сесію визначають її задачі ``problem_ids`` (``session_problems`` сесії
+    браузера), якщо серед них є задача спроби; інакше (старіша сесія,
+    посилання без знімка) — останні ``SESSION_SIZE`` спроб до неї включно.
+    """
+    attempts = Attempt.objects.filter(
+        user_id=attempt.user_id, session_id=attempt.session_id, timestamp__lte=attempt.timestamp
+    )
+    pending = [entry for entry in pending_attempts(attempt.user_id, attempt.session_id)
+               if entry['timestamp'] <= attempt.timestamp]
+    if problem_ids and attempt.problem_id in problem_ids:
+        attempts = attempts.filter(problem_id__in=problem_ids)
+        pending = [entry for entry in pending if entry['problem_id'] in problem_ids]
+        return attempt_rows(attempts, pending=pending)
+    rows = attempt_rows(attempts.order_by('-timestamp')[:SESSION_SIZE], pending=pending)
+    return rows[-SESSION_SIZE:]
+
+
+def share_snapshot(attempt, problem_ids=None):
+    """
+    Дані сторінки поширеного результату на момент поширення: рядки сесії
+    спроби (вже відформатовані, як ``AttemptRow``), загальний час і підсумок.
+    """
+    problem = with_problem_type(attempt.problem)
+    rows = shared_session_rows(attempt, problem_ids)
+    return {
+        'problem_type': problem.problem_type.name,
+        'difficulty': problem.difficulty,
+        'is_correct': attempt.is_correct,
+        'canonical_answer': pretty_expr(problem.canonical_answer),
+        'total_time_ms': sum(row.time_taken_ms for row in rows),
+        'rows': [
+            [row.slug, pretty_expr(row.question_text), row.user_answer, pretty_expr(row.canonical_answer),
+             row.time_taken_ms, row.is_correct]
+            for row in rows
+        ],
+    }
+
+
+@query_budget(6)
 def share_attempt(request, attempt_id):
     """
-    Створює унікальне посилання для поширення результату.
+    Повертає посилання для поширення результату сесії; перше поширення
+    створює його разом зі знімком сторінки.
     """
-    attempt = get_object_or_404(Attempt, pk=attempt_id)
-    sr = ShareResult.objects.create(attempt=attempt)
+    attempt = get_object_or_404(
+        Attempt.objects.select_related('problem').only(*RESULT_ATTEMPT_FIELDS), pk=attempt_id
+    )
+    problem_ids = request.session.get('session_problems')
+    sr, _ = ShareResult.objects.only('uuid').get_or_create(
+        session_key=share_key(attempt),
+        defaults={'attempt': attempt, 'snapshot': lambda: share_snapshot(attempt, problem_ids)},
+    )
     return redirect('share_public', uuid=sr.uuid)
 
 
 # =============================
 # Share Public
 # =============================
+@replica_reads
+@query_budget(6)
 def share_public(request, uuid):
     """
-    Відображає результат за унікальним посиланням (для шарингу).
+    Відображає результат за унікальним посиланням (для шарингу) зі знімка.
     """
-    sr = get_object_or_404(ShareResult, uuid=uuid)
-    # Use the latest session for that user
-    if sr.attempt.user:
-        last_session = Attempt.objects.filter(user=sr.attempt.user).order_by('-timestamp').values_list('session_id', flat=True).first()
-    else:
-        last_session = sr.attempt.session_id
-    attempts_list = Attempt.objects.filter(
-        session_id=last_session,
-        user=sr.attempt.user,
-    ).order_by('timestamp')
-    total_ms = sum(a.time_taken_ms for a in attempts_list)
+    sr = get_object_or_404(ShareResult.objects.only('uuid', 'attempt_id', 'snapshot'), uuid=uuid)
+    snapshot = sr.snapshot
+    if snapshot is None:
+        # Посилання, створене до знімків: знімок будується один раз
+        attempt = Attempt.objects.select_related('problem').only(*RESULT_ATTEMPT_FIELDS).get(pk=sr.attempt_id)
+        snapshot = share_snapshot(attempt)
+        ShareResult.objects.filter(pk=sr.pk).update(snapshot=snapshot)
     return render(request, 'core/share_result.html', {
         'share': sr,
-        'attempts_list': attempts_list,
-        'total_time_ms': total_ms,
+        'snapshot': snapshot,
+        'attempts_list': [AttemptRow(*row) for row in snapshot['rows']],
+        'total_time_ms': snapshot['total_time_ms'],
     })
+
+
+# =============================
+# Leaderboard
+# =============================
+@replica_reads
+@query_budget(5)
+def leaderboard_view(request, slug, difficulty):
+    """
+    Таблиця лідерів типу задач і складності за тиждень або за весь час
+    (core.leaderboards), з місцем поточного користувача.
+    """
+    pt = problem_types().get_or_404(slug)
+    window = request.GET.get('window', 'week')
+    if window not in leaderboards.WINDOWS:
+        window = 'week'
+    user_id = request.user.pk if request.user.is_authenticated else None
+    board = leaderboards.leaderboard(slug, difficulty, window, user_id=user_id)
+    names = dict(get_user_model().objects.filter(
+        pk__in=[row_user for _, row_user, _ in board['top']]
+    ).values_list('pk', 'username'))
+    return render(request, 'core/leaderboard.html', {
+        'problem_type': pt,
+        'difficulty': difficulty,
+        'window': window,
+        'rows': [(rank, names.get(row_user, ''), score, row_user == user_id)
+                 for rank, row_user, score in board['top']],
+        'me': board['me'],
+        'total': board['total'],
+    })
+
+
 # =============================
 # About page
 # =============================
@@ -224,5 +461,20 @@ def about(request):
     return render(request, "core/about.html")
 
 
+# =============================
+# Metrics
+# =============================
+def metrics(request):
+    """
+    Метрики Prometheus. Доступні staff-користувачам і скрейперу
+    з адрес METRICS_ALLOWED_IPS.
+    """
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed and not request.user.is_staff:
+        return HttpResponseForbidden()
+    body, content_type = render_latest()
+    return HttpResponse(body, content_type=content_type)
+
+
 def question_list(request):
     return HttpResponse("Тут буде список питань.")
\ No newline at end of file
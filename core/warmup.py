@@ -0,0 +1,148 @@
+# core/warmup.py
+"""
+Прогрів процесу перед fork-ом gunicorn-воркерів.
+
+Викликається з ``gunicorn.conf.py`` у master-процесі (``preload_app = True``):
+імпортує генератори, проганяє кілька ``generate``/``check`` для кожного slug
+і складності, щоб sympy побудував свої внутрішні кеші, компілює шаблони та
+URL-резолвер. Після fork-у воркери ділять ці сторінки пам'яті copy-on-write.
+"""
+import gc
+import logging
+import time
+
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# Шаблони, які рендеряться на гарячому шляху сесії
+WARM_TEMPLATES = [
+    'core/home.html',
+    'core/question.html',
+    'core/result.html',
+    'core/share_result.html',
+]
+
+# Скільки задач генерувати на кожну пару (slug, difficulty)
+WARM_ROUNDS = 3
+
+
+def warm_problem_registry(rounds=WARM_ROUNDS):
+    """
+    Проганяє generate/check для кожного генератора з реєстру.
+    Перевіряє правильну, неправильну та некоректну відповіді, щоб
+    прогріти і швидкий, і повільний (sympy) шляхи перевірки.
+    Повертає dict slug -> витрачені секунди.
+    """
+    from core.views import PROBLEM_REGISTRY
+
+    timings = {}
+    for slug, gen in PROBLEM_REGISTRY.items():
+        started = time.perf_counter()
+        for difficulty in (1, 2, 3):
+            for _ in range(rounds):
+                data = gen.generate(difficulty)
+                canonical = data['canonical_answer']
+                params = data['params']
+                gen.check(canonical, canonical, params)
+                gen.check(canonical + ' + 1', canonical, params)
+                gen.check('((', canonical, params)
+                for option in data.get('multiple_choice') or []:
+                    gen.check(option['value'], canonical, params)
+        timings[slug] = time.perf_counter() - started
+    return timings
+
+
+def warm_catalog():
+    """
+    Відкриває каталог задач (mmap) у master-процесі, щоб воркери
+    успадкували вже розібраний індекс. Повертає кількість записів або 0.
+    """
+    from exercises.catalog import default_catalog
+
+    catalog = default_catalog()
+    return catalog.count if catalog is not None else 0
+
+
+def warm_templates():
+    """Компілює шаблони і заповнює кеш filter-ів форматування."""
+    from core.templatetags.math_format import pretty_expr
+
+    for name in WARM_TEMPLATES:
+        get_template(name)
+    pretty_expr('\\left(2 a - 3 b\\right)^{2}')
+
+
+def warm_urls():
+    """Будує URL-резолвер (він лінивий і інакше будується на першому запиті)."""
+    reverse('home')
+    reverse('show_question', kwargs={'pk': 1})
+
+
+def warm_generation_pool():
+    """
+    Запускає пул паралельної генерації (core.parallel_generation) у
+    воркері, щоб його процеси імпортували sympy до першої сесії. Не в
+    master: пул не можна успадковувати через fork. Воркер без вільного
+    слота хоста (GENERATION_POOL_MAX_PROCESSES) пулу не запускає.
+    """
+    from django.conf import settings
+    from core import parallel_generation
+    from core.views import PROBLEM_REGISTRY
+
+    if not settings.GENERATION_POOL_ENABLED:
+        return
+    parallel_generation.warm_pool(
+        [gen for slug, gen in PROBLEM_REGISTRY.items() if slug in settings.GENERATION_POOL_SLUGS]
+    )
+
+
+def warm_up():
+    """
+    Повний прогрів перед fork-ом. Закриває з'єднання з БД, щоб воркери
+    не успадкували спільний сокет, і заморожує GC, щоб збирач сміття
+    не торкався успадкованих об'єктів і не ламав copy-on-write.
+    """
+    started = time.perf_counter()
+    timings = warm_problem_registry()
+    catalog_size = warm_catalog()
+    warm_templates()
+    warm_urls()
+    connections.close_all()
+
+    gc.collect()
+    gc.freeze()
+
+    logger.info(
+        "Warm-up finished in %.2fs (%s; catalog: %d problems)",
+        time.perf_counter() - started,
+        ", ".join(f"{slug}={t:.2f}s" for slug, t in timings.items()),
+        catalog_size,
+    )
+
+
+def memory_usage():
+    """
+    Повертає dict з RSS/PSS/private пам'яттю поточного процесу в кБ.
+    RSS враховує спільні сторінки повністю, тому для оцінки виграшу від
+    preload дивимось на PSS і Private (Linux, /proc/self/smaps_rollup).
+    """
+    usage = {}
+    fields = {
+        'Rss:': 'rss_kb',
+        'Pss:': 'pss_kb',
+        'Private_Clean:': 'private_clean_kb',
+        'Private_Dirty:': 'private_dirty_kb',
+    }
+    try:
+        with open('/proc/self/smaps_rollup') as fh:
+            for line in fh:
+                parts = line.split()
+                if parts and parts[0] in fields:
+                    usage[fields[parts[0]]] = int(parts[1])
+    except OSError:
+        return usage
+    usage['private_kb'] = usage.pop('private_clean_kb', 0) + usage.pop('private_dirty_kb', 0)
+    return usage
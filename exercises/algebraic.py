@@ -1,7 +1,57 @@
 # exercises/algebraic.py
+import itertools
 import random
 import sympy as sp
 from .base import BaseProblem
+from .polynomial import (
+    add, check_polynomial, mul, parse_polynomial, power, product_latex, product_str,
+    scale, sub, to_json, to_latex, to_str,
+)
+
+# Змінні, від яких залежать відповіді (для мапи коефіцієнтів)
+VARIABLES = ('a', 'b', 'c')
+
+
+def _poly(text):
+    return parse_polynomial(text, VARIABLES)
+
+
+def _pattern(*factors):
+    """Шаблон — добуток множників ``(многочлен, степінь)``."""
+    return tuple((_poly(text), exponent) for text, exponent in factors)
+
+
+# Для кожного рівня: шаблони, діапазон коефіцієнтів і змінні, що їх отримують.
+# Розкриття й форматування — без sympy (exercises.polynomial), з тим самим
+# текстом питань і відповідей, що дають sympy.expand/sympy.latex
+EXPANSIONS = {
+    # (a+b)^2, (a-b)^2
+    'simple_expansion': (
+        [_pattern(('a + b', 2)), _pattern(('a - b', 2))],
+        range(1, 6),
+        ('a', 'b'),
+    ),
+    # (a+b)^3, (a-b)^3, (a+b)(a-b)
+    'medium_expansion': (
+        [_pattern(('a + b', 3)), _pattern(('a - b', 3)), _pattern(('a + b', 1), ('a - b', 1)),
+         _pattern(('a + b', 1), ('a**2 - a*b + b**2', 1))],
+        range(1, 4),
+        ('a', 'b'),
+    ),
+    # Complex expressions with multiple terms
+    'complex_expansion': (
+        [_pattern(('a + b + c', 2)), _pattern(('a + b', 1), ('a + c', 1), ('b + c', 1)),
+         _pattern(('a**2 + b**2', 1), ('a + b', 1)), _pattern(('a + b + c', 1), ('a - b + c', 1))],
+        range(1, 3),
+        ('a', 'b', 'c'),
+    ),
+}
+
+# Многочлени для неправильних варіантів відповіді
+_TWO_AB = _poly('2*a*b')
+_A2_B2 = _poly('a**2 + b**2')
+_AB = _poly('a*b')
+
 
 class AlgebraicIdentitiesProblem(BaseProblem):
     slug = 'algebraic'
@@ -18,181 +68,102 @@ class AlgebraicIdentitiesProblem(BaseProblem):
             # Hard: Complex expressions with multiple terms
             return self._generate_complex_expansion()
 
-    def _generate_simple_expansion(self):
-        a, b = sp.symbols('a b')
-        patterns = [
-            (a + b)**2,
-            (a - b)**2,
+    def enumerate_space(self, difficulty):
+        kind = self._kind(difficulty)
+        patterns, coeffs, symbols = EXPANSIONS[kind]
+        return [
+            [
+                self._build(kind, pattern, dict(zip(symbols, values)))
+                for values in itertools.product(coeffs, repeat=len(symbols))
+            ]
+            for pattern in patterns
         ]
-        
-        pattern = random.choice(patterns)
-        
-        # Random coefficients
-        coeff_a = random.randint(1, 5)
-        coeff_b = random.randint(1, 5)
-        
-        # Substitute with coefficients
-        pattern_with_coeffs = pattern.subs({a: coeff_a * a, b: coeff_b * b})
-        expanded_with_coeffs = sp.expand(pattern_with_coeffs)
-        
-        # Generate multiple choice options
-        options = self._generate_multiple_choice_options(expanded_with_coeffs, pattern_with_coeffs)
-        
-        return {
-            'question': sp.latex(pattern_with_coeffs),
-            'canonical_answer': str(expanded_with_coeffs),
-            'multiple_choice': options,
-            'params': {
-                'pattern': str(pattern),
-                'coeff_a': coeff_a,
-                'coeff_b': coeff_b,
-                'type': 'simple_expansion'
-            }
-        }
+
+    def _kind(self, difficulty):
+        if difficulty == 1:
+            return 'simple_expansion'
+        if difficulty == 2:
+            return 'medium_expansion'
+        return 'complex_expansion'
+
+    def _generate_simple_expansion(self):
+        return self._generate_expansion('simple_expansion')
 
     def _generate_medium_expansion(self):
-        a, b = sp.symbols('a b')
-        patterns = [
-            (a + b)**3,
-            (a - b)**3,
-            (a + b) * (a - b),
-            (a + b) * (a**2 - a*b + b**2),
-        ]
-        
+        return self._generate_expansion('medium_expansion')
+
+    def _generate_complex_expansion(self):
+        return self._generate_expansion('complex_expansion')
+
+    def _generate_expansion(self, kind):
+        patterns, coeffs, symbols = EXPANSIONS[kind]
         pattern = random.choice(patterns)
-        
+
         # Random coefficients
-        coeff_a = random.randint(1, 3)
-        coeff_b = random.randint(1, 3)
-        
-        pattern_with_coeffs = pattern.subs({a: coeff_a * a, b: coeff_b * b})
-        expanded_with_coeffs = sp.expand(pattern_with_coeffs)
-        
+        values = [random.choice(coeffs) for _ in symbols]
+        return self._build(kind, pattern, dict(zip(symbols, values)))
+
+    def _build(self, kind, pattern, coeffs):
+        # Substitute with coefficients
+        factors = [coeffs.get(name, 1) for name in VARIABLES]
+        pattern_with_coeffs = [(scale(poly, factors), exponent) for poly, exponent in pattern]
+        expanded_with_coeffs = {(0,) * len(VARIABLES): 1}
+        for poly, exponent in pattern_with_coeffs:
+            expanded_with_coeffs = mul(expanded_with_coeffs, power(poly, exponent, len(VARIABLES)))
+
+        params = {'pattern': product_str(pattern, VARIABLES)}
+        params.update({f'coeff_{sym}': coeff for sym, coeff in coeffs.items()})
+        params['type'] = kind
+        params['canonical_poly'] = to_json(expanded_with_coeffs, VARIABLES)
+
         # Generate multiple choice options
-        options = self._generate_multiple_choice_options(expanded_with_coeffs, pattern_with_coeffs)
-        
+        options = self._generate_multiple_choice_options(
+            expanded_with_coeffs, product_str(pattern_with_coeffs, VARIABLES), params
+        )
         return {
-            'question': sp.latex(pattern_with_coeffs),
-            'canonical_answer': str(expanded_with_coeffs),
+            'question': product_latex(pattern_with_coeffs, VARIABLES),
+            'canonical_answer': to_str(expanded_with_coeffs, VARIABLES),
             'multiple_choice': options,
-            'params': {
-                'pattern': str(pattern),
-                'coeff_a': coeff_a,
-                'coeff_b': coeff_b,
-                'type': 'medium_expansion'
-            }
+            'params': params,
         }
 
-    def _generate_complex_expansion(self):
-        a, b, c = sp.symbols('a b c')
-        patterns = [
-            (a + b + c)**2,
-            (a + b) * (a + c) * (b + c),
-            (a**2 + b**2) * (a + b),
-            (a + b + c) * (a - b + c),
-        ]
-        
-        pattern = random.choice(patterns)
-        
-        # Random coefficients
-        coeff_a = random.randint(1, 2)
-        coeff_b = random.randint(1, 2)
-        coeff_c = random.randint(1, 2)
-        
-        pattern_with_coeffs = pattern.subs({
-            a: coeff_a * a, 
-            b: coeff_b * b, 
-            c: coeff_c * c
-        })
-        expanded_with_coeffs = sp.expand(pattern_with_coeffs)
-        
-        # Generate multiple choice options
-        options = self._generate_multiple_choice_options(expanded_with_coeffs, pattern_with_coeffs)
-        
+    def _option(self, poly, is_correct=False):
         return {
-            'question': sp.latex(pattern_with_coeffs),
-            'canonical_answer': str(expanded_with_coeffs),
-            'multiple_choice': options,
-            'params': {
-                'pattern': str(pattern),
-                'coeff_a': coeff_a,
-                'coeff_b': coeff_b,
-                'coeff_c': coeff_c,
-                'type': 'complex_expansion'
-            }
+            'text': to_latex(poly, VARIABLES),
+            'value': to_str(poly, VARIABLES),
+            'is_correct': is_correct,
         }
 
-    def _generate_multiple_choice_options(self, correct_answer, original_expression):
+    def _generate_multiple_choice_options(self, correct_poly, original_str, params):
         """Generate multiple choice options for algebraic problems"""
-        import random
-        
-        # Parse the correct answer
-        correct_expr = sp.sympify(correct_answer)
-        
-        # Generate wrong options by modifying the correct answer
-        options = []
-        
         # Option 1: Correct answer
-        options.append({
-            'text': sp.latex(correct_expr),
-            'value': str(correct_expr),
-            'is_correct': True
-        })
-        
+        options = [self._option(correct_poly, is_correct=True)]
+
         # Option 2: Missing middle term (for (a+b)^2 = a^2 + 2ab + b^2, show a^2 + b^2)
-        if '**2' in str(original_expression) or '^2' in str(original_expression):
-            try:
-                # Try to create a wrong answer by removing the middle term
-                wrong_expr = correct_expr - 2 * sp.symbols('a') * sp.symbols('b')
-                options.append({
-                    'text': sp.latex(wrong_expr),
-                    'value': str(wrong_expr),
-                    'is_correct': False
-                })
-            except:
-                pass
-        
+        if '**2' in original_str:
+            options.append(self._option(sub(correct_poly, _TWO_AB)))
+
         # Option 3: Wrong sign on one term
-        try:
-            wrong_expr = correct_expr + 2 * sp.symbols('a') * sp.symbols('b')
-            options.append({
-                'text': sp.latex(wrong_expr),
-                'value': str(wrong_expr),
-                'is_correct': False
-            })
-        except:
-            pass
-        
+        options.append(self._option(add(correct_poly, _TWO_AB)))
+
         # Option 4: Completely different expression
-        try:
-            a, b = sp.symbols('a b')
-            wrong_expr = a**2 + b**2 + a*b
-            options.append({
-                'text': sp.latex(wrong_expr),
-                'value': str(wrong_expr),
-                'is_correct': False
-            })
-        except:
-            pass
-        
-        # If we don't have enough options, generate some simple wrong ones
-        while len(options) < 4:
-            try:
-                a, b = sp.symbols('a b')
-                wrong_expr = a**2 + b**2 + random.randint(1, 5) * a * b
-                options.append({
-                    'text': sp.latex(wrong_expr),
-                    'value': str(wrong_expr),
-                    'is_correct': False
-                })
-            except:
-                break
-        
-        # Shuffle options and ensure we have exactly 4
+        options.append(self._option(add(_A2_B2, _AB)))
+
+        # Simple wrong ones, in case some of the above repeat
+        for k in random.sample(range(2, 7), 5):
+            options.append(self._option(add(_A2_B2, {exps: k * coeff for exps, coeff in _AB.items()})))
+
+        # Exactly 4 distinct options, only the first accepted by check()
+        options = self.distinct_options(options, to_str(correct_poly, VARIABLES), params)
         random.shuffle(options)
-        return options[:4]
+        return options
 
     def check(self, user_input, canonical_answer, params):
+        # Швидкий шлях: обидві відповіді — поліноми, порівнюємо коефіцієнти
+        fast = check_polynomial(user_input, params)
+        if fast is not None:
+            return fast, None
+
         try:
             # Parse user input and canonical answer
             user_expr = sp.sympify(user_input)
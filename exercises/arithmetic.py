@@ -1,73 +1,71 @@
 # exercises/arithmetic.py
 import random
 from fractions import Fraction
+from functools import lru_cache
 from .base import BaseProblem
 import sympy as sp
 
+OPERATORS = ['+', '-', '*', '/']
+
+
+def _ranges(op, difficulty):
+    """Діапазони операндів (a, b) для оператора й складності."""
+    if difficulty == 1:
+        if op in ['+', '-', '/']:
+            return (0, 50), (0, 50)
+        return (-20, 20), (-20, 20)  # '*'
+    if difficulty == 2:
+        return (-20, 20), (-20, 20)
+    return (-100, 100), (-100, 100)
+
+
+@lru_cache(maxsize=None)
+def _divisors(low, high):
+    return tuple(d for d in range(low, high + 1) if d != 0)
+
+
 class ArithmeticProblem(BaseProblem):
     slug = 'arithmetic'
     name = 'Усна лічба'
 
     def generate(self, difficulty):
-        op = random.choice(['+', '-', '*', '/'])
+        op = random.choice(OPERATORS)
         return self._generate_op(op, difficulty)
 
     def generate_division(self, difficulty):
         return self._generate_op('/', difficulty)
 
-    def _generate_op(self, op: str, difficulty: int) -> dict:
-        # Select ranges per difficulty and operation
-        if difficulty == 1:
-            if op in ['+', '-', '/']:
-                rng_a = (0, 50)
-                rng_b = (0, 50)
-            else:  # '*'
-                rng_a = (-20, 20)
-                rng_b = (-20, 20)
-        elif difficulty == 2:
-            rng_a = (-20, 20)
-            rng_b = (-20, 20)
-        else:
-            rng_a = (-100, 100)
-            rng_b = (-100, 100)
+    def generate_batch(self, difficulty, n, seed=None):
+        # Спершу всі оператори одним викликом, потім операнди й текст
+        rng = random.Random(seed)
+        ops = rng.choices(OPERATORS, k=n)
+        return [self._generate_op(op, difficulty, rng) for op in ops]
+
+    def _generate_op(self, op: str, difficulty: int, rng=random) -> dict:
+        rng_a, rng_b = _ranges(op, difficulty)
 
-        if op == '+':
-            a = random.randint(*rng_a)
-            b = random.randint(*rng_b)
-            expr = sp.Integer(a) + sp.Integer(b)
-        elif op == '-':
-            a = random.randint(*rng_a)
-            b = random.randint(*rng_b)
-            expr = sp.Integer(a) - sp.Integer(b)
-        elif op == '*':
-            a = random.randint(*rng_a)
-            b = random.randint(*rng_b)
-            expr = sp.Integer(a) * sp.Integer(b)
-        else:  # '/'
+        if op == '/':
             # Build dividend as divisor * quotient to guarantee integer result
             # Choose non-zero divisor in range_b
-            possible_divisors = [d for d in range(rng_b[0], rng_b[1] + 1) if d != 0]
-            b = random.choice(possible_divisors)
+            b = rng.choice(_divisors(*rng_b))
             # Choose quotient in range_a
-            q = random.randint(rng_a[0], rng_a[1])
+            q = rng.randint(*rng_a)
             a = b * q
-            expr = sp.Integer(a) / sp.Integer(b)
-
-        ans = sp.simplify(expr)
-        canonical = str(int(ans)) if getattr(ans, 'is_integer', False) else str(ans)
-
-        if op == '+':
-            qtext = f"{a} + {b}"
-        elif op == '-':
-            qtext = f"{a} - {b}"
-        elif op == '*':
-            qtext = f"{a} * {b}"
+            answer = q
         else:
-            qtext = f"{a} / {b}"
+            a = rng.randint(*rng_a)
+            b = rng.randint(*rng_b)
+            if op == '+':
+                answer = a + b
+            elif op == '-':
+                answer = a - b
+            else:
+                answer = a * b
 
+        # Операнди цілі, тож відповідь рахується без sympy
         return {
-            'question': qtext,
-            'canonical_answer': canonical,
+            'question': f"{a} {op} {b}",
+            'canonical_answer': str(answer),
             'params': {'operands': [a, b], 'operators': [op], 'difficulty': difficulty}
         }
 
@@ -1,6 +1,47 @@
 # exercises/base.py
+import itertools
+import random
 from abc import ABC, abstractmethod
 
+
+# Скінченний простір виразів задається списком сімейств
+# ``(builder, domains)``: сімейство вибирається рівноймовірно, потім кожен
+# параметр — рівноймовірно зі свого домену, і ``builder(*values)`` будує вираз.
+def draw(families, rng=random):
+    """Випадковий вираз зі скінченного простору (як при генерації)."""
+    builder, domains = rng.choice(families)
+    return builder(*[rng.choice(domain) for domain in domains])
+
+
+def enumerate_family(family):
+    """Усі вирази сімейства — декартів добуток доменів параметрів."""
+    builder, domains = family
+    return [builder(*values) for values in itertools.product(*domains)]
+
+
+# Варіанти відповіді (``multiple_choice``) — dict з ``text``, ``value`` та
+# ``is_correct``. Перед збереженням задачі кожен отримує ``id`` (1..n у
+# порядку показу): форма надсилає саме його, і правильність вибору
+# визначається пошуком за id без розбору виразу.
+def number_options(options):
+    """Копія варіантів з ``id``; None/порожній список повертаються як є."""
+    if not options:
+        return options
+    return [{**option, 'id': number} for number, option in enumerate(options, 1)]
+
+
+def find_option(options, option_id):
+    """Варіант з ``id == option_id`` (int або рядок з форми) або None."""
+    try:
+        option_id = int(option_id)
+    except (TypeError, ValueError):
+        return None
+    for option in options or ():
+        if option.get('id') == option_id:
+            return option
+    return None
+
+
 class BaseProblem(ABC):
     slug = 'base'
     name = 'Base Problem'
@@ -21,3 +62,51 @@ class BaseProblem(ABC):
         Повертає (is_correct: bool, feedback: str|None)
         """
         pass
+
+    def generate_batch(self, difficulty: int, n: int, seed=None) -> list:
+        """
+        Повертає список з ``n`` задач у форматі ``generate``.
+        З ``seed`` результат відтворюваний.
+
+        Базова реалізація викликає ``generate`` у циклі (глобальний стан
+        ``random`` після виклику відновлюється); генератори з чисто числовими
+        параметрами перевизначають її через власний ``random.Random``.
+        """
+        if seed is None:
+            return [self.generate(difficulty) for _ in range(n)]
+        state = random.getstate()
+        random.seed(seed)
+        try:
+            return [self.generate(difficulty) for _ in range(n)]
+        finally:
+            random.setstate(state)
+
+    def distinct_options(self, options, canonical_answer, params, size=4):
+        """
+        Перший (правильний) варіант і до ``size - 1`` неправильних з решти
+        ``options`` у їхньому порядку. Пропускаються варіанти, що повторюють
+        уже взяте значення, і ті, які ``check`` приймає (напр. первісна з
+        іншою сталою): ``submit_answer`` оцінює вибір лише за ``is_correct``,
+        тож прапорець має збігатися з перевіркою введеної відповіді.
+        """
+        correct, *candidates = options
+        result = [correct]
+        seen = {correct['value']}
+        for option in candidates:
+            if len(result) == size:
+                break
+            if option['value'] in seen or self.check(option['value'], canonical_answer, params)[0]:
+                continue
+            seen.add(option['value'])
+            result.append(option)
+        return result
+
+    def enumerate_space(self, difficulty: int):
+        """
+        Для генераторів зі скінченним простором задач — список сімейств,
+        кожне — список задач у форматі ``generate``. Сімейства рівноймовірні,
+        задачі в межах сімейства теж, тож рівномірний вибір відтворює
+        розподіл ``generate``. None — простір не перелічується
+        (див. exercises.catalog).
+        """
+        return None
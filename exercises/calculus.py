@@ -1,7 +1,53 @@
 # exercises/calculus.py
 import random
 import sympy as sp
-from .base import BaseProblem
+from .base import BaseProblem, draw, enumerate_family
+from .polynomial import canonical_poly, check_polynomial
+from .equivalence import (
+    TOO_COMPLEX_FEEDBACK, CheckTimeout, TooComplex, equivalent, parse_answer, parse_cached, time_limit,
+)
+
+# Змінна задач з математичного аналізу (для мапи коефіцієнтів)
+VARIABLES = ('x',)
+
+x = sp.Symbol('x')
+
+# Простори функцій (сімейства для exercises.base.draw)
+BASIC_DERIVATIVES = [
+    # Power functions
+    (lambda n: x**n, [range(2, 6)]),
+    # Polynomials
+    (lambda n, k, m: x**n + k * x + m, [range(2, 5), range(1, 6), range(1, 11)]),
+    # Simple trigonometric
+    (lambda f: f(x), [(sp.sin, sp.cos)]),
+]
+COMPLEX_DERIVATIVES = [
+    # Product rule: f(x) * g(x)
+    (lambda n: x**n * sp.sin(x), [range(2, 4)]),
+    (lambda n: x**n * sp.cos(x), [range(2, 4)]),
+    # Chain rule: f(g(x))
+    (lambda n: sp.sin(x**n), [range(2, 4)]),
+    (lambda n: sp.cos(x**n), [range(2, 4)]),
+    # Quotient rule: f(x) / g(x)
+    (lambda n, k: x**n / (x + k), [range(2, 5), range(1, 4)]),
+]
+# Use increasingly complex functions with difficulty
+INTEGRANDS = {
+    1: [
+        (lambda n: x**n, [range(1, 5)]),
+        (lambda k: x + k, [range(1, 6)]),
+    ],
+    2: [
+        (lambda n, k: x**n + k * x, [range(2, 5), range(1, 4)]),
+        (lambda: sp.sin(x), []),
+        (lambda: sp.cos(x), []),
+    ],
+    3: [
+        (lambda n, k, m: x**n + k * x + m, [range(2, 6), range(1, 6), range(1, 6)]),
+        (lambda: sp.exp(x), []),
+        (lambda: sp.sin(x) + sp.cos(x), []),
+    ],
+}
 
 class DerivativesProblem(BaseProblem):
     slug = 'derivatives'
@@ -18,73 +64,42 @@ class DerivativesProblem(BaseProblem):
             # Hard: More complex derivatives
             return self._generate_complex_derivative()
 
-    def _generate_basic_derivative(self):
-        x = sp.Symbol('x')
-        
-        # Basic functions
-        functions = [
-            # Power functions
-            lambda: x**random.randint(2, 5),
-            # Polynomials
-            lambda: x**random.randint(2, 4) + random.randint(1, 5) * x + random.randint(1, 10),
-            # Simple trigonometric
-            lambda: sp.sin(x) if random.choice([True, False]) else sp.cos(x),
+    def enumerate_space(self, difficulty):
+        if difficulty == 1:
+            families, kind = BASIC_DERIVATIVES, 'basic_derivative'
+        else:
+            families, kind = COMPLEX_DERIVATIVES, 'complex_derivative'
+        return [
+            [self._build(func, kind) for func in enumerate_family(family)]
+            for family in families
         ]
-        
-        func_generator = random.choice(functions)
-        func = func_generator()
-        
-        # Calculate derivative
-        derivative = sp.diff(func, x)
-        
-        # Generate multiple choice options
-        options = self._generate_multiple_choice_options(derivative, func)
-        
-        return {
-            'question': sp.latex(func),
-            'canonical_answer': str(derivative),
-            'multiple_choice': options,
-            'params': {
-                'function': str(func),
-                'type': 'basic_derivative'
-            }
-        }
+
+    def _generate_basic_derivative(self):
+        return self._build(draw(BASIC_DERIVATIVES), 'basic_derivative')
 
     def _generate_complex_derivative(self):
-        x = sp.Symbol('x')
-        
-        # More complex functions
-        functions = [
-            # Product rule: f(x) * g(x)
-            lambda: x**random.randint(2, 3) * sp.sin(x),
-            lambda: x**random.randint(2, 3) * sp.cos(x),
-            # Chain rule: f(g(x))
-            lambda: sp.sin(x**random.randint(2, 3)),
-            lambda: sp.cos(x**random.randint(2, 3)),
-            # Quotient rule: f(x) / g(x)
-            lambda: x**random.randint(2, 4) / (x + random.randint(1, 3)),
-        ]
-        
-        func_generator = random.choice(functions)
-        func = func_generator()
-        
+        return self._build(draw(COMPLEX_DERIVATIVES), 'complex_derivative')
+
+    def _build(self, func, kind):
         # Calculate derivative
         derivative = sp.diff(func, x)
-        
+        params = {
+            'function': str(func),
+            'type': kind,
+            'canonical_poly': canonical_poly(str(derivative), VARIABLES),
+        }
+
         # Generate multiple choice options
-        options = self._generate_multiple_choice_options(derivative, func)
+        options = self._generate_multiple_choice_options(derivative, func, params)
         
         return {
             'question': sp.latex(func),
             'canonical_answer': str(derivative),
             'multiple_choice': options,
-            'params': {
-                'function': str(func),
-                'type': 'complex_derivative'
-            }
+            'params': params,
         }
 
-    def _generate_multiple_choice_options(self, correct_answer, original_function):
+    def _generate_multiple_choice_options(self, correct_answer, original_function, params):
         """Generate multiple choice options for calculus problems"""
         import random
         
@@ -140,34 +155,40 @@ class DerivativesProblem(BaseProblem):
         except:
             pass
         
-        # If we don't have enough options, generate some simple wrong ones
-        while len(options) < 4:
-            try:
-                wrong_expr = correct_expr + random.randint(1, 5) * x
-                options.append({
-                    'text': sp.latex(wrong_expr),
-                    'value': str(wrong_expr),
-                    'is_correct': False
-                })
-            except:
-                break
-        
-        # Shuffle options and ensure we have exactly 4
+        # Simple wrong ones, in case some of the above repeat or are correct
+        for k in random.sample(range(1, 6), 5):
+            wrong_expr = correct_expr + k * x
+            options.append({
+                'text': sp.latex(wrong_expr),
+                'value': str(wrong_expr),
+                'is_correct': False
+            })
+
+        # Exactly 4 distinct options, only the first accepted by check()
+        options = self.distinct_options(options, str(correct_answer), params)
         random.shuffle(options)
-        return options[:4]
+        return options
 
     def check(self, user_input, canonical_answer, params):
+        # Швидкий шлях для поліноміальних похідних
+        fast = check_polynomial(user_input, params)
+        if fast is not None:
+            return fast, None
+
         try:
-            # Parse user input and canonical answer
-            user_expr = sp.sympify(user_input)
-            correct_expr = sp.sympify(canonical_answer)
-            
-            # For derivatives, check if they are equivalent
-            diff = sp.simplify(user_expr - correct_expr)
-            is_correct = (diff == 0)
-            
+            with time_limit():
+                # Parse user input and canonical answer
+                user_expr = parse_answer(user_input)
+                correct_expr = parse_cached(canonical_answer)
+
+                # For derivatives, check if they are equivalent
+                diff = sp.simplify(user_expr - correct_expr)
+                is_correct = (diff == 0)
+
             return bool(is_correct), None
-            
+
+        except (TooComplex, CheckTimeout):
+            return False, TOO_COMPLEX_FEEDBACK
         except Exception as e:
             return False, f"Invalid input format. Please check your syntax. Error: {str(e)}"
 
@@ -177,40 +198,30 @@ class IntegralsProblem(BaseProblem):
     name = 'Integrals'
 
     def generate(self, difficulty):
-        x = sp.Symbol('x')
-        # Use increasingly complex functions with difficulty
-        if difficulty == 1:
-            functions = [
-                lambda: x**random.randint(1, 4),
-                lambda: x + random.randint(1, 5),
-            ]
-        elif difficulty == 2:
-            functions = [
-                lambda: x**random.randint(2, 4) + random.randint(1, 3) * x,
-                lambda: sp.sin(x),
-                lambda: sp.cos(x),
-            ]
-        else:
-            functions = [
-                lambda: x**random.randint(2, 5) + random.randint(1, 5) * x + random.randint(1, 5),
-                lambda: sp.exp(x),
-                lambda: sp.sin(x) + sp.cos(x),
-            ]
+        return self._build(draw(INTEGRANDS.get(difficulty, INTEGRANDS[3])))
+
+    def enumerate_space(self, difficulty):
+        return [
+            [self._build(func) for func in enumerate_family(family)]
+            for family in INTEGRANDS.get(difficulty, INTEGRANDS[3])
+        ]
 
-        func = random.choice(functions)()
+    def _build(self, func):
         integral = sp.integrate(func, x)
-        options = self._generate_multiple_choice_options(integral, func)
+        params = {
+            'function': str(func),
+            'type': 'integral',
+            'canonical_poly': canonical_poly(str(integral), VARIABLES),
+        }
+        options = self._generate_multiple_choice_options(integral, func, params)
         return {
             'question': sp.latex(func),
             'canonical_answer': str(integral),
             'multiple_choice': options,
-            'params': {
-                'function': str(func),
-                'type': 'integral'
-            }
+            'params': params,
         }
 
-    def _generate_multiple_choice_options(self, correct_answer, original_function):
+    def _generate_multiple_choice_options(self, correct_answer, original_function, params):
         # reuse same logic as above class
         correct_expr = sp.sympify(correct_answer)
         x = sp.Symbol('x')
@@ -230,20 +241,41 @@ class IntegralsProblem(BaseProblem):
             'value': str(correct_expr - x),
             'is_correct': False
         })
-        options.append({
-            'text': sp.latex(correct_expr + 1),
-            'value': str(correct_expr + 1),
-            'is_correct': False
-        })
+        # Not "+ 1": an antiderivative plus a constant is also correct
+        for k in random.sample(range(2, 6), 4):
+            options.append({
+                'text': sp.latex(correct_expr + k * x),
+                'value': str(correct_expr + k * x),
+                'is_correct': False
+            })
+        options = self.distinct_options(options, str(correct_answer), params)
         random.shuffle(options)
-        return options[:4]
+        return options
 
     def check(self, user_input, canonical_answer, params):
+        # Швидкий шлях для поліноміальних первісних: рівність з точністю до константи
+        fast = check_polynomial(user_input, params, ignore_constant=True, constant_symbols=('C',))
+        if fast is not None:
+            return fast, None
+
         try:
-            user_expr = sp.sympify(user_input)
-            correct_expr = sp.sympify(canonical_answer)
-            # Integrals equal up to constant
-            diff = sp.simplify(user_expr - correct_expr)
-            return bool(diff.is_constant() or diff == 0), None
+            with time_limit():
+                user_expr = parse_answer(user_input)
+                function = params.get('function') if params else None
+                if function:
+                    # Похідна відповіді має дорівнювати підінтегральній функції;
+                    # додана константа зникає при диференціюванні. Сторонні
+                    # символи, окрім константи інтегрування C, не приймаються.
+                    x = sp.Symbol('x')
+                    if user_expr.free_symbols - {x, sp.Symbol('C')}:
+                        return False, None
+                    return bool(equivalent(sp.diff(user_expr, x), parse_cached(function), x)), None
+
+                correct_expr = sp.sympify(canonical_answer)
+                # Integrals equal up to constant
+                diff = sp.simplify(user_expr - correct_expr)
+                return bool(diff.is_constant() or diff == 0), None
+        except (TooComplex, CheckTimeout):
+            return False, TOO_COMPLEX_FEEDBACK
         except Exception as e:
             return False, f"Invalid input format. Please check your syntax. Error: {str(e)}"
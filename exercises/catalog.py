@@ -0,0 +1,239 @@
+# exercises/catalog.py
+"""
+Прекомпільований каталог задач для генераторів зі скінченним простором.
+
+``build_catalog`` один раз перелічує ``enumerate_space`` кожного генератора
+(див. exercises.base) і записує всі задачі — питання (LaTeX), канонічну
+відповідь, params і варіанти вибору — в один бінарний файл. Воркери
+відкривають його через ``mmap``: сторінки файлу спільні для всіх процесів
+(page cache), а генерація стає вибором випадкового індексу без sympy.
+
+Формат файлу::
+
+    MAGIC (8 байт) | довжина індексу (uint32) | індекс (JSON)
+    | зміщення записів (uint64 × (count + 1)) | записи (компактний JSON)
+
+Індекс містить для кожного slug і складності список сімейств
+``[перший_запис, кількість]`` і відбиток вихідного коду генератора та
+модулів ``exercises``, які він використовує (base, polynomial тощо):
+якщо будь-який з них змінився після збірки, розділ ігнорується.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+import sympy as sp
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TMCATLG1'
+_HEADER = struct.Struct('<8sI')
+_OFFSET = struct.Struct('<Q')
+
+DIFFICULTIES = (1, 2, 3)
+
+
+class CatalogError(ValueError):
+    """Файл не є каталогом задач або пошкоджений."""
+
+
+PACKAGE = __name__.rpartition('.')[0]
+
+
+def dependencies(module_name):
+    """Модулі пакета ``exercises``, від яких (транзитивно) залежить модуль, включно з ним."""
+    seen = set()
+    stack = [module_name]
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        for value in vars(sys.modules[name]).values():
+            dep = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+            if isinstance(dep, str) and dep.startswith(PACKAGE + '.') and dep in sys.modules:
+                stack.append(dep)
+    return sorted(seen)
+
+
+def fingerprint(gen):
+    """
+    Відбиток коду генератора й модулів ``exercises``, які він імпортує:
+    зміна будь-якого з них робить розділ каталогу застарілим.
+    """
+    digest = hashlib.sha1()
+    for name in dependencies(type(gen).__module__):
+        digest.update(name.encode('utf-8'))
+        digest.update(inspect.getsource(sys.modules[name]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _encode(problem):
+    record = {
+        'q': problem['question'],
+        'a': problem['canonical_answer'],
+        'p': problem['params'],
+        'o': problem.get('multiple_choice'),
+    }
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def build_catalog(registry, path, seed=0):
+    """
+    Перелічує простори генераторів з ``registry`` і записує каталог у ``path``.
+    Генератори без ``enumerate_space`` пропускаються. ``seed`` фіксує
+    випадкові дистрактори, щоб збірка була відтворюваною.
+    Повертає dict ``slug -> кількість записів``.
+    """
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        records = []
+        sections = {}
+        counts = {}
+        for slug, gen in registry.items():
+            levels = {}
+            for difficulty in DIFFICULTIES:
+                families = gen.enumerate_space(difficulty)
+                if not families:
+                    continue
+                spans = []
+                for family in families:
+                    spans.append([len(records), len(family)])
+                    records.extend(_encode(problem) for problem in family)
+                levels[str(difficulty)] = spans
+            if levels:
+                sections[slug] = {'fingerprint': fingerprint(gen), 'levels': levels}
+                counts[slug] = sum(count for spans in levels.values() for _, count in spans)
+    finally:
+        random.setstate(state)
+
+    index = json.dumps({
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'sympy': sp.__version__,
+        'count': len(records),
+        'sections': sections,
+    }).encode('utf-8')
+
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    # Пишемо у тимчасовий файл і атомарно підміняємо: воркери, що вже
+    # відкрили старий каталог, дочитують його через свій mmap
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as fh:
+        fh.write(_HEADER.pack(MAGIC, len(index)))
+        fh.write(index)
+        fh.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+        for record in records:
+            fh.write(record)
+    os.replace(tmp_path, path)
+    return counts
+
+
+class ProblemCatalog:
+    """Каталог, відкритий через mmap тільки для читання."""
+
+    def __init__(self, path, registry=None):
+        self.path = str(path)
+        with open(self.path, 'rb') as fh:
+            try:
+                self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:
+                raise CatalogError(f"{self.path} is empty") from exc
+        try:
+            magic, index_size = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise CatalogError(f"{self.path} is not a problem catalog")
+            start = _HEADER.size
+            self.index = json.loads(self._mm[start:start + index_size])
+            self._offsets_at = start + index_size
+            self.count = self.index['count']
+            self._data_at = self._offsets_at + _OFFSET.size * (self.count + 1)
+            if len(self._mm) < self._data_at:
+                raise CatalogError(f"{self.path} is truncated")
+        except (struct.error, ValueError, KeyError) as exc:
+            self._mm.close()
+            if isinstance(exc, CatalogError):
+                raise
+            raise CatalogError(f"{self.path} is corrupted: {exc}") from exc
+
+        self._levels = {}
+        for slug, section in self.index['sections'].items():
+            gen = registry.get(slug) if registry is not None else None
+            if gen is not None and fingerprint(gen) != section['fingerprint']:
+                logger.warning("Problem catalog section %r is stale; rebuild the catalog", slug)
+                continue
+            for difficulty, spans in section['levels'].items():
+                self._levels[(slug, int(difficulty))] = [tuple(span) for span in spans]
+
+    def close(self):
+        self._mm.close()
+
+    def has(self, slug, difficulty):
+        return (slug, difficulty) in self._levels
+
+    def entry(self, i):
+        """Запис ``i`` у форматі ``generate`` (варіанти — у збереженому порядку)."""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start = _OFFSET.unpack_from(self._mm, self._offsets_at + _OFFSET.size * i)[0]
+        end = _OFFSET.unpack_from(self._mm, self._offsets_at + _OFFSET.size * (i + 1))[0]
+        record = json.loads(self._mm[self._data_at + start:self._data_at + end])
+        problem = {
+            'question': record['q'],
+            'canonical_answer': record['a'],
+            'params': record['p'],
+        }
+        if record['o'] is not None:
+            problem['multiple_choice'] = record['o']
+        return problem
+
+    def sample(self, slug, difficulty, rng=random):
+        """
+        Випадкова задача: рівноймовірне сімейство, потім рівноймовірний
+        запис у ньому — той самий розподіл, що й у ``generate``.
+        """
+        first, size = rng.choice(self._levels[(slug, difficulty)])
+        problem = self.entry(first + rng.randrange(size))
+        if 'multiple_choice' in problem:
+            rng.shuffle(problem['multiple_choice'])
+        return problem
+
+    def sample_batch(self, slug, difficulty, n, rng=random):
+        return [self.sample(slug, difficulty, rng) for _ in range(n)]
+
+
+_default = None
+_default_loaded = False
+
+
+def default_catalog():
+    """
+    Каталог з ``settings.PROBLEM_CATALOG_PATH``, відкритий один раз на процес
+    (у gunicorn — у master до fork-у, див. core.warmup). None, якщо файл
+    не зібрано або він непридатний — тоді задачі генеруються як звичайно.
+    """
+    global _default, _default_loaded
+    if _default_loaded:
+        return _default
+    from django.conf import settings
+    from core.views import PROBLEM_REGISTRY
+
+    _default_loaded = True
+    path = getattr(settings, 'PROBLEM_CATALOG_PATH', None)
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        _default = ProblemCatalog(path, registry=PROBLEM_REGISTRY)
+    except (OSError, CatalogError) as exc:
+        logger.warning("Problem catalog %s is not usable: %s", path, exc)
+    return _default
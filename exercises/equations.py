@@ -1,8 +1,77 @@
 # exercises/equations.py
+"""
+Лінійні рівняння ``ax + b = c`` і ``ax + b = cx + d``.
+
+Розв'язок обчислюється точно у ``Fraction`` і зберігається як ``p/q``
+(або ``p`` для цілих). Перевірка розбирає відповідь маленьким парсером
+(ціле, десятковий дріб або ``p/q``) і порівнює точно — sympy не
+використовується ні при генерації, ні при перевірці.
+"""
 import random
-import sympy as sp
+import re
+from fractions import Fraction
+
 from .base import BaseProblem
 
+# Число: ціле або десяткове (з крапкою чи комою)
+_NUMBER = r'(\d+(?:[.,]\d*)?|[.,]\d+)'
+_ANSWER_RE = re.compile(
+    rf'^\s*(?:x\s*=\s*)?([+-]?)\s*{_NUMBER}\s*(?:/\s*([+-]?)\s*{_NUMBER})?\s*$'
+)
+
+
+def parse_rational(text):
+    """
+    Розбирає ``3``, ``-1.5``, ``0,25``, ``1/3``, ``-7/2`` (допускається
+    префікс ``x =``) у ``Fraction``. Піднімає ``ValueError``, якщо формат
+    не підтримується або знаменник нульовий.
+    """
+    match = _ANSWER_RE.match(str(text))
+    if not match:
+        raise ValueError("Expected an integer, a decimal or a fraction p/q")
+    sign, numerator, denominator_sign, denominator = match.groups()
+    value = Fraction(numerator.replace(',', '.'))
+    if denominator is not None:
+        divisor = Fraction(denominator.replace(',', '.'))
+        if not divisor:
+            raise ValueError("Division by zero")
+        value /= divisor
+        if denominator_sign == '-':
+            value = -value
+    return -value if sign == '-' else value
+
+
+def format_rational(value):
+    """``Fraction`` у канонічному рядку: ``2``, ``-1/3``."""
+    if value.denominator == 1:
+        return str(value.numerator)
+    return f"{value.numerator}/{value.denominator}"
+
+
+def _linear_latex(k, m):
+    """LaTeX для ``k x + m`` у тому ж вигляді, що й ``sp.latex`` (k > 0)."""
+    text = 'x' if k == 1 else f'{k} x'
+    if m > 0:
+        text += f' + {m}'
+    elif m < 0:
+        text += f' - {-m}'
+    return text
+
+
+def exact_solution(params):
+    """
+    Точний розв'язок за параметрами рівняння або None, якщо їх немає.
+    Працює й для старих записів, де канонічна відповідь — ``str(float)``.
+    """
+    try:
+        a, b, c = (int(params[key]) for key in ('a', 'b', 'c'))
+        if params.get('type') == 'linear_complex':
+            return Fraction(int(params['d']) - b, a - c)
+        return Fraction(c - b, a)
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+
+
 class EquationsProblem(BaseProblem):
     slug = 'equations'
     name = 'Linear Equations'
@@ -18,27 +87,23 @@ class EquationsProblem(BaseProblem):
             # Hard: Still linear, more steps
             return self._generate_complex_linear()
 
-    def _generate_linear_equation(self):
-        x = sp.Symbol('x')
-        
+    def generate_batch(self, difficulty, n, seed=None):
+        rng = random.Random(seed)
+        build = self._generate_linear_equation if difficulty == 1 else self._generate_complex_linear
+        return [build(rng) for _ in range(n)]
+
+    def _generate_linear_equation(self, rng=random):
         # Generate ax + b = c
-        a = random.randint(1, 10)
-        b = random.randint(-10, 10)
-        c = random.randint(-20, 20)
-        
-        # Calculate solution
-        solution = (c - b) / a
-        
-        # Create equation
-        left_side = a * x + b
-        equation = sp.Eq(left_side, c)
-        
-        question = f"Solve for x: {sp.latex(equation)}"
-        canonical_answer = str(solution)
-        
+        a = rng.randint(1, 10)
+        b = rng.randint(-10, 10)
+        c = rng.randint(-20, 20)
+
+        solution = Fraction(c - b, a)
+        question = f"Solve for x: {_linear_latex(a, b)} = {c}"
+
         return {
             'question': question,
-            'canonical_answer': canonical_answer,
+            'canonical_answer': format_rational(solution),
             'params': {
                 'a': a,
                 'b': b,
@@ -47,33 +112,23 @@ class EquationsProblem(BaseProblem):
             }
         }
 
-    def _generate_complex_linear(self):
-        x = sp.Symbol('x')
-        
+    def _generate_complex_linear(self, rng=random):
         # Generate equations like: ax + b = cx + d
-        a = random.randint(1, 5)
-        b = random.randint(-10, 10)
-        c = random.randint(1, 5)
-        d = random.randint(-10, 10)
-        
+        a = rng.randint(1, 5)
+        b = rng.randint(-10, 10)
+        c = rng.randint(1, 5)
+        d = rng.randint(-10, 10)
+
         # Ensure a != c to have a unique solution
         while a == c:
-            c = random.randint(1, 5)
-        
-        # Calculate solution
-        solution = (d - b) / (a - c)
-        
-        # Create equation
-        left_side = a * x + b
-        right_side = c * x + d
-        equation = sp.Eq(left_side, right_side)
-        
-        question = f"Solve for x: {sp.latex(equation)}"
-        canonical_answer = str(solution)
-        
+            c = rng.randint(1, 5)
+
+        solution = Fraction(d - b, a - c)
+        question = f"Solve for x: {_linear_latex(a, b)} = {_linear_latex(c, d)}"
+
         return {
             'question': question,
-            'canonical_answer': canonical_answer,
+            'canonical_answer': format_rational(solution),
             'params': {
                 'a': a,
                 'b': b,
@@ -87,22 +142,16 @@ class EquationsProblem(BaseProblem):
 
     def check(self, user_input, canonical_answer, params):
         try:
-            # Parse user input and canonical answer
-            user_answer = sp.sympify(user_input)
-            correct_answer = sp.sympify(canonical_answer)
-            
-            # Check if answers are equal
-            is_correct = (user_answer == correct_answer)
-            
-            if not is_correct:
-                # For quadratic equations, check if it's the other solution
-                if params.get('type') == 'quadratic':
-                    sol1 = params.get('sol1')
-                    sol2 = params.get('sol2')
-                    if user_answer in [sol1, sol2]:
-                        is_correct = True
-            
-            return bool(is_correct), None
-            
-        except Exception as e:
+            user_answer = parse_rational(user_input)
+        except ValueError as e:
             return False, f"Invalid input format. Please check your syntax. Error: {str(e)}"
+
+        # Для старих записів canonical_answer — округлений float, тож
+        # розв'язок відновлюється з параметрів рівняння
+        correct_answer = exact_solution(params or {})
+        if correct_answer is None:
+            try:
+                correct_answer = parse_rational(canonical_answer)
+            except ValueError:
+                return False, None
+        return user_answer == correct_answer, None
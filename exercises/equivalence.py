@@ -0,0 +1,130 @@
+# exercises/equivalence.py
+"""
+Швидка перевірка рівності sympy-виразів без ``sp.simplify``.
+
+Спочатку ``expand`` різниці (дешево й точно для більшості випадків), потім
+обчислення в фіксованому наборі точок. Вартість обмежена: кількість точок
+стала, а повне спрощення викликається лише тоді, коли майже всі точки
+виявилися поза областю визначення.
+
+Відповідь користувача розбирається ``parse_answer``: задовгий рядок,
+великі степені (``(sin(x) + x)**40``) і завеликі дерева виразу
+відхиляються ще до обчислень. Сама перевірка виконується в ``time_limit``:
+що не встигло за ``CHECK_TIME_LIMIT`` с, вважається неправильною відповіддю.
+Таймер — SIGALRM, тож діє лише в головному потоці (синхронні воркери
+gunicorn); в інших потоках лишаються обмеження розбору.
+"""
+import signal
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+import sympy as sp
+from sympy.parsing.sympy_parser import parse_expr
+
+from .polynomial import MAX_EXPONENT
+
+# Точки перевірки: не цілі й не "особливі" (0, 1, pi), щоб випадкові збіги були малоймовірні
+SAMPLE_POINTS = (0.37, 0.81, 1.29, 1.93, 2.61, -0.73, -1.47)
+MIN_VALID_POINTS = 4
+TOLERANCE = 1e-9
+
+# Обмеження відповіді користувача
+MAX_INPUT_LENGTH = 300
+MAX_NODES = 200
+CHECK_TIME_LIMIT = 1.0
+
+TOO_COMPLEX_FEEDBACK = "Answer is too complex to check. Please simplify it."
+
+
+class TooComplex(ValueError):
+    """Відповідь перевищує обмеження розбору."""
+
+
+class CheckTimeout(BaseException):
+    """
+    Перевірка не вклалась у ``time_limit``. Похідна від BaseException,
+    щоб її не поглинули ``except Exception`` усередині sympy.
+    """
+
+
+@contextmanager
+def time_limit(seconds=CHECK_TIME_LIMIT):
+    """Піднімає ``CheckTimeout`` через ``seconds`` с (лише в головному потоці)."""
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, 'setitimer'):
+        yield
+        return
+
+    def expired(signum, frame):
+        raise CheckTimeout()
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _check_size(expr):
+    """Кількість вузлів і числові показники степенів невичисленого дерева."""
+    for nodes, node in enumerate(sp.preorder_traversal(expr), 1):
+        if nodes > MAX_NODES:
+            raise TooComplex("Expression is too large")
+        if node.is_Pow and not node.exp.free_symbols:
+            # Показники перевірені знизу вгору, тож обчислення показника дешеве
+            # (і ловить "башти" на кшталт 9**9**9)
+            if abs(sp.N(node.exp)) > MAX_EXPONENT:
+                raise TooComplex("Exponent is too large")
+
+
+def parse_answer(text):
+    """sympify відповіді користувача з обмеженнями довжини, степенів і розміру."""
+    text = str(text)
+    if len(text) > MAX_INPUT_LENGTH:
+        raise TooComplex("Answer is too long")
+    # Спершу без обчислення: sympify обчислив би 9**9**9 ще до перевірок
+    _check_size(parse_expr(text.replace('^', '**'), evaluate=False))
+    return sp.sympify(text)
+
+
+@lru_cache(maxsize=1024)
+def parse_cached(text):
+    """sympify з кешем — для виразів, збережених при генерації (params)."""
+    return sp.sympify(text)
+
+
+def _value(expr, symbol, point):
+    value = complex(expr.evalf(subs={symbol: point}))
+    if value != value or abs(value) == float('inf'):
+        raise ValueError("Not finite")
+    return value
+
+
+def equivalent(lhs, rhs, symbol):
+    """
+    Чи рівні ``lhs`` і ``rhs`` як функції від ``symbol``.
+    Вирази з іншими вільними символами вважаються нерівними.
+    """
+    diff = sp.expand(lhs - rhs)
+    if diff == 0:
+        return True
+    if diff.free_symbols - {symbol}:
+        return False
+
+    valid = 0
+    for point in SAMPLE_POINTS:
+        try:
+            left = _value(lhs, symbol, point)
+            right = _value(rhs, symbol, point)
+        except (TypeError, ValueError, ZeroDivisionError):
+            continue
+        if abs(left - right) > TOLERANCE * max(1.0, abs(right)):
+            return False
+        valid += 1
+
+    if valid >= MIN_VALID_POINTS:
+        return True
+    # Майже всі точки поза областю визначення — рідкісний випадок
+    return sp.simplify(diff) == 0
@@ -0,0 +1,396 @@
+# exercises/polynomial.py
+"""
+Швидка перевірка поліноміальних відповідей без sympy.
+
+Поліном зберігається як розріджена мапа коефіцієнтів
+``{(степінь_змінної_1, степінь_змінної_2, ...): Fraction}``. Невеликий
+парсер розуміє той самий синтаксис, що й ``sympy.sympify`` для поліномів
+(``+ - * / ** ^``, дужки, цілі та десяткові числа). Якщо вираз не є
+поліномом від заданих змінних (функції, ділення на змінну, невідомі
+символи), піднімається ``NotPolynomial`` — тоді перевірка переходить на sympy.
+
+Для генераторів є підстановка ``scale`` і форматування ``to_str``/``to_latex``
+та ``product_str``/``product_latex``, що дають той самий текст, що й
+``str``/``sympy.latex`` для многочленів з цілими коефіцієнтами.
+"""
+import re
+from fractions import Fraction
+
+# Обмеження, щоб швидкий шлях мав передбачувану вартість
+MAX_EXPONENT = 12
+MAX_TERMS = 500
+
+_TOKEN_RE = re.compile(r'\s*(?:(\d+\.\d*|\.\d+|\d+)|([A-Za-z_]\w*)|(\*\*|[-+*/^()]))')
+
+
+class NotPolynomial(ValueError):
+    """Вираз не є поліномом від заданих змінних (або виходить за ліміти)."""
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise NotPolynomial(f"Unexpected character at {pos}")
+        number, name, op = match.groups()
+        if number is not None:
+            tokens.append(('num', number))
+        elif name is not None:
+            tokens.append(('name', name))
+        else:
+            tokens.append(('op', '**' if op == '^' else op))
+        pos = match.end()
+    return tokens
+
+
+def _check_size(poly):
+    if len(poly) > MAX_TERMS:
+        raise NotPolynomial("Too many terms")
+    return poly
+
+
+def add(p, q):
+    result = dict(p)
+    for exps, coeff in q.items():
+        value = result.get(exps, 0) + coeff
+        if value:
+            result[exps] = value
+        else:
+            result.pop(exps, None)
+    return _check_size(result)
+
+
+def neg(p):
+    return {exps: -coeff for exps, coeff in p.items()}
+
+
+def sub(p, q):
+    return add(p, neg(q))
+
+
+def mul(p, q):
+    result = {}
+    for e1, c1 in p.items():
+        for e2, c2 in q.items():
+            exps = tuple(a + b for a, b in zip(e1, e2))
+            value = result.get(exps, 0) + c1 * c2
+            if value:
+                result[exps] = value
+            else:
+                result.pop(exps, None)
+    return _check_size(result)
+
+
+def power(p, n, nvars):
+    if n < 0 or n > MAX_EXPONENT:
+        raise NotPolynomial("Unsupported exponent")
+    result = constant(1, nvars)
+    base = p
+    while n:
+        if n & 1:
+            result = mul(result, base)
+        n >>= 1
+        if n:
+            base = mul(base, base)
+    return result
+
+
+def constant(value, nvars):
+    value = Fraction(value)
+    return {(0,) * nvars: value} if value else {}
+
+
+def constant_value(p, nvars):
+    """Значення полінома-константи або None, якщо він залежить від змінних."""
+    zero = (0,) * nvars
+    if any(exps != zero for exps in p):
+        return None
+    return p.get(zero, Fraction(0))
+
+
+class _Parser:
+    def __init__(self, tokens, variables):
+        self.tokens = tokens
+        self.pos = 0
+        self.variables = {name: i for i, name in enumerate(variables)}
+        self.nvars = len(variables)
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise NotPolynomial("Empty expression")
+        result = self.expr()
+        if self.pos != len(self.tokens):
+            raise NotPolynomial("Unexpected trailing input")
+        return result
+
+    def expr(self):
+        result = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            _, op = self.take()
+            rhs = self.term()
+            result = add(result, rhs) if op == '+' else sub(result, rhs)
+        return result
+
+    def term(self):
+        result = self.unary()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            _, op = self.take()
+            rhs = self.unary()
+            if op == '*':
+                result = mul(result, rhs)
+            else:
+                divisor = constant_value(rhs, self.nvars)
+                if not divisor:
+                    raise NotPolynomial("Division by a non-constant")
+                result = {exps: coeff / divisor for exps, coeff in result.items()}
+        return result
+
+    def unary(self):
+        kind, value = self.peek()
+        if kind == 'op' and value in ('+', '-'):
+            self.take()
+            operand = self.unary()
+            return neg(operand) if value == '-' else operand
+        return self.power()
+
+    def power(self):
+        base = self.atom()
+        if self.peek() == ('op', '**'):
+            self.take()
+            exponent = constant_value(self.unary(), self.nvars)
+            if exponent is None or exponent.denominator != 1:
+                raise NotPolynomial("Non-integer exponent")
+            return power(base, int(exponent), self.nvars)
+        return base
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == 'num':
+            return constant(Fraction(value), self.nvars)
+        if kind == 'name':
+            index = self.variables.get(value)
+            if index is None:
+                raise NotPolynomial(f"Unknown symbol {value}")
+            exps = [0] * self.nvars
+            exps[index] = 1
+            return {tuple(exps): Fraction(1)}
+        if (kind, value) == ('op', '('):
+            result = self.expr()
+            if self.take() != ('op', ')'):
+                raise NotPolynomial("Unbalanced parentheses")
+            return result
+        raise NotPolynomial("Unexpected token")
+
+
+def parse_polynomial(text, variables):
+    """Розбирає рядок у мапу коефіцієнтів або піднімає ``NotPolynomial``."""
+    return _Parser(_tokenize(str(text)), tuple(variables)).parse()
+
+
+def to_json(poly, variables):
+    """Серіалізація для ``params`` (JSONField) екземпляра задачі."""
+    return {
+        'vars': list(variables),
+        'terms': [[list(exps), str(coeff)] for exps, coeff in sorted(poly.items())],
+    }
+
+
+def from_json(data):
+    return {tuple(exps): Fraction(coeff) for exps, coeff in data['terms']}
+
+
+def canonical_poly(text, variables):
+    """
+    Мапа коефіцієнтів канонічної відповіді для збереження в ``params``
+    під ключем ``canonical_poly``; None, якщо відповідь не поліном.
+    """
+    try:
+        return to_json(parse_polynomial(text, variables), variables)
+    except NotPolynomial:
+        return None
+
+
+def scale(poly, factors):
+    """Підстановка ``x_i -> k_i * x_i``: ``factors`` — множники ``k_i`` по змінних."""
+    result = {}
+    for exps, coeff in poly.items():
+        for k, e in zip(factors, exps):
+            coeff *= k ** e
+        result[exps] = coeff
+    return result
+
+
+# Форматування у стилі sympy. Члени суми друкуються в порядку ``lex`` за
+# змінними в алфавітному порядку, від старших; множники добутку — за
+# ``default_sort_key`` sympy, ключі якого відтворюють ``_term_key`` і
+# ``_factor_key`` (класи Number < Symbol < Mul < Add, далі кількість і
+# ключі аргументів, степінь, коефіцієнт).
+
+_NUMBER = (1, 0, 'Number')
+_SYMBOL = (2, 0, 'Symbol')
+_MUL = (3, 0, 'Mul')
+_ADD = (3, 1, 'Add')
+
+
+def _integer(coeff):
+    if coeff != int(coeff):
+        raise ValueError("Only integer coefficients can be formatted")
+    return int(coeff)
+
+
+def _by_name(variables):
+    return sorted(range(len(variables)), key=variables.__getitem__)
+
+
+def _ordered_terms(poly, variables):
+    order = _by_name(variables)
+    terms = sorted(poly.items(), key=lambda item: tuple(item[0][i] for i in order), reverse=True)
+    # Виняток sympy: "5 - 2*c**2" (додатне число й від'ємний степінь однієї змінної)
+    if len(terms) == 2 and not any(terms[1][0]) and terms[1][1] > 0 > terms[0][1] \
+            and sum(1 for e in terms[0][0] if e) == 1:
+        terms.reverse()
+    return terms
+
+
+def _monomial(exps, variables, latex):
+    parts = []
+    for i in _by_name(variables):
+        e = exps[i]
+        if e == 1:
+            parts.append(variables[i])
+        elif e:
+            parts.append(f'{variables[i]}^{{{e}}}' if latex else f'{variables[i]}**{e}')
+    return (' ' if latex else '*').join(parts)
+
+
+def _format(poly, variables, latex):
+    terms = _ordered_terms(poly, variables)
+    if not terms:
+        return '0'
+    mul = ' ' if latex else '*'
+    result = []
+    for exps, coeff in terms:
+        coeff = _integer(coeff)
+        monomial = _monomial(exps, variables, latex)
+        if not monomial:
+            text = str(abs(coeff))
+        elif abs(coeff) == 1:
+            text = monomial
+        else:
+            text = f'{abs(coeff)}{mul}{monomial}'
+        if not result:
+            if coeff < 0:
+                # sympy.latex: "- a^{2}", але "-5" для числа
+                text = ('- ' if latex and monomial else '-') + text
+            result.append(text)
+        else:
+            result.append((' - ' if coeff < 0 else ' + ') + text)
+    return ''.join(result)
+
+
+def to_str(poly, variables):
+    """Як ``str()`` розкритого виразу sympy: ``4*a**2 - 12*a*b + 9*b**2``."""
+    return _format(poly, variables, latex=False)
+
+
+def to_latex(poly, variables):
+    """Як ``sympy.latex``: ``4 a^{2} - 12 a b + 9 b^{2}``."""
+    return _format(poly, variables, latex=True)
+
+
+def _number_key(value):
+    return (_NUMBER, (0, ()), (), value)
+
+
+def _power_key(name, e, coeff=1):
+    return (_SYMBOL, (1, (name,)), _number_key(e), coeff)
+
+
+def _term_key(exps, coeff, variables):
+    powers = [(variables[i], exps[i]) for i in _by_name(variables) if exps[i]]
+    if not powers:
+        return _number_key(coeff)
+    if len(powers) == 1:
+        return _power_key(*powers[0], coeff)
+    return (_MUL, (len(powers), tuple(_power_key(*p) for p in powers)), _number_key(1), coeff)
+
+
+def _factor_key(poly, exponent, variables):
+    terms = _ordered_terms(poly, variables)
+    keys = tuple(_term_key(exps, _integer(coeff), variables) for exps, coeff in terms)
+    return (_ADD, (len(keys), keys), _number_key(exponent), 1)
+
+
+def _product(factors, variables, latex):
+    if any(len(poly) < 2 for poly, _ in factors):
+        raise ValueError("Product factors must be sums of at least two terms")
+    parts = []
+    for poly, exponent in sorted(factors, key=lambda f: _factor_key(*f, variables)):
+        inner = _format(poly, variables, latex)
+        if latex:
+            parts.append(rf'\left({inner}\right)' + (f'^{{{exponent}}}' if exponent != 1 else ''))
+        else:
+            parts.append(f'({inner})' + (f'**{exponent}' if exponent != 1 else ''))
+    return (' ' if latex else '*').join(parts)
+
+
+def product_str(factors, variables):
+    """
+    Нерозкритий добуток ``[(многочлен, степінь), ...]`` як ``str()`` sympy:
+    ``(a - b)*(a + b)``. Множники — різні суми щонайменше двох членів.
+    """
+    return _product(factors, variables, latex=False)
+
+
+def product_latex(factors, variables):
+    """Те саме як ``sympy.latex``: ``\\left(a - b\\right) \\left(a + b\\right)``."""
+    return _product(factors, variables, latex=True)
+
+
+def check_polynomial(user_input, params, ignore_constant=False, constant_symbols=()):
+    """
+    Швидка перевірка відповіді через порівняння мап коефіцієнтів.
+
+    Повертає True/False, якщо і канонічна відповідь (``params['canonical_poly']``),
+    і відповідь користувача є поліномами; інакше None — тоді потрібна
+    повна перевірка через sympy. З ``ignore_constant`` відповіді, що
+    відрізняються на константу (зокрема на символи з ``constant_symbols``,
+    наприклад ``C`` для інтегралів), вважаються рівними.
+    """
+    data = params.get('canonical_poly') if params else None
+    if not data:
+        return None
+    variables = list(data['vars'])
+    nvars = len(variables)
+    try:
+        user = parse_polynomial(user_input, variables + list(constant_symbols))
+    except NotPolynomial:
+        return None
+
+    if constant_symbols:
+        # Члени з константними символами (C, C*x тощо) відкидаються лише
+        # якщо вони не залежать від змінних задачі
+        reduced = {}
+        for exps, coeff in user.items():
+            if any(exps[nvars:]):
+                if any(exps[:nvars]) or not ignore_constant:
+                    return None
+                continue
+            reduced = add(reduced, {exps[:nvars]: coeff})
+        user = reduced
+
+    diff = sub(user, from_json(data))
+    if ignore_constant:
+        diff.pop((0,) * nvars, None)
+    return not diff
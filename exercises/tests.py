@@ -3,7 +3,7 @@ from exercises.arithmetic import ArithmeticProblem
 from exercises.algebraic import AlgebraicIdentitiesProblem
 from exercises.exponential import ExponentialLogarithmProblem
 from exercises.equations import EquationsProblem
-from exercises.calculus import CalculusProblem
+from exercises.calculus import DerivativesProblem, IntegralsProblem
 import sympy as sp
 
 class ArithmeticProblemTest(TestCase):
@@ -78,6 +78,21 @@ class AlgebraicIdentitiesProblemTest(TestCase):
         is_correct, feedback = self.problem.check(canonical, canonical, params)
         self.assertTrue(is_correct)
 
+    def test_matches_sympy_output(self):
+        # Розкриття без sympy дає той самий текст, що й subs/expand/latex sympy
+        for difficulty in (1, 2, 3):
+            for family in self.problem.enumerate_space(difficulty):
+                for result in family:
+                    params = result['params']
+                    coeffs = {sym: params[f'coeff_{sym}'] for sym in 'abc' if f'coeff_{sym}' in params}
+                    pattern = sp.sympify(params['pattern'])
+                    question = pattern.subs({sp.Symbol(sym): k * sp.Symbol(sym) for sym, k in coeffs.items()})
+                    self.assertEqual(result['question'], sp.latex(question))
+                    self.assertEqual(result['canonical_answer'], str(sp.expand(question)))
+                    for option in result['multiple_choice']:
+                        expr = sp.sympify(option['value'])
+                        self.assertEqual((option['text'], option['value']), (sp.latex(expr), str(expr)))
+
 class ExponentialLogarithmProblemTest(TestCase):
     def setUp(self):
         self.problem = ExponentialLogarithmProblem()
@@ -138,9 +153,25 @@ class EquationsProblemTest(TestCase):
         is_correct, feedback = self.problem.check(canonical, canonical, params)
         self.assertTrue(is_correct)
 
+    def test_check_exact_fractions(self):
+        params = {'a': 3, 'b': 1, 'c': 2, 'type': 'linear_simple'}
+        self.assertEqual(self.problem.check('1/3', '1/3', params), (True, None))
+        self.assertEqual(self.problem.check('2/6', '1/3', params), (True, None))
+        self.assertEqual(self.problem.check('0.33', '1/3', params), (False, None))
+        params = {'a': 2, 'b': 1, 'c': 4, 'd': -2, 'type': 'linear_complex'}
+        self.assertEqual(self.problem.check('1.5', '3/2', params), (True, None))
+        self.assertEqual(self.problem.check('x = 3/2', '3/2', params), (True, None))
+        self.assertFalse(self.problem.check('3/0', '3/2', params)[0])
+        self.assertIsNotNone(self.problem.check('x+1', '3/2', params)[1])
+
+    def test_legacy_float_canonical_uses_params(self):
+        params = {'a': 3, 'b': 1, 'c': 2, 'type': 'linear_simple'}
+        self.assertEqual(self.problem.check('1/3', '0.3333333333333333', params), (True, None))
+        self.assertEqual(self.problem.check('2', '2.0', {}), (True, None))
+
 class CalculusProblemTest(TestCase):
     def setUp(self):
-        self.problem = CalculusProblem()
+        self.problem = DerivativesProblem()
 
     def test_generate_basic_derivative(self):
         result = self.problem.generate(1)
@@ -166,4 +197,185 @@ class CalculusProblemTest(TestCase):
         params = result['params']
         
         is_correct, feedback = self.problem.check(canonical, canonical, params)
-        self.assertTrue(is_correct)
\ No newline at end of file
+        self.assertTrue(is_correct)
+
+class PolynomialFastPathTest(TestCase):
+    def test_parse_expands_products_and_powers(self):
+        from exercises.polynomial import parse_polynomial
+        from fractions import Fraction
+        poly = parse_polynomial('(2*a - 3*b)^2', ('a', 'b'))
+        self.assertEqual(poly, {(2, 0): Fraction(4), (1, 1): Fraction(-12), (0, 2): Fraction(9)})
+        self.assertEqual(parse_polynomial('x**2/2 + 0.5*x', ('x',)), {(2,): Fraction(1, 2), (1,): Fraction(1, 2)})
+
+    def test_formatting_matches_sympy(self):
+        from exercises.polynomial import parse_polynomial, product_latex, product_str, to_latex, to_str
+        variables = ('a', 'b', 'c')
+        for text in ['-a**2*b + 3*a*c - 5', '5 - 2*c**2', 'b - a', '-a*b + 5', '7']:
+            poly = parse_polynomial(text, variables)
+            expr = sp.sympify(text)
+            self.assertEqual(to_str(poly, variables), str(expr))
+            self.assertEqual(to_latex(poly, variables), sp.latex(expr))
+        factors = [(parse_polynomial('a + b + c', variables), 1), (parse_polynomial('a - b + c', variables), 2)]
+        expr = sp.sympify('(a + b + c)*(a - b + c)**2')
+        self.assertEqual(product_str(factors, variables), str(expr))
+        self.assertEqual(product_latex(factors, variables), sp.latex(expr))
+
+    def test_non_polynomial_input_is_not_decided(self):
+        from exercises.polynomial import check_polynomial, canonical_poly
+        params = {'canonical_poly': canonical_poly('2*x', ('x',))}
+        self.assertIsNone(check_polynomial('2*cos(x)', params))
+        self.assertIsNone(check_polynomial('1/x', params))
+        self.assertIsNone(check_polynomial('2x', params))
+        self.assertIsNone(check_polynomial('2*x', {'canonical_poly': None}))
+
+    def test_algebraic_check_uses_coefficients(self):
+        problem = AlgebraicIdentitiesProblem()
+        result = problem.generate(3)
+        params = result['params']
+        self.assertIsNotNone(params['canonical_poly'])
+        expanded = sp.sympify(result['canonical_answer'])
+        reordered = ' + '.join(str(t) for t in reversed(sp.Add.make_args(expanded)))
+        self.assertEqual(problem.check(reordered, result['canonical_answer'], params), (True, None))
+        self.assertEqual(problem.check(result['canonical_answer'] + ' + a*b', result['canonical_answer'], params), (False, None))
+
+    def test_integral_accepts_constant(self):
+        problem = IntegralsProblem()
+        params = {'canonical_poly': {'vars': ['x'], 'terms': [[[2], '1/2'], [[1], '1']]}}
+        self.assertTrue(problem.check('x**2/2 + x + 5', 'x**2/2 + x', params)[0])
+        self.assertTrue(problem.check('(x**2 + 2*x)/2 + C', 'x**2/2 + x', params)[0])
+        self.assertFalse(problem.check('x**2 + x', 'x**2/2 + x', params)[0])
+
+class IntegralDerivativeCheckTest(TestCase):
+    def setUp(self):
+        self.problem = IntegralsProblem()
+
+    def test_accepts_antiderivative_up_to_constant(self):
+        params = {'function': 'sin(x) + cos(x)', 'type': 'integral'}
+        canonical = 'sin(x) - cos(x)'
+        self.assertEqual(self.problem.check('sin(x) - cos(x)', canonical, params), (True, None))
+        self.assertEqual(self.problem.check('sin(x) - cos(x) + 3', canonical, params), (True, None))
+        self.assertEqual(self.problem.check('sin(x) - cos(x) + C', canonical, params), (True, None))
+        self.assertEqual(self.problem.check('exp(x) + C', 'exp(x)', {'function': 'exp(x)'}), (True, None))
+
+    def test_rejects_wrong_antiderivative(self):
+        params = {'function': 'sin(x) + cos(x)', 'type': 'integral'}
+        canonical = 'sin(x) - cos(x)'
+        self.assertEqual(self.problem.check('sin(x) + cos(x)', canonical, params), (False, None))
+        self.assertEqual(self.problem.check('sin(x) - cos(x) + x', canonical, params), (False, None))
+        self.assertEqual(self.problem.check('sin(x) - cos(x) + y', canonical, params), (False, None))
+        self.assertFalse(self.problem.check('sin(x', canonical, params)[0])
+
+    def test_expensive_input_is_rejected_quickly(self):
+        import time
+        from exercises.equivalence import TOO_COMPLEX_FEEDBACK
+        params = {'function': 'sin(x) + cos(x)', 'type': 'integral'}
+        for answer in ['(sin(x)+cos(x)+x+1)**40', '9**9**9', 'x + ' * 100 + 'x']:
+            started = time.perf_counter()
+            self.assertEqual(self.problem.check(answer, 'sin(x) - cos(x)', params), (False, TOO_COMPLEX_FEEDBACK))
+            self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(DerivativesProblem().check('(exp(x)+x)**100', 'exp(x)', {}), (False, TOO_COMPLEX_FEEDBACK))
+
+    def test_time_limit_interrupts_check(self):
+        from exercises.equivalence import CheckTimeout, time_limit
+        with self.assertRaises(CheckTimeout):
+            with time_limit(0.05):
+                while True:
+                    pass
+
+class GenerateBatchTest(TestCase):
+    def test_specialized_batches_are_reproducible(self):
+        for problem in (ArithmeticProblem(), EquationsProblem()):
+            batch = problem.generate_batch(2, 20, seed=7)
+            self.assertEqual(len(batch), 20)
+            self.assertEqual(batch, problem.generate_batch(2, 20, seed=7))
+            for data in batch:
+                self.assertTrue(problem.check(data['canonical_answer'], data['canonical_answer'], data['params'])[0])
+
+    def test_default_batch_restores_global_random_state(self):
+        import random
+        problem = AlgebraicIdentitiesProblem()
+        random.seed(1)
+        expected = random.random()
+        random.seed(1)
+        first = problem.generate_batch(1, 3, seed=5)
+        self.assertEqual(random.random(), expected)
+        self.assertEqual([d['question'] for d in first], [d['question'] for d in problem.generate_batch(1, 3, seed=5)])
+
+class ProblemCatalogTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from exercises.catalog import build_catalog
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = f'{self.tmp.name}/catalog.bin'
+        self.registry = {'algebraic': AlgebraicIdentitiesProblem(), 'equations': EquationsProblem()}
+        self.counts = build_catalog(self.registry, self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_enumerated_space_covers_generate(self):
+        from exercises.calculus import DerivativesProblem
+        problem = DerivativesProblem()
+        questions = {p['question'] for family in problem.enumerate_space(1) for p in family}
+        for _ in range(100):
+            self.assertIn(problem.generate(1)['question'], questions)
+
+    def test_sample_returns_checkable_problem(self):
+        from exercises.catalog import ProblemCatalog
+        self.assertEqual(self.counts, {'algebraic': 2 * 25 + 4 * 9 + 4 * 8})
+        catalog = ProblemCatalog(self.path, registry=self.registry)
+        self.assertTrue(catalog.has('algebraic', 3))
+        self.assertFalse(catalog.has('equations', 1))
+        problem = AlgebraicIdentitiesProblem()
+        for data in catalog.sample_batch('algebraic', 2, 12):
+            self.assertEqual(problem.check(data['canonical_answer'], data['canonical_answer'], data['params']), (True, None))
+            self.assertEqual(sum(o['is_correct'] for o in data['multiple_choice']), 1)
+        catalog.close()
+
+    def test_stale_or_invalid_catalog(self):
+        from unittest import mock
+        from exercises.catalog import CatalogError, ProblemCatalog
+        with mock.patch('exercises.catalog.fingerprint', return_value='changed'), \
+                self.assertLogs('exercises.catalog', 'WARNING'):
+            self.assertFalse(ProblemCatalog(self.path, registry=self.registry).has('algebraic', 1))
+        # Зміна допоміжного модуля (форматування поліномів) теж робить розділ застарілим
+        from exercises import catalog
+        source = catalog.inspect.getsource
+        with mock.patch('exercises.catalog.inspect.getsource',
+                        lambda module: source(module) + ('#' if module.__name__ == 'exercises.polynomial' else '')), \
+                self.assertLogs('exercises.catalog', 'WARNING'):
+            self.assertFalse(ProblemCatalog(self.path, registry=self.registry).has('algebraic', 1))
+        self.assertTrue(ProblemCatalog(self.path, registry=self.registry).has('algebraic', 1))
+        with open(self.path, 'wb') as fh:
+            fh.write(b'not a catalog')
+        with self.assertRaises(CatalogError):
+            ProblemCatalog(self.path)
+
+
+class OptionIdTest(TestCase):
+    def test_number_and_find_options(self):
+        from exercises.base import number_options, find_option
+        options = DerivativesProblem().generate(1)['multiple_choice']
+        numbered = number_options(options)
+        self.assertEqual([o['id'] for o in numbered], list(range(1, len(options) + 1)))
+        self.assertNotIn('id', options[0])
+        correct = [o for o in numbered if o['is_correct']]
+        self.assertIs(find_option(numbered, str(correct[0]['id'])), correct[0])
+        self.assertIsNone(find_option(numbered, 'x'))
+        self.assertIsNone(find_option(numbered, 99))
+        self.assertIsNone(number_options(None))
+
+    def test_option_flags_match_check(self):
+        # Вибір оцінюється лише за is_correct, тож прапорці мають збігатися з check()
+        for problem in (DerivativesProblem(), IntegralsProblem(), AlgebraicIdentitiesProblem()):
+            for difficulty in (1, 2, 3):
+                for data in problem.generate_batch(difficulty, 10, seed=difficulty):
+                    options = data['multiple_choice']
+                    self.assertEqual(len({o['value'] for o in options}), len(options), options)
+                    for option in options:
+                        is_correct, _ = problem.check(option['value'], data['canonical_answer'], data['params'])
+                        self.assertEqual(option['is_correct'], is_correct, (problem.slug, data['question'], option))
+        # Первісна плюс стала — теж правильна відповідь, тож серед хибних її немає
+        data = IntegralsProblem()._build(sp.Symbol('x') ** 2)
+        self.assertEqual([o['value'] for o in data['multiple_choice'] if o['is_correct']], ['x**3/3'])
+        self.assertEqual(len(data['multiple_choice']), 4)
@@ -0,0 +1,65 @@
+# gunicorn.conf.py
+"""
+Конфігурація gunicorn для TrainMath.
+
+Додаток завантажується в master-процесі (preload_app) і прогрівається
+до fork-у воркерів (див. core/warmup.py), тож імпортований sympy,
+скомпільовані шаблони та кеші sympy спільні між воркерами (copy-on-write).
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Завантажити додаток до fork-у (вимкнути: GUNICORN_PRELOAD=0)
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Каталог для агрегації метрик Prometheus між воркерами (core/metrics.py).
+# Має бути заданий до імпорту prometheus_client, тобто до завантаження додатку.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/trainmath-prometheus')
+
+
+def on_starting(server):
+    # Метрики попереднього запуску не мають потрапити в новий
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    # Викликається в master після завантаження додатку, до старту воркерів
+    if not preload_app:
+        return
+    from core.warmup import warm_up
+    warm_up()
+
+
+def post_fork(server, worker):
+    # Воркери успадковують стан random від master — інакше всі
+    # генерували б однакові послідовності задач
+    random.seed()
+    worker.boot_time = time.perf_counter()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from core.warmup import memory_usage, warm_generation_pool
+    warm_generation_pool()
+    usage = memory_usage()
+    worker.log.info(
+        "Worker %s ready in %.0f ms: %s",
+        worker.pid,
+        (time.perf_counter() - worker.boot_time) * 1000,
+        ", ".join(f"{k}={v}" for k, v in sorted(usage.items())) or "memory usage unavailable",
+    )
@@ -78,16 +78,30 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'trainmath.perf': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
-# Cache (Redis recommended for production)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Cache: спільний для воркерів (Redis, інакше файловий), бо через нього
+# інвалідуються каталоги в пам'яті процесу (core.problem_types)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('DJANGO_CACHE_DIR', '/tmp/trainmath-cache'),
+        }
     }
-}
 
 # Session settings
 SESSION_COOKIE_SECURE = False  # Set to True with HTTPS
@@ -62,6 +62,9 @@ AUTHENTICATION_BACKENDS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.db_router.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,7 +77,8 @@ ROOT_URLCONF = 'trainmath.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, що міряє рендеринг для Server-Timing
+        'BACKEND': 'core.profiling.ProfilingDjangoTemplates',
         'DIRS': [BASE_DIR/'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -108,6 +112,16 @@ if os.getenv('DJANGO_PRODUCTION') == '1':
             'PORT': os.getenv('POSTGRES_PORT', '5432'),
         }
     }
+    # Репліка для читання (core.db_router), якщо задано її хост
+    REPLICA_DATABASE = None
+    if os.getenv('POSTGRES_REPLICA_HOST'):
+        REPLICA_DATABASE = 'replica'
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('POSTGRES_REPLICA_HOST'),
+            'PORT': os.getenv('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
 else:
     # dev: sqlite
     DATABASES = {
@@ -116,8 +130,46 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    # Другий псевдонім на той самий файл, щоб маршрутизацію на репліку
+    # можна було перевірити локально; увімкнути: DJANGO_SQLITE_REPLICA=1
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASE = 'replica' if os.getenv('DJANGO_SQLITE_REPLICA') == '1' else None
+
+# Читання read-only view з REPLICA_DATABASE (None — усе з default)
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Більше відставання — читання з primary
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('DJANGO_REPLICA_MAX_LAG_SECONDS', '10'))
+# Як часто (с) процес перевіряє відставання репліки
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DJANGO_REPLICA_LAG_CHECK_INTERVAL', '5'))
+# Після запису читання клієнта йдуть у primary стільки секунд
+REPLICA_STICKY_SECONDS = int(os.getenv('DJANGO_REPLICA_STICKY_SECONDS', '15'))
+REPLICA_STICKY_COOKIE = 'tm_primary'
 
 
+# =========================
+# Cache
+# =========================
+# Кеш має бути спільним для воркерів: через нього між процесами
+# інвалідуються каталоги в пам'яті (core.problem_types)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif os.getenv('DJANGO_PRODUCTION') == '1':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('DJANGO_CACHE_DIR', '/tmp/trainmath-cache'),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -181,3 +233,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Crispy forms
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
+
+# =========================
+# Performance tooling
+# =========================
+# Профілювання запитів (core.middleware.ProfilingMiddleware)
+PERF_PROFILING = os.getenv('DJANGO_PERF_PROFILING', '1') == '1'
+# Заголовок Server-Timing з тривалістю фаз запиту
+PERF_SERVER_TIMING = os.getenv('DJANGO_PERF_SERVER_TIMING', '1' if DEBUG else '0') == '1'
+# Частка запитів, що пишуться в лог trainmath.perf (0.0 - 1.0)
+PERF_LOG_SAMPLE_RATE = float(os.getenv('DJANGO_PERF_LOG_SAMPLE_RATE', '0.01'))
+# Запити, довші за цей поріг (мс), логуються з найдовшими SQL-запитами
+PERF_SLOW_REQUEST_MS = float(os.getenv('DJANGO_PERF_SLOW_REQUEST_MS', '1000'))
+# Заголовок X-DB-Query-Count для manage.py loadtest
+QUERY_COUNT_HEADER = os.getenv('DJANGO_QUERY_COUNT_HEADER', '1' if DEBUG else '0') == '1'
+# Перевищення query_budget view (core.profiling) — виняток, а не лише попередження
+QUERY_BUDGET_STRICT = os.getenv('DJANGO_QUERY_BUDGET_STRICT', '1' if DEBUG else '0') == '1'
+
+
+# Як часто (с) процес звіряє свій каталог типів задач зі штампом версії в кеші
+PROBLEM_TYPES_CHECK_INTERVAL = float(os.getenv('DJANGO_PROBLEM_TYPES_CHECK_INTERVAL', '1'))
+
+
+# Прекомпільований каталог задач (manage.py build_problem_catalog);
+# якщо файлу немає, задачі генеруються як звичайно
+PROBLEM_CATALOG_PATH = os.getenv('DJANGO_PROBLEM_CATALOG_PATH', str(BASE_DIR / 'problem_catalog.bin'))
+
+# Тести не читають локально зібраний каталог (trainmath/test_runner.py)
+TEST_RUNNER = 'trainmath.test_runner.TestRunner'
+
+
+# Обмеження частоти submit_answer (core.ratelimit): "запитів/секунд" на
+# користувача, сесію та IP; дорогі для перевірки (sympy) типи задач —
+# окремим правилом
+RATELIMIT_ENABLED = os.getenv('DJANGO_RATELIMIT_ENABLED', '1') == '1'
+RATELIMIT_RULES = {
+    'submit': {'user': '60/60', 'session': '60/60', 'ip': '300/60'},
+    'submit_expensive': {'user': '20/60', 'session': '20/60', 'ip': '100/60'},
+}
+RATELIMIT_EXPENSIVE_SLUGS = ['algebraic', 'derivatives', 'integrals']
+# Заголовок з адресою клієнта від проксі (nginx ставить X-Real-IP)
+RATELIMIT_IP_HEADER = os.getenv(
+    'DJANGO_RATELIMIT_IP_HEADER', 'HTTP_X_REAL_IP' if os.getenv('DJANGO_PRODUCTION') == '1' else ''
+)
+
+
+# Перенесення гостьових спроб після входу (users.merge): розмір батчу
+# і чи обробляти задачу одразу у фоновому потоці (інакше —
+# manage.py merge_guest_attempts)
+GUEST_MERGE_BATCH_SIZE = int(os.getenv('DJANGO_GUEST_MERGE_BATCH_SIZE', '500'))
+GUEST_MERGE_IN_THREAD = os.getenv('DJANGO_GUEST_MERGE_IN_THREAD', '1') == '1'
+
+
+# Відкладений запис спроб (core.attempt_journal): submit_answer пише спробу
+# в локальний журнал і відповідає одразу, фоновий потік вставляє журнал
+# батчами кожні ATTEMPT_FLUSH_INTERVAL_MS мс або після ATTEMPT_FLUSH_MAX_ROWS
+# рядків. Каталог журналу має бути на постійному диску.
+ATTEMPT_WRITE_BEHIND = os.getenv('DJANGO_ATTEMPT_WRITE_BEHIND', '0') == '1'
+ATTEMPT_JOURNAL_DIR = os.getenv('DJANGO_ATTEMPT_JOURNAL_DIR', str(BASE_DIR / 'attempt_journal'))
+ATTEMPT_FLUSH_INTERVAL_MS = int(os.getenv('DJANGO_ATTEMPT_FLUSH_INTERVAL_MS', '200'))
+ATTEMPT_FLUSH_MAX_ROWS = int(os.getenv('DJANGO_ATTEMPT_FLUSH_MAX_ROWS', '500'))
+# fsync кожного рядка (і каталогу після перейменування сегмента): без нього
+# спроба переживе падіння процесу, але не ОС
+ATTEMPT_JOURNAL_FSYNC = os.getenv('DJANGO_ATTEMPT_JOURNAL_FSYNC', '1') == '1'
+
+
+# Паралельна генерація сесії в пулі процесів (core.parallel_generation) для
+# типів, яких немає в каталозі задач; слоти, не готові за
+# GENERATION_DEADLINE_MS, генеруються за простішими шаблонами. Пул — у
+# кожному воркері gunicorn, тож їхня загальна кількість процесів пулу на хості
+# обмежена GENERATION_POOL_MAX_PROCESSES (слоти у GENERATION_POOL_LOCK_DIR);
+# воркери без слота генерують послідовно.
+GENERATION_POOL_ENABLED = os.getenv('DJANGO_GENERATION_POOL_ENABLED', '0') == '1'
+GENERATION_POOL_SLUGS = ['derivatives', 'integrals']
+GENERATION_POOL_WORKERS = int(os.getenv('DJANGO_GENERATION_POOL_WORKERS', '2'))
+GENERATION_POOL_MAX_PROCESSES = int(os.getenv('DJANGO_GENERATION_POOL_MAX_PROCESSES', str(os.cpu_count() or 1)))
+GENERATION_POOL_LOCK_DIR = os.getenv('DJANGO_GENERATION_POOL_LOCK_DIR', '/tmp/trainmath-generation-pool')
+GENERATION_DEADLINE_MS = int(os.getenv('DJANGO_GENERATION_DEADLINE_MS', '1500'))
+
+
+# Таблиці лідерів (core.leaderboards): як часто (с) процес довантажує
+# змінені рядки дошки, скільки рядків показувати і скільки тижневих дошок
+# зберігає manage.py rebuild_leaderboards
+LEADERBOARD_SYNC_INTERVAL = float(os.getenv('DJANGO_LEADERBOARD_SYNC_INTERVAL', '5'))
+LEADERBOARD_SIZE = int(os.getenv('DJANGO_LEADERBOARD_SIZE', '20'))
+LEADERBOARD_WEEKS_KEPT = int(os.getenv('DJANGO_LEADERBOARD_WEEKS_KEPT', '8'))
+
+
+# Метрики Prometheus на /metrics/ (core.metrics)
+METRICS_ENABLED = os.getenv('DJANGO_METRICS_ENABLED', '1') == '1'
+# Адреси, з яких /metrics/ доступний без входу (скрейпер Prometheus)
+METRICS_ALLOWED_IPS = os.getenv('DJANGO_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
@@ -0,0 +1,15 @@
+# trainmath/test_runner.py
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Тести не читають локально зібраний каталог задач (PROBLEM_CATALOG_PATH):
+    він може бути застарілим або відсутнім, і результат тестів залежав би
+    від нього. Тести каталогу збирають власний файл.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.PROBLEM_CATALOG_PATH = ''
@@ -17,11 +17,12 @@ Including another URLconf
 # trainmath/urls.py
 from django.contrib import admin
 from django.urls import path, include
-from core.admin import admin_dashboard_view
+from core.admin import admin_dashboard_view, export_attempts_view
 
 urlpatterns = [
     # Custom admin dashboard MUST be before the default admin patterns
     path("admin/dashboard/", admin.site.admin_view(admin_dashboard_view), name="admin_dashboard"),
+    path("admin/export/attempts/", admin.site.admin_view(export_attempts_view), name="admin_export_attempts"),
     path("admin/", admin.site.urls),
     path("", include("core.urls")),        # головна і задачі
     path("users/", include("users.urls", namespace="users")), # логін/реєстрація/профіль
@@ -1,7 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser
+from .models import CustomUser, GuestMerge
 # Register your models here.
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
     pass
+
+
+@admin.register(GuestMerge)
+class GuestMergeAdmin(admin.ModelAdmin):
+    list_display = ("session_key", "user", "created", "started_at", "finished_at", "merged_count")
+    list_filter = ("finished_at",)
+    search_fields = ("session_key", "user__username")
@@ -0,0 +1,119 @@
+# users/merge.py
+"""
+Відкладене перенесення гостьових спроб на користувача після входу.
+
+Під час входу лише ставиться задача ``GuestMerge`` (одна вставка), а самі
+спроби переносяться батчами по індексу ``Attempt.session_id`` — у фоновому
+потоці після коміту або командою ``manage.py merge_guest_attempts``.
+Тривалість входу не залежить від розміру таблиці спроб.
+
+Кожен батч — окрема транзакція: вибрати ``batch_size`` гостьових спроб
+(``select_for_update``), перепризначити їх і надіслати сигнал
+``guest_attempts_merged`` — на нього підписуються похідні агрегати
+користувача, тож вони оновлюються в тій самій транзакції. Повторний запуск
+безпечний: вже перенесені спроби (``user`` не порожній) не вибираються.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from core.models import Attempt
+from users.models import GuestMerge
+
+logger = logging.getLogger(__name__)
+
+# Ключ сесії з ключем гостьової сесії, під яким писались спроби:
+# login() змінює session_key, а дані сесії зберігає
+GUEST_SESSION_KEY = 'guest_session_key'
+
+# Задача, взята в роботу давніше за це, вважається покинутою
+STALE_AFTER = timedelta(minutes=10)
+
+# Надсилається в транзакції кожного батчу: user_id, attempt_ids
+guest_attempts_merged = Signal()
+
+
+def enqueue(session_key, user):
+    """
+    Ставить перенесення спроб гостьової сесії ``session_key`` на ``user``.
+    Ідемпотентно: повторний вхід з тією ж сесією перевідкриває наявну задачу.
+    """
+    job, created = GuestMerge.objects.get_or_create(session_key=session_key, user=user)
+    if not created and job.finished_at is not None:
+        GuestMerge.objects.filter(pk=job.pk).update(started_at=None, finished_at=None)
+    if settings.GUEST_MERGE_IN_THREAD:
+        transaction.on_commit(lambda: _start_thread(job.pk))
+    return job
+
+
+def _start_thread(job_id):
+    threading.Thread(target=_run_in_thread, args=(job_id,), daemon=True,
+                     name=f'guest-merge-{job_id}').start()
+
+
+def _run_in_thread(job_id):
+    try:
+        process_job(job_id)
+    except Exception:
+        # Задача лишається незавершеною й буде підхоплена командою
+        logger.exception("Guest merge %s failed", job_id)
+    finally:
+        connection.close()
+
+
+def _claim(job_id):
+    """Позначає задачу взятою, якщо її ніхто не обробляє; True при успіху."""
+    now = timezone.now()
+    return GuestMerge.objects.filter(pk=job_id, finished_at__isnull=True).filter(
+        Q(started_at__isnull=True) | Q(started_at__lt=now - STALE_AFTER)
+    ).update(started_at=now) == 1
+
+
+def process_job(job_id, batch_size=None):
+    """
+    Переносить спроби задачі батчами по ``batch_size``. Повертає кількість
+    перенесених спроб (0, якщо задачу вже обробляє інший процес).
+    """
+    batch_size = batch_size or settings.GUEST_MERGE_BATCH_SIZE
+    if not _claim(job_id):
+        return 0
+    job = GuestMerge.objects.get(pk=job_id)
+    guest_attempts = Attempt.objects.filter(session_id=job.session_key, user__isnull=True)
+
+    merged = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                guest_attempts.select_for_update().order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            Attempt.objects.filter(pk__in=ids).update(user_id=job.user_id, session_id=None)
+            guest_attempts_merged.send(sender=GuestMerge, user_id=job.user_id, attempt_ids=ids)
+            # started_at оновлюється як "пульс", щоб довгу задачу не вважали покинутою
+            GuestMerge.objects.filter(pk=job_id).update(
+                merged_count=F('merged_count') + len(ids), started_at=timezone.now()
+            )
+        merged += len(ids)
+
+    GuestMerge.objects.filter(pk=job_id).update(finished_at=timezone.now())
+    return merged
+
+
+def process_pending(batch_size=None, limit=None):
+    """Обробляє незавершені задачі від найстаріших; повертає (задач, спроб)."""
+    ids = GuestMerge.objects.filter(finished_at__isnull=True).order_by('created').values_list('pk', flat=True)
+    if limit:
+        ids = ids[:limit]
+    jobs = merged = 0
+    for job_id in list(ids):
+        moved = process_job(job_id, batch_size)
+        jobs += 1
+        merged += moved
+    return jobs, merged
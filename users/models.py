@@ -51,3 +51,24 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+
+class GuestMerge(models.Model):
+    """
+    Черга перенесення гостьових спроб на користувача після входу
+    (див. users.merge). Один запис на пару (гостьова сесія, користувач),
+    тому повторний вхід з тією ж сесією не створює дубліката.
+    """
+    session_key = models.CharField(max_length=128)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="guest_merges")
+    created = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    merged_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session_key", "user"], name="unique_guest_merge"),
+        ]
+
+    def __str__(self):
+        return f"{self.session_key} -> {self.user_id}"
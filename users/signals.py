@@ -1,13 +1,12 @@
 # users/signals.py
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
-from core.models import Attempt
+from users.merge import GUEST_SESSION_KEY, enqueue
 
 @receiver(user_logged_in)
 def move_guest_attempts(sender, request, user, **kwargs):
-    session_id = request.session.session_key
+    # Ключ гостьової сесії зберігає submit_answer: на момент сигналу
+    # request.session.session_key вже новий (login() викликає cycle_key)
+    session_id = request.session.pop(GUEST_SESSION_KEY, None)
     if session_id:
-        Attempt.objects.filter(session_id=session_id, user__isnull=True).update(
-            user=user,
-            session_id=None
-        )
+        enqueue(session_id, user)
@@ -1,7 +1,10 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from core.models import ProblemType, ProblemInstance, Attempt
+from users import merge
+from users.models import GuestMerge
 from django.db.models import Avg, Count, Q
 
 User = get_user_model()
@@ -203,4 +206,77 @@ class UserStatisticsTest(TestCase):
         
         # But should be counted in guest statistics
         guest_attempts = Attempt.objects.filter(session_id='guest_session_123')
-        self.assertEqual(guest_attempts.count(), 1)
\ No newline at end of file
+        self.assertEqual(guest_attempts.count(), 1)
+
+@override_settings(GUEST_MERGE_IN_THREAD=False)
+class GuestMergeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='guest2user', password='testpass123')
+        problem_type = ProblemType.objects.create(
+            slug='arithmetic',
+            name='Mental Arithmetic',
+            impl_path='exercises.arithmetic.ArithmeticProblem'
+        )
+        self.problem = ProblemInstance.objects.create(
+            problem_type=problem_type,
+            difficulty=1,
+            params={'operands': [2, 3], 'operators': ['+']},
+            question_text='2 + 3',
+            canonical_answer='5'
+        )
+
+    def _guest_attempts(self, session_id, n):
+        for _ in range(n):
+            Attempt.objects.create(session_id=session_id, problem=self.problem,
+                                   user_answer='5', is_correct=True, time_taken_ms=1000)
+
+    def test_login_queues_merge_for_guest_session(self):
+        self.client.post(reverse('submit_answer', args=[self.problem.pk]), {'answer': '5'})
+        guest_key = Attempt.objects.get().session_id
+        self.assertTrue(guest_key)
+
+        self.client.post(reverse('users:login'), {'username': 'guest2user', 'password': 'testpass123'})
+        job = GuestMerge.objects.get()
+        self.assertEqual((job.session_key, job.user), (guest_key, self.user))
+        # Сам вхід спроби не переносить
+        self.assertIsNone(Attempt.objects.get().user)
+
+        self.assertEqual(merge.process_pending(), (1, 1))
+        attempt = Attempt.objects.get()
+        self.assertEqual(attempt.user, self.user)
+        self.assertIsNone(attempt.session_id)
+
+    def test_merge_runs_in_batches_and_is_idempotent(self):
+        self._guest_attempts('guest-a', 5)
+        self._guest_attempts('guest-b', 2)
+        batches = []
+
+        def receiver(sender, user_id, attempt_ids, **kwargs):
+            batches.append((user_id, len(attempt_ids)))
+
+        merge.guest_attempts_merged.connect(receiver)
+        try:
+            job = merge.enqueue('guest-a', self.user)
+            self.assertEqual(merge.process_job(job.pk, batch_size=2), 5)
+            # Повторний запуск нічого не робить
+            self.assertEqual(merge.process_job(job.pk, batch_size=2), 0)
+            merge.enqueue('guest-a', self.user)
+            self.assertEqual(merge.process_job(job.pk, batch_size=2), 0)
+        finally:
+            merge.guest_attempts_merged.disconnect(receiver)
+
+        self.assertEqual(batches, [(self.user.pk, 2), (self.user.pk, 2), (self.user.pk, 1)])
+        job.refresh_from_db()
+        self.assertEqual(job.merged_count, 5)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(Attempt.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(Attempt.objects.filter(session_id='guest-b').count(), 2)
+        self.assertEqual(GuestMerge.objects.count(), 1)
+
+    def test_job_in_progress_is_not_taken_twice(self):
+        self._guest_attempts('guest-a', 1)
+        job = merge.enqueue('guest-a', self.user)
+        GuestMerge.objects.filter(pk=job.pk).update(started_at=timezone.now())
+        self.assertEqual(merge.process_job(job.pk), 0)
+        GuestMerge.objects.filter(pk=job.pk).update(started_at=timezone.now() - merge.STALE_AFTER * 2)
+        self.assertEqual(merge.process_job(job.pk), 1)
@@ -4,6 +4,8 @@ from django.contrib.auth.decorators import login_required
 
 from .forms import RegisterForm, LoginForm
 from core.models import Attempt
+from core.db_router import replica_reads
+from core.profiling import query_budget
 from django.db.models import Avg, Count, Q
 
 
@@ -36,19 +38,29 @@ def logout_view(request):
     return redirect("home")
 
 @login_required
+@replica_reads
+@query_budget(4)
 def profile_view(request):
     user = request.user
     attempts = Attempt.objects.filter(user=user)
 
-    # Базова статистика
-    total = attempts.count()
-    correct = attempts.filter(is_correct=True).count()
+    # Базова статистика (одним запитом)
+    stats = attempts.aggregate(
+        total=Count("id"),
+        correct=Count("id", filter=Q(is_correct=True)),
+        avg_time=Avg("time_taken_ms"),
+    )
+    total, correct, avg_time = stats["total"], stats["correct"], stats["avg_time"]
     accuracy = (correct / total * 100) if total > 0 else 0
-    avg_time = attempts.aggregate(Avg("time_taken_ms"))["time_taken_ms__avg"]
+
+    recent = attempts.select_related("problem__problem_type").only(
+        "user_answer", "option_id", "is_correct", "time_taken_ms", "timestamp",
+        "problem__difficulty", "problem__multiple_choice_options", "problem__problem_type__name",
+    ).order_by("-timestamp")[:10]
 
     return render(request, "users/profile.html", {
         "user": user,
-        "attempts": attempts.order_by("-timestamp")[:10],
+        "attempts": recent,
         "accuracy": round(accuracy, 2),
         "avg_time": round(avg_time, 2) if avg_time else None,
         "total": total,